@@ -1,30 +1,82 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_mail import Mail
 from flask_talisman import Talisman
 from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from config import Config
+from app.hashing import HashingExecutor
+from app.admission import LoginAdmissionController
+from app.last_login import LastLoginBuffer
+from app.cache import ProfileCache, cache_server_command
+from app.identifier_limit import LoginIdentifierLimiter
+from app.ratelimit import limiter_storage_options  # also registers sqlite:// and mrc-shared:// limiter storage
+from app.database import configure_sqlite_engine, engine_options
+from app.client_ip import configure_proxy, get_client_ip
+from app.outbox import EmailOutbox, outbox_worker_command
+from app.security_log import SecurityLogPipeline
+from app.token_cache import CachingJWTManager
+from app.audit import AuditEventBuffer
+from app.audit_archive import AuditArchive, audit_archive_command, audit_query_command
+from app.revocation import TokenRevocationList
+from app.keyring import SigningKeyRing, jwt_keys_command
+from app.profile_snapshot import ProfileVersionMap
+from app.json_provider import init_json
 
 db = SQLAlchemy()
 migrate = Migrate()
-jwt = JWTManager()
+jwt = CachingJWTManager()
 mail = Mail()
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(key_func=get_client_ip)
+hasher = HashingExecutor()
+login_admission = LoginAdmissionController()
+last_login_buffer = LastLoginBuffer()
+profile_cache = ProfileCache()
+profile_versions = ProfileVersionMap()
+identifier_limiter = LoginIdentifierLimiter()
+email_outbox = EmailOutbox()
+security_log = SecurityLogPipeline()
+audit_events = AuditEventBuffer()
+audit_archive = AuditArchive()
+token_revocations = TokenRevocationList()
+jwt_keys = SigningKeyRing()
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    app.config.setdefault('RATELIMIT_STORAGE_OPTIONS', limiter_storage_options(app.config))
+    init_json(app)
+
+    # Trusted proxy hops for client IP resolution
+    configure_proxy(app)
 
     # Initialize extensions
     db.init_app(app)
+    with app.app_context():
+        configure_sqlite_engine(db.engine, app.config)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    jwt_keys.init_app(app)
     mail.init_app(app)
     limiter.init_app(app)
+    hasher.init_app(app)
+    login_admission.init_app(app)
+    last_login_buffer.init_app(app)
+    profile_cache.init_app(app)
+    profile_versions.init_app(app)
+    identifier_limiter.init_app(app)
+    email_outbox.init_app(app)
+    security_log.init_app(app)
+    audit_events.init_app(app)
+    audit_archive.init_app(app)
+    token_revocations.init_app(app)
+    app.cli.add_command(cache_server_command)
+    app.cli.add_command(outbox_worker_command)
+    app.cli.add_command(audit_archive_command)
+    app.cli.add_command(audit_query_command)
+    app.cli.add_command(jwt_keys_command)
     
     # Initialize CORS with specific origins
     CORS(app, origins=app.config['CORS_ORIGINS'], supports_credentials=True)
@@ -57,6 +109,17 @@ def create_app(config_class=Config):
     from app.main import bp as main_bp
     app.register_blueprint(main_bp, url_prefix='/api')
 
+    from app.admin import bp as admin_bp
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+
+    # Current user: loaded lazily, once per request (see app.auth.current_user)
+    from app.auth.current_user import user_lookup_callback
+    jwt.user_lookup_loader(user_lookup_callback)
+    jwt.token_in_blocklist_loader(token_revocations.is_token_revoked)
+    jwt.additional_headers_loader(jwt_keys.headers_callback)
+    jwt.encode_key_loader(jwt_keys.encode_key_callback)
+    jwt.decode_key_loader(jwt_keys.decode_key_callback)
+
     # JWT error handlers
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
@@ -66,6 +129,10 @@ def create_app(config_class=Config):
     def invalid_token_callback(error):
         return {'message': 'Invalid token', 'error': 'token_invalid'}, 401
 
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return {'message': 'Token has been revoked', 'error': 'token_revoked'}, 401
+
     @jwt.unauthorized_loader
     def missing_token_callback(error):
         return {'message': 'Authorization token required', 'error': 'token_missing'}, 401
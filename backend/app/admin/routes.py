@@ -0,0 +1,50 @@
+from flask import jsonify, request
+from app.audit import decode_cursor, parse_timestamp, query_events
+from app.auth.current_user import admin_required
+from app.admin import bp
+
+AUDIT_PAGE_SIZE = 50
+AUDIT_MAX_PAGE_SIZE = 500
+
+
+def timestamp_arg(name):
+    """Query arg `name` as a UTC datetime, or None if absent"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO 8601 timestamp')
+
+
+@bp.route('/audit-events')
+@admin_required
+def audit_events():
+    """Security audit events, newest first, filtered and keyset-paginated"""
+    args = request.args
+    try:
+        user_id = args.get('user_id', type=int)
+        if 'user_id' in args and user_id is None:
+            raise ValueError('user_id must be an integer')
+        since = timestamp_arg('since')
+        until = timestamp_arg('until')
+        cursor = decode_cursor(args['cursor']) if args.get('cursor') else None
+        limit = args.get('limit', AUDIT_PAGE_SIZE, type=int)
+        if not 1 <= limit <= AUDIT_MAX_PAGE_SIZE:
+            raise ValueError(f'limit must be between 1 and {AUDIT_MAX_PAGE_SIZE}')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    events, next_cursor = query_events(
+        user_id=user_id,
+        event_type=args.get('event_type') or None,
+        since=since,
+        until=until,
+        cursor=cursor,
+        limit=limit
+    )
+    return jsonify({
+        'events': [event.to_dict() for event in events],
+        'next_cursor': next_cursor
+    }), 200
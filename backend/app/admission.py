@@ -0,0 +1,129 @@
+"""
+Login admission control for MRC authentication system.
+Caps in-flight password verifications, reserves capacity for likely-legitimate
+logins (recent login or known device cookie) and sheds the rest early.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from flask import request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+
+class LoginShed(Exception):
+    """Raised when a login is rejected to protect hashing capacity"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Login shed, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class LoginAdmissionController:
+    """Admission gate in front of check_password with a priority lane"""
+
+    def __init__(self, app=None):
+        self.max_inflight = 0
+        self.normal_limit = 0
+        self.priority_wait = 0
+        self.retry_after = 1
+        self.recent_window = timedelta(0)
+        self.cookie_name = 'mrc_device'
+        self.cookie_max_age = 0
+        self.cookie_secure = False
+        self._serializer = None
+        self._cond = threading.Condition()
+        self._reset_counters()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure limits from app config"""
+        self.max_inflight = app.config.get('LOGIN_ADMISSION_MAX_INFLIGHT', 8)
+        reserve = app.config.get('LOGIN_ADMISSION_PRIORITY_RESERVE', 0.25)
+        self.normal_limit = self.max_inflight - int(self.max_inflight * reserve)
+        self.priority_wait = app.config.get('LOGIN_ADMISSION_PRIORITY_WAIT', 0.5)
+        self.retry_after = app.config.get('LOGIN_ADMISSION_RETRY_AFTER', 2)
+        self.recent_window = timedelta(days=app.config.get('LOGIN_PRIORITY_RECENT_DAYS', 30))
+        self.cookie_name = app.config.get('LOGIN_DEVICE_COOKIE_NAME', 'mrc_device')
+        self.cookie_max_age = app.config.get('LOGIN_DEVICE_COOKIE_MAX_AGE', 180 * 24 * 3600)
+        self.cookie_secure = app.config.get('JWT_COOKIE_SECURE', False)
+        self._serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='mrc-known-device')
+        self._reset_counters()
+        app.extensions['login_admission'] = self
+
+    def _reset_counters(self):
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.counters = {
+            'admitted_priority': 0,
+            'admitted_normal': 0,
+            'shed_priority': 0,
+            'shed_normal': 0,
+        }
+
+    def is_known_device(self, user):
+        """Check the request carries a device cookie issued to this user within the cookie's max age"""
+        token = request.cookies.get(self.cookie_name)
+        if not token or self._serializer is None:
+            return False
+        try:
+            return self._serializer.loads(token, max_age=self.cookie_max_age) == user.id
+        except BadSignature:  # including SignatureExpired
+            return False
+
+    def is_priority(self, user):
+        """Recent successful login or known device cookie earns the priority lane"""
+        return user.has_recent_login(self.recent_window) or self.is_known_device(user)
+
+    @contextmanager
+    def admit(self, user):
+        """Hold an in-flight verification slot, or raise LoginShed"""
+        priority = self.is_priority(user)
+        lane = 'priority' if priority else 'normal'
+        limit = self.max_inflight if priority else self.normal_limit
+
+        with self._cond:
+            if self.inflight >= limit and priority and self.priority_wait > 0:
+                # Priority requests queue briefly for a slot; normal ones are shed at once
+                deadline = time.monotonic() + self.priority_wait
+                while self.inflight >= limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            if self.inflight >= limit:
+                self.counters[f'shed_{lane}'] += 1
+                raise LoginShed(self.retry_after)
+            self.inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+            self.counters[f'admitted_{lane}'] += 1
+
+        try:
+            yield priority
+        finally:
+            with self._cond:
+                self.inflight -= 1
+                self._cond.notify()
+
+    def remember_device(self, response, user_id):
+        """Set the signed known-device cookie after a successful login"""
+        response.set_cookie(
+            self.cookie_name,
+            self._serializer.dumps(user_id),
+            max_age=self.cookie_max_age,
+            secure=self.cookie_secure,
+            httponly=True,
+            samesite='Lax'
+        )
+
+    def metrics(self):
+        """Admission counters for monitoring"""
+        with self._cond:
+            return dict(
+                self.counters,
+                inflight=self.inflight,
+                peak_inflight=self.peak_inflight,
+                max_inflight=self.max_inflight,
+                normal_limit=self.normal_limit
+            )
@@ -0,0 +1,196 @@
+"""
+Queryable security audit trail for MRC authentication system.
+log_security_event records each event in memory; a background thread writes
+them to the audit_event table in one multi-row INSERT every AUDIT_FLUSH_INTERVAL
+seconds, every AUDIT_FLUSH_SIZE events and at interpreter shutdown, so logins
+never wait on the insert. At most AUDIT_BUFFER_MAX events are held; beyond that
+(the database is unreachable) new events are dropped and counted.
+"""
+import atexit
+import base64
+import binascii
+import json
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+
+class AuditEventBuffer:
+    """In-process buffer of audit_event rows awaiting a bulk INSERT"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.flush_interval = 2
+        self.flush_size = 500
+        self.max_pending = 50000
+        self.counters = {'recorded': 0, 'written': 0, 'dropped': 0}
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure from app config; the flusher thread starts on first use"""
+        self.app = app
+        self.enabled = app.config.get('AUDIT_EVENTS_ENABLED', True)
+        self.flush_interval = app.config.get('AUDIT_FLUSH_INTERVAL', 2)
+        self.flush_size = app.config.get('AUDIT_FLUSH_SIZE', 500)
+        self.max_pending = app.config.get('AUDIT_BUFFER_MAX', 50000)
+        if self.enabled and not self._atexit_registered:
+            atexit.register(self.flush)
+            self._atexit_registered = True
+        app.extensions['audit_events'] = self
+
+    def record(self, user_id, event_type, ip_address=None, details=None):
+        """Queue an audit_event row, timestamped now"""
+        if not self.enabled:
+            return
+        row = {
+            'user_id': user_id,
+            'event_type': event_type,
+            'ip_address': ip_address,
+            'details': None if details is None else str(details),
+            'created_at': datetime.now(timezone.utc)
+        }
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.counters['dropped'] += 1
+                return
+            self._pending.append(row)
+            self.counters['recorded'] += 1
+            full = len(self._pending) >= self.flush_size
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Insert everything recorded so far; returns rows written"""
+        from sqlalchemy import insert
+        from app import db
+        from app.models import AuditEvent
+
+        # One flush at a time keeps rows in recording order across the thread and atexit
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                rows = list(self._pending)
+                self._pending.clear()
+
+            app = current_app._get_current_object() if has_app_context() else self.app
+            try:
+                # Own app context, so the flush never joins a request's session
+                with app.app_context():
+                    # Core executemany is sent as multi-row INSERT ... VALUES batches
+                    db.session.execute(insert(AuditEvent.__table__), rows)
+                    db.session.commit()
+            except Exception:
+                logger.exception("Failed to flush %d audit events", len(rows))
+                with self._lock:
+                    # Put the batch back ahead of newer events, within the buffer limit
+                    room = max(self.max_pending - len(self._pending), 0)
+                    self.counters['dropped'] += len(rows) - min(room, len(rows))
+                    self._pending.extendleft(reversed(rows[:room]))
+                return 0
+            with self._lock:
+                self.counters['written'] += len(rows)
+            return len(rows)
+
+    def _ensure_thread(self):
+        """Start the flusher thread (also restarts it in forked workers)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='audit-event-flusher', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def metrics(self):
+        """Recorded/written/dropped counts and events awaiting a flush in this process"""
+        with self._lock:
+            metrics = dict(self.counters)
+            metrics['pending'] = len(self._pending)
+        return metrics
+
+
+def encode_cursor(created_at, event_id):
+    """Opaque keyset cursor for the page after (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), event_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from encode_cursor; raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, event_id = json.loads(raw)
+        return parse_timestamp(created_at), int(event_id)
+    except (binascii.Error, TypeError, UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def parse_timestamp(value):
+    """ISO 8601 timestamp as UTC; naive values are taken to be UTC already"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def query_events(user_id=None, event_type=None, since=None, until=None, cursor=None, limit=50):
+    """Newest-first page of audit events matching the filters
+
+    Returns (events, next_cursor). Paging is keyset on (created_at, id), so every
+    page is an index range scan however deep it is; next_cursor is None on the last page.
+    """
+    from sqlalchemy import and_, or_, select
+    from app import db
+    from app.models import AuditEvent
+
+    conditions = []
+    if user_id is not None:
+        conditions.append(AuditEvent.user_id == user_id)
+    if event_type is not None:
+        conditions.append(AuditEvent.event_type == event_type)
+    if since is not None:
+        conditions.append(AuditEvent.created_at >= since)
+    if until is not None:
+        conditions.append(AuditEvent.created_at < until)
+    if cursor is not None:
+        after_ts, after_id = cursor
+        # The plain <= bound is what lets the index seek straight to the cursor;
+        # the OR then skips rows at the cursor's own timestamp already returned
+        conditions.append(AuditEvent.created_at <= after_ts)
+        conditions.append(or_(
+            AuditEvent.created_at < after_ts,
+            and_(AuditEvent.created_at == after_ts, AuditEvent.id < after_id)
+        ))
+
+    events = db.session.scalars(
+        select(AuditEvent).where(*conditions)
+        .order_by(AuditEvent.created_at.desc(), AuditEvent.id.desc())
+        .limit(limit + 1)
+    ).all()
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        last = events[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return events, next_cursor
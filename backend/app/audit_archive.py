@@ -0,0 +1,357 @@
+"""
+Cold storage for the security audit trail.
+`flask audit-archive` moves each closed UTC day of audit_event rows older than
+AUDIT_HOT_RETENTION_DAYS out of the database into a gzip-compressed NDJSON
+segment under AUDIT_ARCHIVE_DIR, sorted by (created_at, id), next to a small
+JSON index: time range, row count, user id range and a bitmap of the event
+types it contains. Rows are deleted only once their segment is on disk, in
+short transactions so logins never wait long for the write lock.
+`flask audit-query` reads the indexes, skips every segment that cannot match
+and memory-maps and stream-decompresses the rest.
+"""
+import json
+import logging
+import mmap
+import os
+import re
+import zlib
+from datetime import datetime, time, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = '.ndjson.gz'
+INDEX_SUFFIX = '.idx.json'
+EVENT_TYPES_FILE = 'event-types.json'
+SEGMENT_NAME = re.compile(r'^audit-(\d{4}-\d{2}-\d{2})-(\d{3})\.idx\.json$')
+
+
+def atomic_write(path, data):
+    """Write bytes to path via a temporary file, fsynced, then renamed over it"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+def format_ts(value):
+    """Fixed-width UTC ISO timestamp (sorts as text)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec='microseconds') + '+00:00'
+
+
+class AuditArchive:
+    """Daily audit_event segments on disk, with per-segment indexes for pruning"""
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.hot_retention_days = 30
+        self.delete_batch_size = 1000
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure archive location and retention from app config"""
+        self.directory = app.config.get('AUDIT_ARCHIVE_DIR') or os.path.join(app.instance_path, 'audit-archive')
+        self.hot_retention_days = app.config.get('AUDIT_HOT_RETENTION_DAYS', 30)
+        self.delete_batch_size = app.config.get('AUDIT_ARCHIVE_DELETE_BATCH', 1000)
+        app.extensions['audit_archive'] = self
+
+    # Event type registry: bit n of a segment's bitmap is event_types[n]
+
+    def event_types(self):
+        path = os.path.join(self.directory, EVENT_TYPES_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'rb') as fh:
+            return json.load(fh)
+
+    def _register_event_types(self, names):
+        """Bit positions for names, appending unseen types to the registry"""
+        known = self.event_types()
+        added = sorted(set(names) - set(known))
+        if added:
+            known = known + added
+            atomic_write(os.path.join(self.directory, EVENT_TYPES_FILE), json.dumps(known).encode())
+        return {name: bit for bit, name in enumerate(known)}
+
+    def bitmap(self, names):
+        """Bitmap of the given event types; None if any is unknown to the archive"""
+        positions = {name: bit for bit, name in enumerate(self.event_types())}
+        mask = 0
+        for name in names:
+            if name not in positions:
+                return None
+            mask |= 1 << positions[name]
+        return mask
+
+    # Writing
+
+    def closed_partitions(self, now=None):
+        """UTC days with audit rows old enough to archive, oldest first"""
+        from sqlalchemy import func, select
+        from app import db
+        from app.models import AuditEvent
+
+        now = now or datetime.now(timezone.utc)
+        cutoff = datetime.combine(now.date() - timedelta(days=self.hot_retention_days), time.min,
+                                  tzinfo=timezone.utc)
+        oldest = db.session.scalar(select(func.min(AuditEvent.created_at)))
+        if oldest is None:
+            return []
+        day = oldest.date()
+        days = []
+        while day < cutoff.date():
+            days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    def archive_closed_partitions(self, now=None):
+        """Archive every closed partition; returns {day: rows archived}"""
+        os.makedirs(self.directory, exist_ok=True)
+        archived = {}
+        for day in self.closed_partitions(now):
+            count = self.archive_day(day)
+            if count:
+                archived[day] = count
+        return archived
+
+    def archive_day(self, day):
+        """Write one day's rows as a new segment, then delete them; returns rows archived"""
+        from sqlalchemy import select
+        from app import db
+        from app.models import AuditEvent
+
+        start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+        table = AuditEvent.__table__
+        in_day = (table.c.created_at >= start, table.c.created_at < start + timedelta(days=1))
+
+        # Rows already in an earlier segment (a run stopped before deleting them) are only deleted
+        already = self._archived_ids(day)
+        if already:
+            self._delete(list(already))
+
+        name = f'audit-{day.isoformat()}-{self._next_part(day):03d}'
+        segment_path = os.path.join(self.directory, name + SEGMENT_SUFFIX)
+        tmp_path = f'{segment_path}.tmp'
+        ids, types = [], set()
+        first_ts = last_ts = min_user_id = max_user_id = None
+        result = db.session.execute(
+            select(table.c.id, table.c.user_id, table.c.event_type, table.c.ip_address,
+                   table.c.details, table.c.created_at)
+            .where(*in_day).order_by(table.c.created_at, table.c.id)
+            .execution_options(yield_per=5000)
+        )
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+        with open(tmp_path, 'wb') as fh:
+            for row in result:
+                created_at = format_ts(row.created_at)
+                fh.write(compressor.compress(json.dumps({
+                    'id': row.id, 'user_id': row.user_id, 'event_type': row.event_type,
+                    'ip_address': row.ip_address, 'details': row.details, 'created_at': created_at
+                }, separators=(',', ':')).encode() + b'\n'))
+                ids.append(row.id)
+                types.add(row.event_type)
+                if row.user_id is not None:
+                    min_user_id = row.user_id if min_user_id is None else min(min_user_id, row.user_id)
+                    max_user_id = row.user_id if max_user_id is None else max(max_user_id, row.user_id)
+                first_ts = first_ts or created_at
+                last_ts = created_at
+            fh.write(compressor.flush())
+            fh.flush()
+            os.fsync(fh.fileno())
+        db.session.rollback()  # End the read transaction before deleting
+        if not ids:
+            os.unlink(tmp_path)
+            return 0
+        os.replace(tmp_path, segment_path)
+
+        positions = self._register_event_types(types)
+        index = {
+            'segment': name + SEGMENT_SUFFIX,
+            'partition': day.isoformat(),
+            'first_ts': first_ts,
+            'last_ts': last_ts,
+            'count': len(ids),
+            'event_types': sum(1 << positions[event_type] for event_type in types),
+            'min_user_id': min_user_id,
+            'max_user_id': max_user_id,
+            'bytes': os.path.getsize(segment_path),
+        }
+        # The index is written last: a segment without one is an unfinished write and is ignored
+        atomic_write(os.path.join(self.directory, name + INDEX_SUFFIX), json.dumps(index).encode())
+        self._delete(ids)
+        logger.info("Archived %d audit events for %s to %s (%d bytes)", len(ids), day,
+                    index['segment'], index['bytes'])
+        return len(ids)
+
+    def _delete(self, ids):
+        """Delete archived rows in short transactions"""
+        from sqlalchemy import delete
+        from app import db
+        from app.models import AuditEvent
+
+        table = AuditEvent.__table__
+        for start in range(0, len(ids), self.delete_batch_size):
+            db.session.execute(delete(table).where(table.c.id.in_(ids[start:start + self.delete_batch_size])))
+            db.session.commit()
+
+    def _next_part(self, day):
+        parts = [int(match.group(2)) for match in map(SEGMENT_NAME.match, self._index_files())
+                 if match and match.group(1) == day.isoformat()]
+        return max(parts, default=0) + 1
+
+    def _archived_ids(self, day):
+        """Ids of rows already in segments for day that are still in the database"""
+        from sqlalchemy import select
+        from app import db
+        from app.models import AuditEvent
+
+        archived = set()
+        for index in self.indexes():
+            if index['partition'] == day.isoformat():
+                archived.update(event['id'] for event in self._read_segment(index))
+        if not archived:
+            return set()
+        table = AuditEvent.__table__
+        ids = list(archived)
+        present = set()
+        for start in range(0, len(ids), self.delete_batch_size):
+            present.update(db.session.scalars(
+                select(table.c.id).where(table.c.id.in_(ids[start:start + self.delete_batch_size]))
+            ))
+        return present
+
+    # Reading
+
+    def _index_files(self):
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(INDEX_SUFFIX))
+
+    def indexes(self):
+        """Every segment's index, oldest partition first"""
+        indexes = []
+        for name in self._index_files():
+            with open(os.path.join(self.directory, name), 'rb') as fh:
+                indexes.append(json.load(fh))
+        return indexes
+
+    def matching_segments(self, since=None, until=None, event_types=None, user_id=None):
+        """Indexes of the segments that can hold events matching the filters"""
+        mask = None
+        if event_types:
+            mask = self.bitmap(event_types)
+            if mask is None:
+                return []  # A type the archive has never seen
+        since_ts = format_ts(since) if since else None
+        until_ts = format_ts(until) if until else None
+        matches = []
+        for index in self.indexes():
+            if since_ts and index['last_ts'] < since_ts:
+                continue
+            if until_ts and index['first_ts'] >= until_ts:
+                continue
+            if mask is not None and not index['event_types'] & mask:
+                continue
+            if user_id is not None and (index['min_user_id'] is None
+                                        or not index['min_user_id'] <= user_id <= index['max_user_id']):
+                continue
+            matches.append(index)
+        return matches
+
+    def _read_segment(self, index):
+        """Every event in a segment"""
+        return self._scan_segment(index, lambda line: True)
+
+    def _scan_segment(self, index, keep_line):
+        """Events from a memory-mapped segment whose raw line passes keep_line"""
+        path = os.path.join(self.directory, index['segment'])
+        with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            decompressor = zlib.decompressobj(31)
+            view = memoryview(mapped)
+            try:
+                tail = b''
+                for offset in range(0, len(view), 1 << 20):
+                    chunk = tail + decompressor.decompress(view[offset:offset + (1 << 20)])
+                    *lines, tail = chunk.split(b'\n')
+                    for line in lines:
+                        if keep_line(line):
+                            yield json.loads(line)
+                tail += decompressor.flush()
+                if tail and keep_line(tail):
+                    yield json.loads(tail)
+            finally:
+                view.release()
+
+    def scan(self, since=None, until=None, event_types=None, user_id=None):
+        """Archived events matching the filters, oldest first"""
+        since_ts = format_ts(since) if since else None
+        until_ts = format_ts(until) if until else None
+        # Cheap byte tests on the raw line before paying for json.loads
+        type_needles = [json.dumps({'event_type': name}, separators=(',', ':'))[1:-1].encode()
+                        for name in event_types or ()]
+        user_needle = json.dumps({'user_id': user_id}, separators=(',', ':'))[1:-1].encode() + b','
+
+        def keep_line(line):
+            if type_needles and not any(needle in line for needle in type_needles):
+                return False
+            return user_id is None or user_needle in line
+
+        for index in self.matching_segments(since, until, event_types, user_id):
+            for event in self._scan_segment(index, keep_line):
+                if event_types and event['event_type'] not in event_types:
+                    continue
+                if user_id is not None and event['user_id'] != user_id:
+                    continue
+                if since_ts and event['created_at'] < since_ts:
+                    continue
+                if until_ts and event['created_at'] >= until_ts:
+                    break  # Segments are sorted by time
+                yield event
+
+
+@click.command('audit-archive')
+@click.option('--older-than-days', type=int, default=None,
+              help='Archive days older than this (default AUDIT_HOT_RETENTION_DAYS).')
+@with_appcontext
+def audit_archive_command(older_than_days):
+    """Move closed days of audit events from the database to compressed segments"""
+    archive = current_app.extensions['audit_archive']
+    if older_than_days is not None:
+        archive.hot_retention_days = older_than_days
+    archived = archive.archive_closed_partitions()
+    for day, count in archived.items():
+        click.echo(f"{day}: archived {count} events")
+    click.echo(f"Archived {sum(archived.values())} audit events from {len(archived)} days "
+               f"to {archive.directory}")
+
+
+@click.command('audit-query')
+@click.option('--since', help='ISO 8601 start time (inclusive, UTC if no offset).')
+@click.option('--until', help='ISO 8601 end time (exclusive).')
+@click.option('--event-type', 'event_types', multiple=True, help='Event type; repeat for several.')
+@click.option('--user-id', type=int, default=None)
+@click.option('--limit', type=int, default=None, help='Stop after this many events.')
+@with_appcontext
+def audit_query_command(since, until, event_types, user_id, limit):
+    """Print archived audit events as NDJSON, oldest first"""
+    from app.audit import parse_timestamp
+    archive = current_app.extensions['audit_archive']
+    try:
+        since = parse_timestamp(since) if since else None
+        until = parse_timestamp(until) if until else None
+    except ValueError:
+        raise click.BadParameter('since/until must be ISO 8601 timestamps')
+    segments = archive.matching_segments(since, until, event_types, user_id)
+    click.echo(f"Scanning {len(segments)} of {len(archive.indexes())} segments", err=True)
+    for n, event in enumerate(archive.scan(since, until, event_types, user_id)):
+        if limit is not None and n >= limit:
+            break
+        click.echo(json.dumps(event, separators=(',', ':')))
@@ -0,0 +1,87 @@
+"""
+Request-scoped current user for MRC authentication system.
+The JWT user lookup returns a lazy proxy: the user row is loaded on first use
+(through the session identity map) and cached on g, so a request issues at most
+one user SELECT and requests that never touch the user issue none.
+Profile reads go through the profile cache and skip the SELECT on a hit.
+Profile responses carry a strong ETag of the profile's fields, so clients that
+poll with If-None-Match get a 304 without the payload being encoded or sent.
+"""
+import hashlib
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from werkzeug.local import LocalProxy
+
+from app import db, profile_cache
+from app.models import User
+from app.profile_snapshot import SNAPSHOT_FIELDS
+
+
+def load_current_user():
+    """The authenticated user for this request, or None if it no longer exists"""
+    if '_mrc_current_user' not in g:
+        identity = get_jwt_identity()
+        g._mrc_current_user = db.session.get(User, int(identity)) if identity is not None else None
+    return g._mrc_current_user
+
+
+def admin_required(view):
+    """jwt_required, and the user's id must be listed in ADMIN_USER_IDS"""
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if int(get_jwt_identity()) not in current_app.config.get('ADMIN_USER_IDS', ()):
+            return jsonify({'error': 'Admin access required'}), 403
+        user = load_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        if not user.is_active:
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def load_current_profile():
+    """The current user's to_dict() payload, from the profile cache when possible"""
+    user_id = int(get_jwt_identity())
+    payload = profile_cache.get(user_id)
+    if payload is None:
+        # Read before the user so a commit invalidating it meanwhile keeps our copy out
+        generation = profile_cache.generation(user_id)
+        user = load_current_user()
+        if user is None:
+            return None
+        payload = user.to_dict()
+        profile_cache.set(user_id, payload, generation)
+    return payload
+
+
+def profile_etag(profile):
+    """Strong ETag for a to_dict() payload, the same whether it came from a token, the cache or the database"""
+    # profile_version changes with every field but last_login, which is part of the payload
+    # too; the field values themselves tie the tag to the body whatever its source
+    values = repr([profile['id']] + [profile[name] for name in SNAPSHOT_FIELDS])
+    return f"{profile['id']}-{hashlib.blake2s(values.encode(), digest_size=12).hexdigest()}"
+
+
+def profile_response(profile):
+    """{'user': profile}, or 304 Not Modified if the client's If-None-Match already has it"""
+    etag = profile_etag(profile)
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify({'user': profile})
+    response.set_etag(etag)
+    # Browsers keep the body but revalidate it on every fetch; shared caches never store it
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def user_lookup_callback(jwt_header, jwt_data):
+    """user_lookup_loader: defer the SELECT until the user is actually used"""
+    # A fresh token verification starts a fresh lookup
+    g.pop('_mrc_current_user', None)
+    return LocalProxy(load_current_user)
@@ -2,29 +2,38 @@ from flask import request, jsonify, current_app
 from flask_jwt_extended import (
     create_access_token, 
     create_refresh_token, 
-    get_jwt_identity, 
+    decode_token,
     jwt_required,
     get_jwt,
     set_access_cookies,
     set_refresh_cookies,
     unset_jwt_cookies
 )
-from flask_mail import Message
 from datetime import datetime, timezone
 import re
 import bleach
 import logging
-from app import db, mail, limiter
+from sqlalchemy.exc import IntegrityError
+from app import db, limiter, login_admission, identifier_limiter, email_outbox, token_revocations, jwt_keys, profile_versions
+from app.admission import LoginShed
 from app.auth import bp
+from app.auth.current_user import load_current_profile, load_current_user, profile_response
+from app.client_ip import get_client_ip
+from app.hashing import HashingQueueFull
 from app.models import User
+from app.profile_snapshot import snapshot_claims
 
-# Get client IP address helper
-def get_client_ip():
-    """Get client IP address for logging"""
-    if request.environ.get('HTTP_X_FORWARDED_FOR') is None:
-        return request.environ['REMOTE_ADDR']
-    else:
-        return request.environ['HTTP_X_FORWARDED_FOR']
+def service_busy_response(retry_after=1):
+    """503 response telling the client to retry once hashing capacity frees up"""
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 503
+
+def too_many_attempts_response(retry_after):
+    """429 response for an identifier with too many recent failed logins"""
+    response = jsonify({'error': 'Too many failed login attempts, please try again later'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
 
 def sanitize_input(text):
     """Sanitize user input to prevent XSS attacks"""
@@ -70,13 +79,17 @@ def login():
         if not username_or_email or not password:
             return jsonify({'error': 'Username/email and password are required'}), 400
         
-        # Find user by username or email
-        user = User.query.filter(
-            (User.username == username_or_email) | (User.email == username_or_email)
-        ).first()
-        
         client_ip = get_client_ip()
         
+        # Per-identifier limit, checked before any database or bcrypt work
+        retry_after = identifier_limiter.retry_after(username_or_email)
+        if retry_after:
+            current_app.logger.warning(f"LOGIN_BLOCKED_IDENTIFIER: '{username_or_email}' from IP {client_ip}")
+            return too_many_attempts_response(retry_after)
+        
+        # Find user by username or email (case-insensitive, single indexed lookup)
+        user = User.find_by_login(username_or_email)
+        
         if not user:
             # Log failed attempt even when user doesn't exist (prevent enumeration)
             current_app.logger.warning(f"LOGIN_FAILED: Unknown user '{username_or_email}' from IP {client_ip}")
@@ -87,40 +100,61 @@ def login():
             user.log_security_event("LOGIN_BLOCKED_LOCKED", client_ip)
             return jsonify({'error': 'Account temporarily locked due to failed login attempts'}), 401
         
-        if not user.check_password(password):
-            user.handle_failed_login(client_ip)
+        # Admission control caps concurrent bcrypt verifications under login floods
+        try:
+            with login_admission.admit(user):
+                password_ok = user.check_password(password)
+        except LoginShed as shed:
+            return service_busy_response(shed.retry_after)
+        
+        if not password_ok:
+            identifier_limiter.record_failure(username_or_email)
+            user.handle_failed_login(client_ip, commit=False)
+            db.session.commit()
             return jsonify({'error': 'Invalid credentials'}), 401
         
         if not user.is_active:
             user.log_security_event("LOGIN_BLOCKED_INACTIVE", client_ip)
             return jsonify({'error': 'Account is deactivated'}), 401
         
-        # Handle successful login
-        user.handle_successful_login(client_ip)
+        # Stage the whole successful login (rehash, counters, last login) for one commit
+        if user.password_needs_rehash():
+            user.set_password(password)
+            user.log_security_event("PASSWORD_REHASHED", client_ip)
+        user.handle_successful_login(client_ip, commit=False)
         
-        # Create tokens (identity must be string for JWT)
-        access_token = create_access_token(identity=str(user.id))
-        
-        # Create response
+        # Read everything the response needs before commit expires the instance
+        user_id = user.id
         response_data = {
             'message': 'Login successful',
             'user': user.to_dict()
         }
+        claims = snapshot_claims(user, response_data['user']) if profile_versions.enabled else None
+        db.session.commit()
+        
+        # Create tokens (identity must be string for JWT); /api/me answers from the snapshot
+        access_token = create_access_token(identity=str(user_id), additional_claims=claims)
         
         response = jsonify(response_data)
         
         # Set access token cookie
         set_access_cookies(response, access_token)
+        login_admission.remember_device(response, user_id)
         
         # Create longer-lasting refresh token if "remember me" is checked
         if remember_me:
-            refresh_token = create_refresh_token(identity=str(user.id))
+            refresh_token = create_refresh_token(identity=str(user_id))
             set_refresh_cookies(response, refresh_token)
         
         return response, 200
         
+    except HashingQueueFull:
+        current_app.logger.warning("Login rejected: hashing queue full")
+        db.session.rollback()
+        return service_busy_response()
     except Exception as e:
         current_app.logger.error(f"Login error: {str(e)}")
+        db.session.rollback()
         return jsonify({'error': 'Login failed'}), 500
 
 @bp.route('/refresh', methods=['POST'])
@@ -128,18 +162,17 @@ def login():
 def refresh():
     """Refresh access token using refresh token"""
     try:
-        current_user_id = int(get_jwt_identity())  # Convert back to int for DB query
-        user = User.query.get(current_user_id)
+        user = load_current_user()
         
         if not user or not user.is_active:
             return jsonify({'error': 'User not found or inactive'}), 404
         
-        new_access_token = create_access_token(identity=str(current_user_id))
-        
         response_data = {
             'message': 'Token refreshed successfully',
             'user': user.to_dict()
         }
+        claims = snapshot_claims(user, response_data['user']) if profile_versions.enabled else None
+        new_access_token = create_access_token(identity=str(user.id), additional_claims=claims)
         
         response = jsonify(response_data)
         set_access_cookies(response, new_access_token)
@@ -150,18 +183,26 @@ def refresh():
         current_app.logger.error(f"Token refresh error: {str(e)}")
         return jsonify({'error': 'Token refresh failed'}), 500
 
+@bp.route('/.well-known/jwks.json', methods=['GET'])
+def jwks():
+    """Public keys that verify MRC tokens, for services checking them locally"""
+    response = current_app.response_class(jwt_keys.jwks(), mimetype='application/json')
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get('JWT_JWKS_MAX_AGE', 3600)
+    response.add_etag()
+    return response.make_conditional(request)
+
 @bp.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
     """Get current user profile"""
     try:
-        current_user_id = int(get_jwt_identity())  # Convert back to int for DB query
-        user = User.query.get(current_user_id)
+        profile = load_current_profile()
         
-        if not user:
+        if not profile:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({'user': user.to_dict()}), 200
+        return profile_response(profile)
         
     except Exception as e:
         current_app.logger.error(f"Get profile error: {str(e)}")
@@ -172,8 +213,7 @@ def get_profile():
 def update_profile():
     """Update current user profile"""
     try:
-        current_user_id = int(get_jwt_identity())  # Convert back to int for DB query
-        user = User.query.get(current_user_id)
+        user = load_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -186,22 +226,18 @@ def update_profile():
         if 'username' in data:
             # Sanitize and check if username is already taken
             clean_username = sanitize_input(data['username'])
-            existing_user = User.query.filter(
-                User.username == clean_username, 
-                User.id != user.id
-            ).first()
-            if existing_user:
+            if '@' in clean_username:
+                return jsonify({'error': 'Username cannot contain @'}), 400
+            existing_user = User.find_by_username(clean_username)
+            if existing_user and existing_user.id != user.id:
                 return jsonify({'error': 'Username already taken'}), 400
             user.username = clean_username
         
         if 'email' in data:
             # Sanitize and check if email is already taken
             clean_email = sanitize_input(data['email'])
-            existing_user = User.query.filter(
-                User.email == clean_email, 
-                User.id != user.id
-            ).first()
-            if existing_user:
+            existing_user = User.find_by_email(clean_email)
+            if existing_user and existing_user.id != user.id:
                 return jsonify({'error': 'Email already taken'}), 400
             user.email = clean_email
         
@@ -222,13 +258,18 @@ def update_profile():
             
             user.set_password(data['new_password'])
         
-        db.session.commit()
-        
-        return jsonify({
+        # Serialize before commit expires the instance (saves a reload SELECT)
+        response_data = {
             'message': 'Profile updated successfully',
             'user': user.to_dict()
-        }), 200
+        }
+        db.session.commit()
+        
+        return jsonify(response_data), 200
         
+    except HashingQueueFull:
+        db.session.rollback()
+        return service_busy_response()
     except Exception as e:
         current_app.logger.error(f"Update profile error: {str(e)}")
         db.session.rollback()
@@ -239,8 +280,7 @@ def update_profile():
 def add_technician():
     """Add new technician user (admin function)"""
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
+        current_user = load_current_user()
         
         if not current_user:
             return jsonify({'error': 'User not found'}), 404
@@ -255,12 +295,15 @@ def add_technician():
             if field not in data or not data[field]:
                 return jsonify({'error': f'{field.replace("_", " ").title()} is required'}), 400
         
+        if '@' in data['username']:
+            return jsonify({'error': 'Username cannot contain @'}), 400
+        
         # Check if username exists
-        if User.query.filter_by(username=data['username']).first():
+        if User.find_by_username(data['username']):
             return jsonify({'error': 'Username already exists'}), 400
         
         # Check if email exists
-        if User.query.filter_by(email=data['email']).first():
+        if User.find_by_email(data['email']):
             return jsonify({'error': 'Email already exists'}), 400
         
         # Validate password strength
@@ -285,6 +328,9 @@ def add_technician():
             'user': new_user.to_dict()
         }), 201
         
+    except HashingQueueFull:
+        db.session.rollback()
+        return service_busy_response()
     except Exception as e:
         current_app.logger.error(f"Add technician error: {str(e)}")
         db.session.rollback()
@@ -295,13 +341,25 @@ def add_technician():
 @bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    """Logout user and clear cookies"""
+    """Logout user, revoke its tokens and clear cookies"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = load_current_user()
         if user:
             user.log_security_event("LOGOUT", get_client_ip())
         
+        # Copies of the cookies stop working too, not just the browser's
+        token_revocations.revoke(get_jwt())
+        refresh_cookie = request.cookies.get(current_app.config['JWT_REFRESH_COOKIE_NAME'])
+        if refresh_cookie:
+            try:
+                token_revocations.revoke(decode_token(refresh_cookie))
+            except Exception:
+                pass  # Expired or invalid: nothing to revoke
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # Already revoked by a concurrent logout
+        
         response = jsonify({'message': 'Logged out successfully'})
         unset_jwt_cookies(response)
         return response, 200
@@ -326,25 +384,19 @@ def request_password_reset():
         client_ip = get_client_ip()
         
         # Find user by email
-        user = User.query.filter_by(email=email).first()
+        user = User.find_by_email(email)
         
         # Always return success to prevent email enumeration
         if user and user.is_active:
-            # Generate reset token
-            token = user.generate_password_reset_token()
+            # Stage the token; it is committed together with the queued email below
+            token = user.generate_password_reset_token(commit=False)
             
-            # Send reset email
+            # Queue the reset email; the outbox worker delivers it (see app/outbox.py)
             try:
-                msg = Message(
-                    'Password Reset - MRC Authentication',
-                    sender=current_app.config['MAIL_DEFAULT_SENDER'],
-                    recipients=[user.email]
-                )
-                
                 # Simple text email with reset link
                 reset_url = f"http://localhost:3000/reset-password?token={token}&email={user.email}"
                 
-                msg.body = f"""Hello {user.full_name},
+                body = f"""Hello {user.full_name},
 
 You have requested a password reset for your MRC account.
 
@@ -359,13 +411,14 @@ Best regards,
 MRC Authentication System
 """
                 
-                mail.send(msg)
-                user.log_security_event("PASSWORD_RESET_EMAIL_SENT", client_ip)
+                email_outbox.enqueue(user.email, 'Password Reset - MRC Authentication', body)
+                db.session.commit()
+                user.log_security_event("PASSWORD_RESET_EMAIL_QUEUED", client_ip)
                 
             except Exception as e:
-                current_app.logger.error(f"Failed to send password reset email: {str(e)}")
-                # Clear token if email fails
-                user.clear_password_reset_token()
+                current_app.logger.error(f"Failed to queue password reset email: {str(e)}")
+                # Nothing was committed, so the rollback drops the token with the email
+                db.session.rollback()
                 return jsonify({'error': 'Failed to send reset email'}), 500
         else:
             # Log attempt for non-existent or inactive users
@@ -399,7 +452,7 @@ def reset_password():
         client_ip = get_client_ip()
         
         # Find user by email
-        user = User.query.filter_by(email=email).first()
+        user = User.find_by_email(email)
         
         if not user:
             current_app.logger.warning(f"Password reset attempted for non-existent email: {email} from IP {client_ip}")
@@ -420,6 +473,9 @@ def reset_password():
         
         return jsonify({'message': 'Password has been successfully reset'}), 200
         
+    except HashingQueueFull:
+        db.session.rollback()
+        return service_busy_response()
     except Exception as e:
         current_app.logger.error(f"Password reset error: {str(e)}")
         return jsonify({'error': 'Failed to reset password'}), 500
\ No newline at end of file
@@ -0,0 +1,450 @@
+"""
+Profile cache for MRC authentication system.
+Caches User.to_dict() payloads by user id so dashboard polls of /api/me skip the
+database. Entries are dropped when a commit touches the user (see models.py) and
+expire after PROFILE_CACHE_TTL seconds regardless.
+
+Backends:
+    memory  - bounded LRU+TTL dict in each worker process
+    shared  - one LRU+TTL store in a local cache server process (`flask cache-server`)
+              shared by all workers, so an invalidation in one worker is seen by all;
+              the same server also holds rate limit counters (see app/ratelimit.py)
+    none    - caching disabled
+
+The cache server speaks newline-delimited JSON over a unix socket (or TCP) and
+only answers clients that prove, by HMAC challenge-response, that they know
+CACHE_SERVER_AUTHKEY; clients check the server the same way. Nothing is
+unpickled, so a peer can at worst read or write cache entries.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import socket
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Thread-safe LRU dict whose entries expire ttl seconds (or a per-entry ttl) after being set"""
+
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Generation of each recently invalidated key; keys dropped from this bounded
+        # map read as the floor, the newest generation dropped, so they still compare
+        # unequal to anything read before their invalidation
+        self._generation = 0
+        self._invalidated = OrderedDict()
+        self._generation_floor = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self._clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return dict(value)
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def _store(self, key, value, ttl=None):
+        self._data[key] = (self._clock() + (self.ttl if ttl is None else ttl), dict(value))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def generation(self, key):
+        """Token that changes whenever key is invalidated; read it before loading a value to set"""
+        with self._lock:
+            return self._invalidated.get(key, self._generation_floor)
+
+    def invalidate(self, key):
+        """Delete key and refuse set_unless_invalidated() calls for values read before now"""
+        with self._lock:
+            self._data.pop(key, None)
+            self._generation += 1
+            self._invalidated[key] = self._generation
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.maxsize:
+                _, self._generation_floor = self._invalidated.popitem(last=False)
+
+    def set_unless_invalidated(self, key, value, generation):
+        """set() if key has not been invalidated since generation() returned generation"""
+        with self._lock:
+            if self._invalidated.get(key, self._generation_floor) != generation:
+                return False
+            self._store(key, value)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def size(self):
+        with self._lock:
+            return len(self._data)
+
+
+class CacheServerError(Exception):
+    """The cache server refused a request, failed it, or broke protocol"""
+
+
+# Methods clients may call on each object the cache server holds
+SERVER_METHODS = {
+    'store': ('get', 'set', 'delete', 'clear', 'size', 'generation', 'invalidate', 'set_unless_invalidated'),
+    'limits': ('incr', 'get', 'get_expiry', 'clear', 'reset', 'check', 'acquire_entry', 'get_moving_window'),
+}
+MAX_MESSAGE_BYTES = 1 << 20
+MIN_AUTHKEY_LENGTH = 16
+
+
+def parse_address(address):
+    """'unix:/path' or '/path' -> socket path; 'host:port' -> (host, port)"""
+    if address.startswith('unix:'):
+        return address[len('unix:'):]
+    if address.startswith('/'):
+        return address
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def check_authkey(authkey):
+    """CACHE_SERVER_AUTHKEY as bytes; missing or short keys are refused"""
+    if isinstance(authkey, str):
+        authkey = authkey.encode()
+    if not authkey or len(authkey) < MIN_AUTHKEY_LENGTH:
+        raise ValueError(f'CACHE_SERVER_AUTHKEY must be set to a secret of at least '
+                         f'{MIN_AUTHKEY_LENGTH} characters to use the cache server')
+    return authkey
+
+
+def proof(authkey, role, challenge):
+    """HMAC showing the peer in `role` knows authkey, without sending it"""
+    return hmac.new(authkey, f'{role}:{challenge}'.encode(), hashlib.sha256).hexdigest()
+
+
+def send_message(stream, message):
+    stream.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+    stream.flush()
+
+
+def receive_message(stream):
+    """One newline-delimited JSON message, or None at end of stream"""
+    line = stream.readline(MAX_MESSAGE_BYTES + 1)
+    if not line:
+        return None
+    if not line.endswith(b'\n'):
+        raise CacheServerError('Message too long or truncated')
+    try:
+        message = json.loads(line)
+    except ValueError as e:
+        raise CacheServerError(f'Malformed message: {e}')
+    if not isinstance(message, dict):
+        raise CacheServerError('Malformed message')
+    return message
+
+
+class CacheRequestHandler(socketserver.StreamRequestHandler):
+    """One client connection: mutual challenge-response, then JSON method calls"""
+
+    def handle(self):
+        server = self.server
+        challenge = secrets.token_hex(16)
+        send_message(self.wfile, {'challenge': challenge})
+        hello = receive_message(self.rfile)
+        if hello is None or not hmac.compare_digest(str(hello.get('auth', '')),
+                                                    proof(server.authkey, 'client', challenge)):
+            logger.warning("Cache server: rejected unauthenticated client %s", self.client_address)
+            return
+        send_message(self.wfile, {'auth': proof(server.authkey, 'server', str(hello.get('challenge', '')))})
+
+        while True:
+            request = receive_message(self.rfile)
+            if request is None:
+                return
+            target, method, args = request.get('obj'), request.get('method'), request.get('args', [])
+            if method not in SERVER_METHODS.get(target, ()) or not isinstance(args, list):
+                send_message(self.wfile, {'error': f'Unknown method {target}.{method}'})
+                continue
+            try:
+                result = getattr(server.objects[target], method)(*args)
+            except Exception as e:
+                send_message(self.wfile, {'error': f'{type(e).__name__}: {e}'})
+                continue
+            send_message(self.wfile, {'result': result})
+
+
+class CacheServerMixin(socketserver.ThreadingMixIn):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        logger.warning("Cache server: connection from %s failed", client_address, exc_info=True)
+
+
+class TCPCacheServer(CacheServerMixin, socketserver.TCPServer):
+    @property
+    def address(self):
+        return '%s:%d' % self.server_address[:2]
+
+
+class UnixCacheServer(CacheServerMixin, socketserver.UnixStreamServer):
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)  # left behind by a previous run
+        old_umask = os.umask(0o177)  # socket usable by this user only
+        try:
+            super().server_bind()
+        finally:
+            os.umask(old_umask)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+    @property
+    def address(self):
+        return f'unix:{self.server_address}'
+
+
+def make_cache_server(address, authkey, maxsize=1024, ttl=300):
+    """Build (not start) the cache server: shared profile store and rate limit counters"""
+    from limits.storage import MemoryStorage
+
+    parsed = parse_address(address)
+    server_class = UnixCacheServer if isinstance(parsed, str) else TCPCacheServer
+    server = server_class(parsed, CacheRequestHandler)
+    server.authkey = check_authkey(authkey)
+    server.objects = {'store': MemoryBackend(maxsize, ttl), 'limits': MemoryStorage()}
+    return server
+
+
+class CacheServerConnection:
+    """Per-thread authenticated connection to the cache server for calls on one of its objects"""
+
+    def __init__(self, address, authkey, name, timeout=5):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.authkey = check_authkey(authkey)
+        self.name = name
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.address)
+            stream = sock.makefile('rwb')
+            greeting = receive_message(stream) or {}
+            challenge = secrets.token_hex(16)
+            send_message(stream, {'auth': proof(self.authkey, 'client', str(greeting.get('challenge', ''))),
+                                  'challenge': challenge})
+            reply = receive_message(stream)
+            if reply is None or not hmac.compare_digest(str(reply.get('auth', '')),
+                                                        proof(self.authkey, 'server', challenge)):
+                raise CacheServerError('Cache server authentication failed (check CACHE_SERVER_AUTHKEY)')
+        except BaseException:
+            sock.close()
+            raise
+        return sock, stream
+
+    def call(self, method, *args):
+        """Call method on the server's object; raises OSError, EOFError or CacheServerError"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.sock, local.stream = self._connect()
+            local.pid = os.getpid()
+        try:
+            send_message(local.stream, {'obj': self.name, 'method': method, 'args': list(args)})
+            reply = receive_message(local.stream)
+        except BaseException:
+            self.reset()
+            raise
+        if reply is None:
+            self.reset()
+            raise EOFError('Cache server closed the connection')
+        if 'error' in reply:
+            raise CacheServerError(reply['error'])
+        return reply.get('result')
+
+    def reset(self):
+        """Drop this thread's connection so the next call reconnects"""
+        local = self._local
+        if getattr(local, 'pid', None) is not None:
+            if local.pid == os.getpid():
+                local.sock.close()
+            local.pid = None
+
+
+class SharedBackend:
+    """Profile store on the cache server"""
+
+    def __init__(self, address, authkey):
+        self.connection = CacheServerConnection(address, authkey, 'store')
+
+    def reset(self):
+        self.connection.reset()
+
+    def get(self, key):
+        return self.connection.call('get', key)
+
+    def set(self, key, value):
+        self.connection.call('set', key, value)
+
+    def delete(self, key):
+        self.connection.call('delete', key)
+
+    def generation(self, key):
+        return self.connection.call('generation', key)
+
+    def invalidate(self, key):
+        self.connection.call('invalidate', key)
+
+    def set_unless_invalidated(self, key, value, generation):
+        return self.connection.call('set_unless_invalidated', key, value, generation)
+
+    def clear(self):
+        self.connection.call('clear')
+
+    def size(self):
+        return self.connection.call('size')
+
+
+class ProfileCache:
+    """User profile payload cache with a pluggable backend and hit/miss counters"""
+
+    # Cache server errors are treated as misses; the database stays the source of truth
+    backend_errors = (OSError, EOFError, CacheServerError)
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.backend_name = 'none'
+        self._counter_lock = threading.Lock()
+        self._reset_counters()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Pick the backend from PROFILE_CACHE_BACKEND"""
+        self.backend_name = app.config.get('PROFILE_CACHE_BACKEND', 'memory')
+        maxsize = app.config.get('PROFILE_CACHE_SIZE', 1024)
+        ttl = app.config.get('PROFILE_CACHE_TTL', 300)
+        if self.backend_name == 'memory':
+            self.backend = MemoryBackend(maxsize, ttl)
+        elif self.backend_name == 'shared':
+            self.backend = SharedBackend(app.config['PROFILE_CACHE_SERVER'], app.config.get('CACHE_SERVER_AUTHKEY'))
+        elif self.backend_name == 'none':
+            self.backend = None
+        else:
+            raise ValueError(f"Unknown PROFILE_CACHE_BACKEND: {self.backend_name!r}")
+        self._reset_counters()
+        app.extensions['profile_cache'] = self
+
+    def _reset_counters(self):
+        self.counters = {'hits': 0, 'misses': 0, 'invalidations': 0, 'stale_sets': 0, 'errors': 0}
+
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def _call(self, method, *args):
+        try:
+            return getattr(self.backend, method)(*args)
+        except self.backend_errors as e:
+            logger.warning("Profile cache %s failed: %s", method, e)
+            self._count('errors')
+            if isinstance(self.backend, SharedBackend):
+                self.backend.reset()
+            return None
+
+    def get(self, user_id):
+        """Cached profile payload for user_id, or None"""
+        if self.backend is None:
+            return None
+        payload = self._call('get', user_id)
+        self._count('hits' if payload is not None else 'misses')
+        return payload
+
+    def generation(self, user_id):
+        """Read before loading a profile to cache; pass to set() so an invalidation in between wins"""
+        if self.backend is None:
+            return None
+        generation = self._call('generation', user_id)
+        return -1 if generation is None else generation  # server unreachable: -1 never matches
+
+    def set(self, user_id, payload, generation=None):
+        """Cache a profile payload, unless user_id was invalidated since generation was read"""
+        if self.backend is None:
+            return
+        if generation is None:
+            self._call('set', user_id, payload)
+        elif self._call('set_unless_invalidated', user_id, payload, generation) is False:
+            self._count('stale_sets')
+
+    def invalidate(self, user_id):
+        """Drop the cached profile for user_id"""
+        if self.backend is not None and user_id is not None:
+            self._call('invalidate', user_id)
+            self._count('invalidations')
+
+    def clear(self):
+        """Drop every cached profile"""
+        if self.backend is not None:
+            self._call('clear')
+
+    def metrics(self):
+        """Cache counters for monitoring"""
+        with self._counter_lock:
+            counters = dict(self.counters)
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_ratio'] = round(counters['hits'] / lookups, 4) if lookups else None
+        counters['backend'] = self.backend_name
+        counters['size'] = self._call('size') if self.backend is not None else 0
+        return counters
+
+
+@click.command('cache-server')
+@with_appcontext
+def cache_server_command():
+    """Run the shared cache server (profile cache and mrc-shared:// rate limits)"""
+    config = current_app.config
+    try:
+        server = make_cache_server(
+            config['PROFILE_CACHE_SERVER'],
+            config.get('CACHE_SERVER_AUTHKEY'),
+            config.get('PROFILE_CACHE_SIZE', 1024),
+            config.get('PROFILE_CACHE_TTL', 300)
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Profile cache server listening on {server.address}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,40 @@
+"""
+Client IP resolution for MRC authentication system.
+X-Forwarded-For is only honoured for the PROXY_TRUSTED_HOPS proxies we run
+(werkzeug's ProxyFix rewrites REMOTE_ADDR once per request); the result is
+resolved at most once per request, cached on g and shared by the rate limiter
+key function and security logging.
+"""
+import ipaddress
+from flask import g, has_request_context, request
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+
+def resolve_client_ip():
+    """Normalized REMOTE_ADDR (already rewritten by ProxyFix for trusted hops)"""
+    remote_addr = request.environ.get('REMOTE_ADDR') or ''
+    try:
+        return str(ipaddress.ip_address(remote_addr.strip()))
+    except ValueError:
+        return remote_addr or '127.0.0.1'
+
+
+def get_client_ip():
+    """Client IP for rate limiting and logging, cached on g for the request"""
+    if not has_request_context():
+        return '127.0.0.1'
+    if 'client_ip' not in g:
+        g.client_ip = resolve_client_ip()
+    return g.client_ip
+
+
+def configure_proxy(app):
+    """Trust PROXY_TRUSTED_HOPS proxies in front of the app"""
+    hops = app.config.get('PROXY_TRUSTED_HOPS', 0)
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=0, x_port=0, x_prefix=0)
+
+    # g can outlive the request (an app context pushed around several requests)
+    @app.teardown_request
+    def clear_client_ip(exc=None):
+        g.pop('client_ip', None)
@@ -0,0 +1,85 @@
+"""
+Database engine configuration for MRC authentication system.
+Server databases (PostgreSQL in production) get a sized, pre-pinged connection
+pool with a statement timeout; SQLite gets the SQLITE_* pragmas applied to every
+new DBAPI connection, so readers are not blocked by login writes (WAL) and
+concurrent workers wait for the write lock instead of failing with
+`database is locked`.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# (pragma, config key, value type); a None config value keeps SQLite's default
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'SQLITE_JOURNAL_MODE', str),
+    ('synchronous', 'SQLITE_SYNCHRONOUS', str),
+    ('busy_timeout', 'SQLITE_BUSY_TIMEOUT', int),
+    ('mmap_size', 'SQLITE_MMAP_SIZE', int),
+    ('cache_size', 'SQLITE_CACHE_SIZE', int),
+)
+
+
+def sqlite_pragmas(config):
+    """Validated (pragma, value) pairs to apply for this config"""
+    pragmas = []
+    for pragma, key, kind in SQLITE_PRAGMAS:
+        value = config.get(key)
+        if value is None:
+            continue
+        value = kind(value)
+        if kind is str and not value.isalpha():
+            raise ValueError(f"Invalid {key}: {value!r}")
+        pragmas.append((pragma, value))
+    return pragmas
+
+
+def configure_sqlite_engine(engine, config):
+    """Register a connect listener setting the SQLite pragmas; no-op for other backends"""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(config)
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, value in pragmas:
+                cursor.execute(f'PRAGMA {pragma}={value}')
+        finally:
+            cursor.close()
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database URI"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        # Flask-SQLAlchemy picks the pool for SQLite (StaticPool for :memory:)
+        return {}
+    options = {
+        'pool_size': config.get('DATABASE_POOL_SIZE', 5),
+        'max_overflow': config.get('DATABASE_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DATABASE_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DATABASE_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DATABASE_POOL_PRE_PING', True),
+    }
+    statement_timeout = config.get('DATABASE_STATEMENT_TIMEOUT')
+    if statement_timeout and url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout)}'}
+    return options
+
+
+def pool_status(engine):
+    """Connection pool counters for monitoring"""
+    pool = engine.pool
+    status = {'pool': type(pool).__name__}
+    # Only queue-based pools track size and overflow
+    if hasattr(pool, 'checkedout'):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    return status
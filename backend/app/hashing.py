@@ -0,0 +1,193 @@
+"""
+Password hashing executor for MRC authentication system.
+Runs bcrypt work in a bounded process pool so request threads are not pinned by hashing CPU.
+"""
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+import bcrypt
+
+
+class HashingQueueFull(Exception):
+    """Raised when the hashing executor has no free queue slots"""
+
+
+class HashingTimeout(HashingQueueFull):
+    """Raised when queued hashing work doesn't finish within HASHING_TIMEOUT (the pool is saturated)"""
+
+
+DEFAULT_ROUNDS = 12  # bcrypt library default
+
+
+def _hash_password(password_bytes, rounds):
+    """Hash password bytes with a fresh bcrypt salt (runs in pool worker)"""
+    return bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check_password(password_bytes, hash_bytes):
+    """Verify password bytes against a bcrypt hash (runs in pool worker)"""
+    return bcrypt.checkpw(password_bytes, hash_bytes)
+
+
+def hash_rounds(password_hash):
+    """Return the bcrypt cost factor encoded in a hash ('$2b$12$...' -> 12)"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def calibrate_rounds(target_ms, min_rounds=10, max_rounds=16, samples=3):
+    """Pick the highest bcrypt cost whose hash time stays within target_ms on this machine"""
+    password_bytes = b'calibration-password'
+    salt = bcrypt.gensalt(min_rounds)
+    best = None
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.hashpw(password_bytes, salt)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        best = elapsed_ms if best is None else min(best, elapsed_ms)
+
+    # Each extra round doubles the work
+    if best <= 0 or target_ms <= best:
+        return min_rounds
+    extra = int(math.floor(math.log2(target_ms / best)))
+    return max(min_rounds, min(max_rounds, min_rounds + extra))
+
+
+class HashingExecutor:
+    """Bounded process pool for bcrypt hashing and verification"""
+
+    def __init__(self, app=None):
+        self.pool_size = 0
+        self.rounds = DEFAULT_ROUNDS
+        self.rounds_explicit = False
+        self.queue_depth = 0
+        self.timeout = None
+        self._pool = None
+        self._slots = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the pool from app config and start it"""
+        self.shutdown()
+        self.pool_size = app.config.get('HASHING_POOL_SIZE', os.cpu_count() or 1)
+        self.queue_depth = app.config.get('HASHING_QUEUE_DEPTH', 64)
+        self.timeout = app.config.get('HASHING_TIMEOUT', 10)
+        self.rounds = self._configure_rounds(app)
+        self._slots = threading.BoundedSemaphore(self.queue_depth)
+        if self.pool_size > 0:
+            self._start()
+        app.extensions['hashing'] = self
+
+    def _configure_rounds(self, app):
+        """Use BCRYPT_ROUNDS if set, otherwise the host's calibrated cost, stored in config"""
+        rounds = app.config.get('BCRYPT_ROUNDS')
+        self.rounds_explicit = rounds is not None
+        if rounds is None:
+            if app.config.get('BCRYPT_CALIBRATE', True):
+                rounds = self._calibrated_rounds(app)
+            else:
+                rounds = DEFAULT_ROUNDS
+            app.config['BCRYPT_ROUNDS'] = rounds
+        return int(rounds)
+
+    @staticmethod
+    def _calibrated_rounds(app):
+        """Calibrate once per host: the first worker's result is kept in BCRYPT_ROUNDS_FILE for the rest
+
+        Workers calibrating separately could pick different costs and rehash the
+        same accounts back and forth on alternate logins.
+        """
+        path = app.config.get('BCRYPT_ROUNDS_FILE') or os.path.join(app.instance_path, 'bcrypt-rounds')
+        try:
+            with open(path) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            pass
+
+        rounds = calibrate_rounds(
+            app.config.get('BCRYPT_TARGET_MS', 100),
+            app.config.get('BCRYPT_MIN_ROUNDS', 10),
+            app.config.get('BCRYPT_MAX_ROUNDS', 16)
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}'
+        with open(temp_path, 'w') as f:
+            f.write(str(rounds))
+        try:
+            os.link(temp_path, path)  # fails if another worker stored its result first
+        except FileExistsError:
+            with open(path) as f:
+                rounds = int(f.read())
+        finally:
+            os.unlink(temp_path)
+        return rounds
+
+    def _start(self):
+        """Create the process pool (workers are spawned on first submit)"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.pool_size)
+        return self._pool
+
+    def _reset_after_fork(self):
+        """Drop the inherited pool in forked children; it is recreated on demand"""
+        self._pool = None
+        self._lock = threading.Lock()
+        if self._slots is not None:
+            self._slots = threading.BoundedSemaphore(self.queue_depth)
+
+    def shutdown(self, wait=True):
+        """Stop the process pool"""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def _run(self, fn, *args):
+        """Run fn in the pool, or inline when the pool is disabled"""
+        if self.pool_size <= 0:
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise HashingQueueFull(f"Hashing queue full ({self.queue_depth} pending)")
+        try:
+            future = (self._pool or self._start()).submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        timed_out = False
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # The work still occupies a worker: hold its slot until it finishes
+            timed_out = True
+            future.add_done_callback(lambda _: self._slots.release())
+            raise HashingTimeout(f"Hashing did not finish within {self.timeout}s") from None
+        finally:
+            if not timed_out:
+                self._slots.release()
+
+    def hash_password(self, password):
+        """Hash a plaintext password"""
+        return self._run(_hash_password, password.encode('utf-8'), self.rounds)
+
+    def check_password(self, password, password_hash):
+        """Check a plaintext password against a stored hash"""
+        return self._run(_check_password, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    def needs_rehash(self, password_hash):
+        """True when a stored hash was made with a cost other than the configured one
+
+        Only an explicit BCRYPT_ROUNDS lowers the cost of existing hashes; a
+        calibrated cost only ever raises it.
+        """
+        rounds = hash_rounds(password_hash)
+        if rounds is not None and rounds > self.rounds and not self.rounds_explicit:
+            return False
+        return rounds != self.rounds
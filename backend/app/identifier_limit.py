@@ -0,0 +1,195 @@
+"""
+Per-identifier login limiting for MRC authentication system.
+Counts wrong-password failures per existing account's submitted username/email
+in a fixed-size count-min sketch split into time buckets, so credential stuffing
+against one account from many IPs is rejected before any database lookup or
+bcrypt work. Identifiers that match no user are not counted: they can't be
+stuffed, and spraying them would only fill the sketch until every estimate is
+over the limit. Counts are per worker process.
+"""
+import hashlib
+import math
+import threading
+import time
+from array import array
+
+
+def sketch_width(max_failures, expected_failures):
+    """Width keeping collision overcounts under half the limit at the expected volume
+
+    A count-min row overcounts by at most e * total / width with probability
+    1 - 1/e, and each extra row makes the miss e times less likely.
+    """
+    return max(64, math.ceil(2 * math.e * expected_failures / max(max_failures, 1)))
+
+
+class DecayingCountMinSketch:
+    """Count-min sketch over a sliding window made of `buckets` rotating sub-sketches
+
+    Each bucket is updated conservatively (only the key's smallest cells grow), and
+    a key's estimate is the sum of its per-bucket estimates.
+    """
+
+    def __init__(self, width=2048, depth=4, window=900, buckets=15, clock=time.monotonic):
+        self.width = width
+        self.depth = depth
+        self.buckets = buckets
+        self.bucket_seconds = window / buckets
+        self._clock = clock
+        self._tables = [self._empty_table() for _ in range(buckets)]
+        self._totals = [0] * buckets
+        self._epochs = [None] * buckets
+
+    def _empty_table(self):
+        return array('I', bytes(4 * self.width * self.depth))
+
+    @property
+    def memory_bytes(self):
+        return self.buckets * self.depth * self.width * 4
+
+    def _cells(self, key):
+        """One cell per row, via double hashing of a single digest"""
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def _current_epoch(self):
+        """Epoch of the current bucket, recycling its slot if it last held an expired epoch"""
+        epoch = int(self._clock() // self.bucket_seconds)
+        slot = epoch % self.buckets
+        if self._epochs[slot] != epoch:
+            self._tables[slot] = self._empty_table()
+            self._totals[slot] = 0
+            self._epochs[slot] = epoch
+        return epoch
+
+    def _live_slots(self, epoch):
+        return [
+            slot for slot, slot_epoch in enumerate(self._epochs)
+            if slot_epoch is not None and epoch - slot_epoch < self.buckets
+        ]
+
+    def add(self, key, count=1):
+        epoch = self._current_epoch()
+        slot = epoch % self.buckets
+        table = self._tables[slot]
+        cells = self._cells(key)
+        target = min(table[cell] for cell in cells) + count
+        for cell in cells:
+            if table[cell] < target:
+                table[cell] = target
+        self._totals[slot] += count
+
+    def _bucket_estimates(self, key):
+        """(epoch, estimate) of the key in each live bucket, oldest first"""
+        epoch = self._current_epoch()
+        cells = self._cells(key)
+        return sorted(
+            (self._epochs[slot], min(self._tables[slot][cell] for cell in cells))
+            for slot in self._live_slots(epoch)
+        )
+
+    def estimate(self, key):
+        """Upper-bound estimate of the key's count within the window"""
+        return sum(count for _, count in self._bucket_estimates(key))
+
+    def total(self):
+        """Everything counted within the window, over all keys"""
+        epoch = self._current_epoch()
+        return sum(self._totals[slot] for slot in self._live_slots(epoch))
+
+    def seconds_until_below(self, key, limit):
+        """Seconds until enough buckets leave the window for the key's estimate to drop under limit"""
+        buckets = self._bucket_estimates(key)
+        remaining = sum(count for _, count in buckets)
+        now = self._clock()
+        below_at = now
+        for epoch, count in buckets:
+            if remaining < limit:
+                break
+            remaining -= count
+            below_at = (epoch + self.buckets) * self.bucket_seconds
+        return below_at - now
+
+    def clear(self):
+        self._tables = [self._empty_table() for _ in range(self.buckets)]
+        self._totals = [0] * self.buckets
+        self._epochs = [None] * self.buckets
+
+
+class LoginIdentifierLimiter:
+    """Rejects logins for identifiers with too many recent failures"""
+
+    def __init__(self, app=None):
+        self.max_failures = 0
+        self.expected_failures = 0
+        self.sketch = None
+        self.rejected = 0
+        self.saturated = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Size the sketch from config; LOGIN_IDENTIFIER_MAX_FAILURES = 0 disables"""
+        self.max_failures = app.config.get('LOGIN_IDENTIFIER_MAX_FAILURES', 10)
+        self.expected_failures = app.config.get('LOGIN_IDENTIFIER_EXPECTED_FAILURES', 10000)
+        self.sketch = DecayingCountMinSketch(
+            width=(app.config.get('LOGIN_IDENTIFIER_SKETCH_WIDTH')
+                   or sketch_width(self.max_failures, self.expected_failures)),
+            depth=app.config.get('LOGIN_IDENTIFIER_SKETCH_DEPTH', 4),
+            window=app.config.get('LOGIN_IDENTIFIER_WINDOW', 900),
+            buckets=app.config.get('LOGIN_IDENTIFIER_BUCKETS', 15)
+        )
+        self.rejected = 0
+        self.saturated = 0
+        app.extensions['login_identifier_limiter'] = self
+
+    @staticmethod
+    def _key(identifier):
+        from app.models import normalize_identifier
+        return normalize_identifier(identifier)
+
+    def _limit(self):
+        """The failure limit, raised by the collision bound once the sketch is past its sizing"""
+        total = self.sketch.total()
+        if total <= self.expected_failures:
+            return self.max_failures
+        self.saturated += 1
+        return self.max_failures + math.ceil(math.e * total / self.sketch.width)
+
+    def retry_after(self, identifier):
+        """Seconds to wait if the identifier is over its limit, else 0"""
+        if not self.max_failures:
+            return 0
+        with self._lock:
+            key = self._key(identifier)
+            limit = self._limit()
+            if self.sketch.estimate(key) < limit:
+                return 0
+            self.rejected += 1
+            return max(1, math.ceil(self.sketch.seconds_until_below(key, limit)))
+
+    def record_failure(self, identifier):
+        """Count a wrong password for an existing account against the identifier"""
+        if self.max_failures:
+            with self._lock:
+                self.sketch.add(self._key(identifier))
+
+    def reset(self):
+        with self._lock:
+            if self.sketch is not None:
+                self.sketch.clear()
+            self.rejected = 0
+            self.saturated = 0
+
+    def metrics(self):
+        """Limiter counters for monitoring"""
+        return {
+            'rejected': self.rejected,
+            'saturated_checks': self.saturated,
+            'max_failures': self.max_failures,
+            'window_failures': self.sketch.total() if self.sketch else 0,
+            'sketch_bytes': self.sketch.memory_bytes if self.sketch else 0
+        }
@@ -0,0 +1,72 @@
+"""
+JSON encoding for MRC API responses.
+JSON_PROVIDER picks the encoder behind jsonify(), dict returns from views and
+request.get_json(): 'orjson' (pip install orjson), 'stdlib' (Flask's default,
+the json module) or 'auto', orjson when it is installed. Both encode what the
+API returns the same way (sorted keys, compact separators, dates as HTTP
+dates); orjson writes non-ASCII characters as UTF-8 instead of \\u escapes.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: pip install orjson
+    orjson = None
+
+PROVIDERS = ('auto', 'orjson', 'stdlib')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask's JSON provider with orjson doing the encoding and decoding"""
+
+    def _option(self):
+        # datetime and date go through self.default (HTTP dates, like the stdlib provider)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def _encode(self, obj):
+        """UTF-8 JSON bytes, or None for what only the json module can encode (e.g. ints beyond 64 bits)"""
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._option())
+        except TypeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            encoded = self._encode(obj)
+            if encoded is not None:
+                return encoded.decode()
+        return super().dumps(obj, **kwargs)  # indent, cls, ... are json module options
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)  # indented for reading
+        encoded = self._encode(self._prepare_response_obj(args, kwargs))
+        if encoded is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(encoded + b'\n', mimetype=self.mimetype)
+
+
+def json_provider_class(name):
+    """The provider class for a JSON_PROVIDER setting"""
+    if name not in PROVIDERS:
+        raise ValueError(f"JSON_PROVIDER must be one of {', '.join(PROVIDERS)}, not {name!r}")
+    if name == 'orjson' and orjson is None:
+        raise RuntimeError("JSON_PROVIDER = 'orjson' needs the orjson package (pip install orjson)")
+    if name == 'stdlib' or orjson is None:
+        return DefaultJSONProvider
+    return OrjsonProvider
+
+
+def init_json(app):
+    """Install the JSON_PROVIDER encoder on app"""
+    provider_class = json_provider_class(app.config.get('JSON_PROVIDER', 'auto'))
+    app.json_provider_class = provider_class
+    app.json = provider_class(app)
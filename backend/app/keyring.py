@@ -0,0 +1,333 @@
+"""
+Asymmetric JWT signing keys for MRC authentication system.
+With JWT_ALGORITHM set to EdDSA (Ed25519) or RS256, tokens are
+signed with the private half of a key pair and carry its `kid`; anything
+holding the public keys from /api/auth/.well-known/jwks.json can verify them
+without calling the auth API or knowing a secret. HS* algorithms keep using
+JWT_SECRET_KEY and publish no keys.
+
+Keys live in JWT_KEY_DIR as one <kid>.json file each (private key PEM plus
+activation time) shared by every worker, which re-reads the directory when it
+changes. `flask jwt-keys rotate`, run daily, adds a key JWT_KEY_PUBLISH_AHEAD
+seconds before it starts signing, so verifiers' cached JWKS already list it,
+once the signing key is JWT_KEY_ROTATION_DAYS old, and removes a retired key
+only after every token it signed has expired.
+"""
+import base64
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+logger = logging.getLogger(__name__)
+
+KEY_SUFFIX = '.json'
+LOCK_FILE = '.lock'
+# RFC 7638 thumbprint members per key type
+THUMBPRINT_MEMBERS = {'OKP': ('crv', 'kty', 'x'), 'RSA': ('e', 'kty', 'n')}
+
+
+def _generate_private_key(algorithm, rsa_key_size=2048):
+    if algorithm == 'EdDSA':
+        from cryptography.hazmat.primitives.asymmetric import ed25519
+        return ed25519.Ed25519PrivateKey.generate()
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    return rsa.generate_private_key(public_exponent=65537, key_size=rsa_key_size)
+
+
+def public_jwk(algorithm, public_key):
+    """Public JWK for a key, with its RFC 7638 thumbprint as kid"""
+    import jwt
+    jwk = jwt.get_algorithm_by_name(algorithm).to_jwk(public_key, as_dict=True)
+    members = {name: jwk[name] for name in THUMBPRINT_MEMBERS[jwk['kty']]}
+    digest = hashlib.sha256(json.dumps(members, separators=(',', ':'), sort_keys=True).encode()).digest()
+    jwk.update(kid=base64.urlsafe_b64encode(digest).rstrip(b'=').decode(), alg=algorithm, use='sig')
+    return jwk
+
+
+class SigningKey:
+    """One key pair of the ring and the time it starts signing"""
+
+    def __init__(self, algorithm, private_key, activates_at, created_at=None):
+        self.algorithm = algorithm
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
+        self.activates_at = activates_at
+        self.created_at = created_at or datetime.now(timezone.utc)
+        self.jwk = public_jwk(algorithm, self.public_key)
+        self.kid = self.jwk['kid']
+
+    @classmethod
+    def generate(cls, algorithm, activates_at, rsa_key_size=2048):
+        return cls(algorithm, _generate_private_key(algorithm, rsa_key_size), activates_at)
+
+    @classmethod
+    def from_dict(cls, data):
+        from cryptography.hazmat.primitives.serialization import load_pem_private_key
+        return cls(data['alg'], load_pem_private_key(data['private_key'].encode(), password=None),
+                   datetime.fromisoformat(data['activates_at']), datetime.fromisoformat(data['created_at']))
+
+    def to_dict(self):
+        from cryptography.hazmat.primitives import serialization
+        pem = self.private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                             serialization.NoEncryption())
+        return {'kid': self.kid, 'alg': self.algorithm, 'created_at': self.created_at.isoformat(),
+                'activates_at': self.activates_at.isoformat(), 'private_key': pem.decode()}
+
+
+class SigningKeyRing:
+    """kid-tagged signing keys shared through JWT_KEY_DIR, with scheduled rotation"""
+
+    ALGORITHMS = ('EdDSA', 'RS256')
+
+    def __init__(self, app=None):
+        self.app = None
+        self.algorithm = 'HS256'
+        self.directory = None
+        self.rotation_interval = timedelta(days=30)
+        self.publish_ahead = timedelta(days=1)
+        self.reload_interval = 30
+        self.rsa_key_size = 2048
+        self.keys = {}
+        self.jwks_json = b'{"keys":[]}'
+        self._dir_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._signing = threading.local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure from app config; keys are loaded (and the first one created) on first use"""
+        self.app = app
+        self.algorithm = app.config.get('JWT_ALGORITHM', 'HS256')
+        if self.enabled and self.algorithm not in self.ALGORITHMS:
+            raise ValueError(f"JWT_ALGORITHM must be HS* or one of {', '.join(self.ALGORITHMS)}")
+        # Relative to the instance folder, never the working directory, so every worker shares one ring
+        self.directory = os.path.join(app.instance_path, app.config.get('JWT_KEY_DIR') or 'jwt-keys')
+        self.rotation_interval = timedelta(days=app.config.get('JWT_KEY_ROTATION_DAYS', 30))
+        self.publish_ahead = timedelta(seconds=app.config.get('JWT_KEY_PUBLISH_AHEAD', 86400))
+        self.reload_interval = app.config.get('JWT_KEY_RELOAD_INTERVAL', 30)
+        self.rsa_key_size = app.config.get('JWT_RSA_KEY_SIZE', 2048)
+        self.keys = {}
+        self._dir_mtime = None
+        self._checked_at = 0.0
+        app.extensions['jwt_keys'] = self
+
+    @property
+    def enabled(self):
+        return not self.algorithm.startswith('HS')
+
+    @property
+    def max_token_lifetime(self):
+        """Longest a token signed now stays valid (a retired key is kept this long)"""
+        config = self.app.config
+        lifetimes = [config.get('JWT_ACCESS_TOKEN_EXPIRES'), config.get('JWT_REFRESH_TOKEN_EXPIRES')]
+        return max((value if isinstance(value, timedelta) else timedelta(seconds=value or 0))
+                   for value in lifetimes)
+
+    # Flask-JWT-Extended callbacks
+
+    def headers_callback(self, identity):
+        """additional_headers_loader: pick the signing key for this token and tag it with its kid"""
+        if not self.enabled:
+            return {}
+        key = self.signing_key()
+        # The encode key loader runs next in this thread; hand it the same key
+        self._signing.key = key
+        return {'kid': key.kid}
+
+    def encode_key_callback(self, identity):
+        """encode_key_loader: the key headers_callback chose"""
+        if not self.enabled:
+            return current_app.config['JWT_SECRET_KEY']
+        key = getattr(self._signing, 'key', None) or self.signing_key()
+        self._signing.key = None
+        return key.private_key
+
+    def decode_key_callback(self, jwt_header, jwt_payload):
+        """decode_key_loader: public key named by the token's kid"""
+        if not self.enabled:
+            return current_app.config['JWT_SECRET_KEY']
+        from jwt.exceptions import DecodeError
+        kid = jwt_header.get('kid')
+        self._maybe_reload()
+        key = self.keys.get(kid)
+        if key is None and kid is not None:
+            # Possibly added by another worker since our last look
+            self._maybe_reload(force=True)
+            key = self.keys.get(kid)
+        if key is None:
+            raise DecodeError("Token signed with an unknown key")
+        return key.public_key
+
+    # Key selection
+
+    def signing_key(self, now=None):
+        """Newest key whose activation time has passed"""
+        self._maybe_reload()
+        if not self.keys:
+            self.bootstrap()
+        now = now or datetime.now(timezone.utc)
+        keys = sorted(self.keys.values(), key=lambda key: (key.activates_at, key.kid))
+        active = [key for key in keys if key.activates_at <= now]
+        # Only pending keys (clock behind the host that made them): sign with the earliest
+        return active[-1] if active else keys[0]
+
+    def jwks(self):
+        """JWKS document (bytes) listing every key tokens may be signed with"""
+        self._maybe_reload()
+        return self.jwks_json
+
+    # Storage
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialise key creation and removal across workers and the CLI"""
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        with open(os.path.join(self.directory, LOCK_FILE), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_key(self, key):
+        path = os.path.join(self.directory, key.kid + KEY_SUFFIX)
+        tmp_path = f'{path}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(key.to_dict(), fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+
+    def load(self):
+        """Read every key file in JWT_KEY_DIR"""
+        keys = {}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if not name.endswith(KEY_SUFFIX):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as fh:
+                    key = SigningKey.from_dict(json.load(fh))
+            except (OSError, ValueError, KeyError):
+                logger.exception("Skipping unreadable JWT key file %s", name)
+                continue
+            if key.algorithm == self.algorithm:
+                keys[key.kid] = key
+        with self._lock:
+            removed = set(self.keys) - set(keys)
+            self.keys = keys
+            jwks = {'keys': [key.jwk for key in sorted(keys.values(), key=lambda key: key.activates_at)]}
+            self.jwks_json = json.dumps(jwks, separators=(',', ':')).encode()
+        if removed:
+            # Cached claims would otherwise outlive the key that signed them
+            manager = self.app.extensions.get('flask-jwt-extended')
+            if hasattr(manager, 'clear_decode_cache'):
+                manager.clear_decode_cache()
+        return keys
+
+    def _maybe_reload(self, force=False):
+        """Re-read the directory if it changed; stat at most every JWT_KEY_RELOAD_INTERVAL seconds"""
+        now = time.monotonic()
+        if self._dir_mtime is not None:
+            # A forced reload (unknown kid) is still limited to once a second
+            if now - self._checked_at < (1 if force else self.reload_interval):
+                return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            mtime = 0
+        if mtime != self._dir_mtime:
+            self._dir_mtime = mtime
+            self.load()
+
+    def bootstrap(self):
+        """Create a first key, active immediately, if the directory has none"""
+        with self._exclusive():
+            if not self.load():
+                key = SigningKey.generate(self.algorithm, datetime.now(timezone.utc), self.rsa_key_size)
+                self._write_key(key)
+                logger.warning("Created JWT signing key %s (%s) in %s", key.kid, self.algorithm, self.directory)
+                self.load()
+
+    # Rotation
+
+    def rotate(self, force=False, now=None):
+        """Schedule a new key when the signing key is due and remove keys nothing can be signed by.
+
+        Returns (added key or None, kids removed).
+        """
+        now = now or datetime.now(timezone.utc)
+        added = None
+        with self._exclusive():
+            keys = sorted(self.load().values(), key=lambda key: (key.activates_at, key.kid))
+            newest = keys[-1] if keys else None
+            pending = newest is not None and newest.activates_at > now
+            due = newest is None or newest.activates_at + self.rotation_interval - self.publish_ahead <= now
+            if force or (due and not pending):
+                activates_at = now + self.publish_ahead if newest is not None else now
+                added = SigningKey.generate(self.algorithm, activates_at, self.rsa_key_size)
+                self._write_key(added)
+                keys.append(added)
+
+            # A key stops signing when its successor activates; its tokens expire
+            # at most max_token_lifetime after that
+            removed = []
+            for key, successor in zip(keys, keys[1:]):
+                if successor.activates_at + self.max_token_lifetime <= now:
+                    os.unlink(os.path.join(self.directory, key.kid + KEY_SUFFIX))
+                    removed.append(key.kid)
+            self.load()
+        return added, removed
+
+
+@click.group('jwt-keys')
+def jwt_keys_command():
+    """Manage the JWT signing key ring"""
+
+
+@jwt_keys_command.command('rotate')
+@click.option('--force', is_flag=True, help='Add a new key even if the current one is not due.')
+@with_appcontext
+def rotate_keys_command(force):
+    """Add the next signing key when due and remove expired ones (run daily)"""
+    ring = current_app.extensions['jwt_keys']
+    if not ring.enabled:
+        raise click.ClickException(f"JWT_ALGORITHM is {ring.algorithm}; tokens use JWT_SECRET_KEY")
+    added, removed = ring.rotate(force=force)
+    if added:
+        click.echo(f"Added key {added.kid}, signing from {added.activates_at.isoformat()}")
+    for kid in removed:
+        click.echo(f"Removed key {kid}")
+    if not added and not removed:
+        click.echo("No rotation due")
+
+
+@jwt_keys_command.command('list')
+@with_appcontext
+def list_keys_command():
+    """Show the keys in the ring and which one is signing"""
+    ring = current_app.extensions['jwt_keys']
+    if not ring.enabled:
+        raise click.ClickException(f"JWT_ALGORITHM is {ring.algorithm}; tokens use JWT_SECRET_KEY")
+    signing = ring.signing_key()
+    for key in sorted(ring.keys.values(), key=lambda key: key.activates_at):
+        state = 'signing' if key is signing else ('pending' if key.activates_at > datetime.now(timezone.utc)
+                                                   else 'retired')
+        click.echo(f"{key.kid}  {key.algorithm}  from {key.activates_at.isoformat()}  {state}")
@@ -0,0 +1,112 @@
+"""
+Write-behind buffer for last login timestamps.
+Successful logins record their timestamp in memory; a background thread flushes
+them in one bulk UPDATE every LAST_LOGIN_FLUSH_INTERVAL seconds, every
+LAST_LOGIN_FLUSH_SIZE entries and at interpreter shutdown.
+"""
+import atexit
+import logging
+import threading
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginBuffer:
+    """In-process buffer of pending last_login writes keyed by user id"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.flush_interval = 5
+        self.flush_size = 100
+        self._pending = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure from app config; the flusher thread starts on first use"""
+        self.app = app
+        self.enabled = app.config.get('LAST_LOGIN_WRITE_BEHIND', False)
+        self.flush_interval = app.config.get('LAST_LOGIN_FLUSH_INTERVAL', 5)
+        self.flush_size = app.config.get('LAST_LOGIN_FLUSH_SIZE', 100)
+        if self.enabled:
+            atexit.register(self.flush)
+        app.extensions['last_login_buffer'] = self
+
+    def record(self, user_id, timestamp):
+        """Queue a last_login write for user_id"""
+        with self._lock:
+            self._pending[user_id] = timestamp
+            full = len(self._pending) >= self.flush_size
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def get(self, user_id):
+        """Pending (not yet flushed) last_login for user_id, or None"""
+        with self._lock:
+            return self._pending.get(user_id) or self._inflight.get(user_id)
+
+    def flush(self):
+        """Write all pending timestamps in one bulk UPDATE; returns rows written"""
+        from sqlalchemy import bindparam, update
+        from app import db
+        from app.models import User
+
+        # One flush at a time, so the thread and atexit/explicit flushes can't
+        # reorder UPDATEs or clear each other's in-flight batch
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._inflight, self._pending = self._pending, {}
+                batch = self._inflight
+
+            # Core executemany: rows for since-deleted users are skipped rather than failing the batch
+            table = User.__table__
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam('user_id'))
+                .values(last_login=bindparam('ts'))
+            )
+            rows = [{'user_id': user_id, 'ts': ts} for user_id, ts in batch.items()]
+            app = current_app._get_current_object() if has_app_context() else self.app
+            try:
+                # Own app context, so the flush never joins a request's session
+                with app.app_context():
+                    db.session.execute(stmt, rows)
+                    db.session.commit()
+            except Exception:
+                logger.exception("Failed to flush %d last_login timestamps", len(rows))
+                with self._lock:
+                    # Keep anything newer recorded while the flush was running
+                    for user_id, ts in batch.items():
+                        self._pending.setdefault(user_id, ts)
+                return 0
+            finally:
+                with self._lock:
+                    self._inflight = {}
+            return len(rows)
+
+    def _ensure_thread(self):
+        """Start the flusher thread (also restarts it in forked workers)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='last-login-flusher', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
@@ -0,0 +1,131 @@
+"""
+Pooled SMTP delivery for MRC authentication system.
+Flask-Mail's mail.send() opens, authenticates (and STARTTLS-negotiates) a new
+SMTP connection per message. SMTPDispatcher keeps one mail.connect() connection
+open across batches, reopening it when the relay drops it or it has sat idle
+longer than MAIL_CONNECTION_IDLE_TIMEOUT, so a burst of email pays the
+handshake once.
+"""
+import logging
+import os
+import smtplib
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# The relay closed a connection we still held: reconnect and resend once
+STALE_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionResetError, BrokenPipeError)
+# The relay refused one message (smtplib has already RSET); the connection stays usable
+MESSAGE_REJECTED_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException)
+
+
+class SMTPDispatcher:
+    """Sends batches of Flask-Mail messages over one long-lived SMTP connection"""
+
+    def __init__(self, idle_timeout=30, clock=time.monotonic):
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._connection = None
+        self._pid = None
+        self._last_used = 0
+        self._connect_failed = False
+        self._lock = threading.Lock()
+        self.stats = {'sent': 0, 'failed': 0, 'connections': 0, 'reconnects': 0, 'busy_seconds': 0.0}
+
+    def send_batch(self, messages):
+        """Send messages in order; returns one exception (or None if sent) per message"""
+        results = []
+        with self._lock:
+            start = self._clock()
+            for message in messages:
+                try:
+                    self._send(message)
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    results.append(e)
+                    if self._connect_failed:
+                        # Relay unreachable: fail the rest now rather than reconnecting per message
+                        remaining = len(messages) - len(results)
+                        self.stats['failed'] += remaining
+                        results.extend([e] * remaining)
+                        break
+                else:
+                    self.stats['sent'] += 1
+                    results.append(None)
+            self.stats['busy_seconds'] += self._clock() - start
+        return results
+
+    def _send(self, message):
+        reused = self._connection is not None and self._usable()
+        if not reused:
+            self._open()
+        try:
+            self._connection.send(message)
+            self._last_used = self._clock()
+        except MESSAGE_REJECTED_ERRORS:
+            self._last_used = self._clock()
+            raise
+        except STALE_CONNECTION_ERRORS:
+            self._discard()
+            if not reused:
+                raise
+            logger.info("SMTP connection dropped by the relay, reconnecting")
+            self.stats['reconnects'] += 1
+            self._send(message)
+        except Exception:
+            # Unknown connection state (e.g. a timeout mid-transaction): start afresh next time
+            self._discard()
+            raise
+
+    def _usable(self):
+        """False for a connection inherited across fork or left idle too long"""
+        if self._pid != os.getpid():
+            # Never talk over the parent's socket; just forget it
+            self._connection = None
+            return False
+        if self._clock() - self._last_used > self.idle_timeout:
+            self._discard()
+            return False
+        return True
+
+    def _open(self):
+        from app import mail
+        connection = mail.connect()
+        self._connect_failed = False
+        try:
+            connection.__enter__()
+        except Exception:
+            self._connect_failed = True
+            raise
+        self._connection = connection
+        self._pid = os.getpid()
+        self._last_used = self._clock()
+        self.stats['connections'] += 1
+
+    def _discard(self):
+        """Close the connection, ignoring errors from one the relay already dropped"""
+        connection, self._connection = self._connection, None
+        if connection is not None and connection.host is not None:
+            try:
+                connection.host.quit()
+            except (smtplib.SMTPException, OSError):
+                connection.host.close()
+
+    def close_if_idle(self):
+        """Close the connection once it has been idle for idle_timeout seconds"""
+        with self._lock:
+            if self._connection is not None and self._clock() - self._last_used > self.idle_timeout:
+                self._discard()
+
+    def close(self):
+        with self._lock:
+            self._discard()
+
+    def metrics(self):
+        """Delivery counters and throughput while sending"""
+        with self._lock:
+            stats = dict(self.stats)
+        busy = stats.pop('busy_seconds')
+        stats['messages_per_second'] = round(stats['sent'] / busy, 1) if busy else None
+        return stats
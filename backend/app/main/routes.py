@@ -1,7 +1,10 @@
 from flask import jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
+from app import (db, jwt, login_admission, profile_cache, profile_versions, identifier_limiter, email_outbox,
+                 security_log, audit_events, token_revocations)
+from app.database import pool_status
+from app.auth.current_user import admin_required, load_current_profile, profile_response
 from app.main import bp
-from app.models import User
 
 @bp.route('/health')
 def health():
@@ -17,14 +20,31 @@ def health():
 def get_current_user():
     """Get current authenticated user info"""
     try:
-        current_user_id = int(get_jwt_identity())  # Convert back to int for DB query
-        user = User.query.get(current_user_id)
+        # The token's profile snapshot while it is current, else the cache or database
+        profile = profile_versions.profile_from_claims() or load_current_profile()
         
-        if not user:
+        if not profile:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({'user': user.to_dict()}), 200
+        return profile_response(profile)
         
     except Exception as e:
         return jsonify({'error': 'Failed to get user info'}), 500
 
+
+@bp.route('/metrics')
+@admin_required
+def metrics():
+    """Operational counters for monitoring (admins only)"""
+    return jsonify({
+        'login_admission': login_admission.metrics(),
+        'jwt_decode_cache': jwt.metrics(),
+        'token_revocation': token_revocations.metrics(),
+        'login_identifier_limiter': identifier_limiter.metrics(),
+        'database_pool': pool_status(db.engine),
+        'profile_cache': profile_cache.metrics(),
+        'profile_snapshot': profile_versions.metrics(),
+        'email_outbox': email_outbox.metrics(),
+        'security_log': security_log.metrics(),
+        'audit_events': audit_events.metrics()
+    }), 200
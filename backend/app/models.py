@@ -1,24 +1,56 @@
 from datetime import datetime, timezone, timedelta
-import bcrypt
 import secrets
 import logging
-from app import db
+from itertools import chain
+from sqlalchemy import case, event, func, inspect, update
+from sqlalchemy.orm import validates
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db, hasher, last_login_buffer, profile_cache, audit_events, profile_versions
+from app.profile_snapshot import DELETED, VERSIONED_FIELDS
+from app.serializers import ModelSerializer
 
-# Security logging configuration
+# Security logging configuration (handlers installed by app.security_log)
 security_logger = logging.getLogger('mrc_security')
 security_logger.setLevel(logging.WARNING)
 
+# Progressive lockout: 5 min, 10 min, 20 min ... doubling per attempt, max 4 hr
+LOCKOUT_THRESHOLD = 3
+LOCKOUT_MAX_MINUTES = 240
+
+def lockout_minutes(attempts):
+    """Lockout duration for a given failed attempt count (0 below the threshold)"""
+    if attempts < LOCKOUT_THRESHOLD:
+        return 0
+    return min(5 * (2 ** (attempts - LOCKOUT_THRESHOLD)), LOCKOUT_MAX_MINUTES)
+
+def normalize_identifier(value):
+    """Canonical form of a username or email for case-insensitive lookup"""
+    if value is None:
+        return None
+    return str(value).strip().lower()
+
+def as_utc(value):
+    """Treat naive datetimes (as returned by SQLite) as UTC"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
 class User(db.Model):
     """User model for MRC authentication system"""
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
+    # Lowercased copies kept in sync by the validators below; login lookups hit these indexes
+    username_normalized = db.Column(db.String(80), unique=True, index=True, nullable=False)
+    email_normalized = db.Column(db.String(120), unique=True, index=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     full_name = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20), nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     last_login = db.Column(db.DateTime, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
+    # Bumped whenever a field of the token profile snapshot changes (see app.profile_snapshot)
+    profile_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     
     # Password reset functionality
     password_reset_token = db.Column(db.String(128), nullable=True)
@@ -29,54 +61,106 @@ class User(db.Model):
     locked_until = db.Column(db.DateTime, nullable=True)
     last_failed_login = db.Column(db.DateTime, nullable=True)
 
+    @validates('username')
+    def _sync_username_normalized(self, key, value):
+        self.username_normalized = normalize_identifier(value)
+        return value
+
+    @validates('email')
+    def _sync_email_normalized(self, key, value):
+        self.email_normalized = normalize_identifier(value)
+        return value
+
+    @classmethod
+    def find_by_login(cls, identifier):
+        """Find user by username or email with a single indexed equality lookup"""
+        key = normalize_identifier(identifier)
+        # Usernames may not contain '@', so the identifier's shape picks the column
+        column = cls.email_normalized if '@' in key else cls.username_normalized
+        return cls.query.filter(column == key).first()
+
+    @classmethod
+    def find_by_email(cls, email):
+        """Find user by email, ignoring case"""
+        return cls.query.filter(cls.email_normalized == normalize_identifier(email)).first()
+
+    @classmethod
+    def find_by_username(cls, username):
+        """Find user by username, ignoring case"""
+        return cls.query.filter(cls.username_normalized == normalize_identifier(username)).first()
+
     def set_password(self, password):
-        """Hash password using bcrypt"""
-        password_bytes = password.encode('utf-8')
-        salt = bcrypt.gensalt()
-        self.password_hash = bcrypt.hashpw(password_bytes, salt).decode('utf-8')
+        """Hash password using bcrypt (runs on the hashing executor)"""
+        self.password_hash = hasher.hash_password(password)
 
     def check_password(self, password):
-        """Check password against bcrypt hash"""
-        password_bytes = password.encode('utf-8')
-        hash_bytes = self.password_hash.encode('utf-8')
-        return bcrypt.checkpw(password_bytes, hash_bytes)
-
-    def update_last_login(self):
-        """Update last login timestamp"""
-        self.last_login = datetime.now(timezone.utc)
-        db.session.commit()
+        """Check password against bcrypt hash (runs on the hashing executor)"""
+        return hasher.check_password(password, self.password_hash)
+
+    def password_needs_rehash(self):
+        """Check if the stored hash uses a different bcrypt cost than configured"""
+        return hasher.needs_rehash(self.password_hash)
+
+    def update_last_login(self, commit=True):
+        """Update last login timestamp (buffered when write-behind is enabled)"""
+        now = datetime.now(timezone.utc)
+        if last_login_buffer.enabled:
+            last_login_buffer.record(self.id, now)
+            # No row change for the commit hook to see, so drop the cached profile here
+            profile_cache.invalidate(self.id)
+            return
+        self.last_login = now
+        if commit:
+            db.session.commit()
+
+    def current_last_login(self):
+        """Freshest last login: a pending write-behind value or the stored column"""
+        pending = last_login_buffer.get(self.id) if self.id is not None else None
+        return pending or self.last_login
+
+    def has_recent_login(self, window):
+        """Check if the user logged in successfully within the given timedelta"""
+        last_login = self.current_last_login()
+        if not last_login:
+            return False
+        return datetime.now(timezone.utc) - as_utc(last_login) <= window
 
     def to_dict(self):
         """Convert user to dictionary for API responses"""
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'full_name': self.full_name,
-            'phone': self.phone,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'last_login': self.last_login.isoformat() if self.last_login else None,
-            'is_active': self.is_active
-        }
+        payload = user_serializer(self)
+        pending = last_login_buffer.get(self.id) if self.id is not None else None
+        if pending:
+            payload['last_login'] = pending.isoformat()
+        return payload
 
     def __repr__(self):
         return f'<User {self.username}>'
 
     # Security and logging methods
     def log_security_event(self, event_type, ip_address=None, details=None):
-        """Log security events for audit trail"""
-        user_info = f"User:{self.id}({self.username})"
-        ip_info = f" IP:{ip_address}" if ip_address else ""
-        detail_info = f" Details:{details}" if details else ""
-        security_logger.warning(f"SECURITY: {event_type} - {user_info}{ip_info}{detail_info}")
+        """Log security events for audit trail (formatted by the log listener thread)"""
+        message = "SECURITY: %s - User:%s(%s)"
+        args = [event_type, self.id, self.username]
+        if ip_address:
+            message += " IP:%s"
+            args.append(ip_address)
+        if details:
+            message += " Details:%s"
+            args.append(details)
+        security_logger.warning(message, *args, extra={'security': {
+            'event': event_type, 'user_id': self.id, 'username': self.username,
+            'ip': ip_address, 'details': details
+        }})
+        audit_events.record(self.id, event_type, ip_address, details)
 
     # Password reset functionality
-    def generate_password_reset_token(self):
-        """Generate secure password reset token"""
+    def generate_password_reset_token(self, commit=True):
+        """Generate secure password reset token (commit=False stages it for the caller's commit)"""
         self.password_reset_token = secrets.token_urlsafe(64)
         self.password_reset_expires = datetime.now(timezone.utc) + timedelta(hours=1)
         self.log_security_event("PASSWORD_RESET_REQUESTED")
-        db.session.commit()
+        if commit:
+            db.session.commit()
         return self.password_reset_token
 
     def verify_password_reset_token(self, token):
@@ -84,7 +168,7 @@ class User(db.Model):
         if not self.password_reset_token or not self.password_reset_expires:
             return False
         
-        if datetime.now(timezone.utc) > self.password_reset_expires:
+        if datetime.now(timezone.utc) > as_utc(self.password_reset_expires):
             self.clear_password_reset_token()
             return False
             
@@ -110,32 +194,66 @@ class User(db.Model):
         """Check if account is currently locked"""
         if not self.locked_until:
             return False
-        return datetime.now(timezone.utc) < self.locked_until
+        return datetime.now(timezone.utc) < as_utc(self.locked_until)
+
+    # Login outcomes stage their changes; pass commit=False to let the caller
+    # flush the whole login as a single transaction
+    def handle_failed_login(self, ip_address=None, commit=True):
+        """Handle failed login attempt with progressive lockout.
+
+        The increment and lockout are a single UPDATE ... RETURNING evaluated by
+        the database, so concurrent failures across workers are never lost.
+        """
+        now = datetime.now(timezone.utc)
+        attempts = func.coalesce(User.failed_login_attempts, 0) + 1
+
+        # One bound timestamp per lockout step keeps the CASE portable (SQLite/PostgreSQL)
+        steps = []
+        count = LOCKOUT_THRESHOLD
+        while lockout_minutes(count) < LOCKOUT_MAX_MINUTES:
+            steps.append((attempts == count, now + timedelta(minutes=lockout_minutes(count))))
+            count += 1
+        locked_until = case(
+            (attempts < LOCKOUT_THRESHOLD, User.locked_until),
+            *steps,
+            else_=now + timedelta(minutes=LOCKOUT_MAX_MINUTES)
+        )
 
-    def handle_failed_login(self, ip_address=None):
-        """Handle failed login attempt with progressive lockout"""
-        self.failed_login_attempts += 1
-        self.last_failed_login = datetime.now(timezone.utc)
+        stmt = (
+            update(User)
+            .where(User.id == self.id)
+            .values(failed_login_attempts=attempts, last_failed_login=now, locked_until=locked_until)
+            .returning(User.failed_login_attempts, User.locked_until)
+            .execution_options(synchronize_session=False)
+        )
+        new_attempts, new_locked_until = db.session.execute(stmt).one()
+
+        # Reflect the database result without marking the instance dirty
+        set_committed_value(self, 'failed_login_attempts', new_attempts)
+        set_committed_value(self, 'last_failed_login', now)
+        set_committed_value(self, 'locked_until', as_utc(new_locked_until))
         
-        # Progressive lockout: 5 min, 15 min, 30 min, 1 hr, 2 hr, max 4 hr
-        if self.failed_login_attempts >= 3:
-            lockout_minutes = min(5 * (2 ** (self.failed_login_attempts - 3)), 240)
-            self.locked_until = datetime.now(timezone.utc) + timedelta(minutes=lockout_minutes)
+        if new_attempts >= LOCKOUT_THRESHOLD:
             self.log_security_event("ACCOUNT_LOCKED", ip_address, 
-                                   f"Attempts:{self.failed_login_attempts} Duration:{lockout_minutes}min")
+                                   f"Attempts:{new_attempts} Duration:{lockout_minutes(new_attempts)}min")
         else:
             self.log_security_event("LOGIN_FAILED", ip_address, 
-                                   f"Attempts:{self.failed_login_attempts}")
+                                   f"Attempts:{new_attempts}")
         
-        db.session.commit()
+        if commit:
+            db.session.commit()
 
-    def handle_successful_login(self, ip_address=None):
+    def handle_successful_login(self, ip_address=None, commit=True):
         """Handle successful login - reset counters and update timestamps"""
-        self.failed_login_attempts = 0
-        self.locked_until = None
-        self.last_failed_login = None
-        self.update_last_login()
+        # Only touch lockout columns that need resetting so a clean login writes nothing extra
+        if self.failed_login_attempts or self.locked_until or self.last_failed_login:
+            self.failed_login_attempts = 0
+            self.locked_until = None
+            self.last_failed_login = None
+        self.update_last_login(commit=False)
         self.log_security_event("LOGIN_SUCCESS", ip_address)
+        if commit:
+            db.session.commit()
 
     def unlock_account(self):
         """Manually unlock account (admin function)"""
@@ -145,3 +263,120 @@ class User(db.Model):
         self.log_security_event("ACCOUNT_UNLOCKED")
         db.session.commit()
 
+
+# User.to_dict() fields, in response order; stored datetimes are UTC (see as_utc)
+user_serializer = ModelSerializer(
+    ('id', 'username', 'email', 'full_name', 'phone', 'created_at', 'last_login', 'is_active'),
+    datetime_fields=('created_at', 'last_login'), naive_tz=timezone.utc)
+
+
+class OutboxMessage(db.Model):
+    """Email queued for delivery by the outbox worker (see app/outbox.py)"""
+    __tablename__ = 'outbox_message'
+    __table_args__ = (
+        # The worker's "due messages" scan
+        db.Index('ix_outbox_message_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    DEAD = 'dead'
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # When a pending message is next due; also the lease expiry while a worker holds it
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.status}>'
+
+
+class AuditEvent(db.Model):
+    """Security event from log_security_event, bulk-inserted by app.audit"""
+    __tablename__ = 'audit_event'
+    __table_args__ = (
+        # Admin queries filter on user or event type and page newest first by (created_at, id)
+        db.Index('ix_audit_event_user_id_created_at', 'user_id', 'created_at', 'id'),
+        db.Index('ix_audit_event_event_type_created_at', 'event_type', 'created_at', 'id'),
+        db.Index('ix_audit_event_created_at', 'created_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: the trail outlives deleted users
+    user_id = db.Column(db.Integer, nullable=True)
+    event_type = db.Column(db.String(64), nullable=False)
+    ip_address = db.Column(db.String(45), nullable=True)
+    details = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'event_type': self.event_type,
+            'ip_address': self.ip_address,
+            'details': self.details,
+            'created_at': as_utc(self.created_at).isoformat()
+        }
+
+    def __repr__(self):
+        return f'<AuditEvent {self.id} {self.event_type}>'
+
+
+class RevokedToken(db.Model):
+    """jti of a token revoked before its exp; read through app.revocation's Bloom filter"""
+    __tablename__ = 'revoked_token'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    token_type = db.Column(db.String(10), nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    # Rows are purged once the token would have expired anyway
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti} {self.token_type}>'
+
+
+# Profile snapshots in tokens go stale when any field they hold changes
+@event.listens_for(db.session, 'before_flush')
+def _bump_profile_versions(session, flush_context, instances):
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in VERSIONED_FIELDS):
+                obj.profile_version = (obj.profile_version or 1) + 1
+
+# Profile cache invalidation: any committed change to a User drops its cached payload
+@event.listens_for(db.session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('changed_user_ids', set())
+    versions = session.info.setdefault('changed_user_versions', {})
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, User):
+            changed.add(obj.id)
+            versions[obj.id] = obj.profile_version
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+            versions[obj.id] = DELETED
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_changed_profiles(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        profile_cache.invalidate(user_id)
+    for user_id, version in session.info.pop('changed_user_versions', {}).items():
+        profile_versions.record(user_id, version)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changed_users(session):
+    session.info.pop('changed_user_ids', None)
+    session.info.pop('changed_user_versions', None)
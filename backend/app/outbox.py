@@ -0,0 +1,250 @@
+"""
+Transactional email outbox for MRC authentication system.
+Requests queue mail as an outbox_message row inside their own transaction and
+return without waiting on SMTP; a worker (`flask outbox-worker`, or a thread in
+each web process with OUTBOX_IN_PROCESS_WORKER) delivers due messages, retries
+failures with exponential backoff and dead-letters a message after
+OUTBOX_MAX_ATTEMPTS. Each batch goes out over one pooled SMTP connection
+(see app/mailer.py). Claimed messages are leased for OUTBOX_LEASE_SECONDS, so
+several workers can run side by side and a crashed worker's messages are picked
+up again once the lease expires (delivery is at-least-once).
+"""
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.mailer import SMTPDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class EmailOutbox:
+    """Durable email queue drained by a background worker"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.max_attempts = 8
+        self.backoff_base = 30
+        self.backoff_max = 3600
+        self.lease_seconds = 300
+        self.batch_size = 20
+        self.poll_interval = 2
+        self.sent_retention = 7 * 24 * 3600
+        self.in_process = False
+        self.counters = {'sent': 0, 'retried': 0, 'dead': 0}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.dispatcher = SMTPDispatcher()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure retry policy and worker from app config"""
+        self.app = app
+        self.max_attempts = app.config.get('OUTBOX_MAX_ATTEMPTS', 8)
+        self.backoff_base = app.config.get('OUTBOX_BACKOFF_BASE', 30)
+        self.backoff_max = app.config.get('OUTBOX_BACKOFF_MAX', 3600)
+        self.lease_seconds = app.config.get('OUTBOX_LEASE_SECONDS', 300)
+        self.batch_size = app.config.get('OUTBOX_BATCH_SIZE', 20)
+        self.poll_interval = app.config.get('OUTBOX_POLL_INTERVAL', 2)
+        self.sent_retention = app.config.get('OUTBOX_SENT_RETENTION', 7 * 24 * 3600)
+        self.in_process = app.config.get('OUTBOX_IN_PROCESS_WORKER', False)
+        self.dispatcher = SMTPDispatcher(app.config.get('MAIL_CONNECTION_IDLE_TIMEOUT', 30))
+        app.extensions['email_outbox'] = self
+
+    def enqueue(self, recipient, subject, body):
+        """Add a message to the current session; it is queued when the caller commits"""
+        from app import db
+        from app.models import OutboxMessage
+        message = OutboxMessage(recipient=recipient, subject=subject, body=body)
+        db.session.add(message)
+        if self.in_process:
+            self._ensure_thread()
+        return message
+
+    def backoff(self, attempts):
+        """Seconds before the next try after `attempts` failed deliveries"""
+        return min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+
+    def claim(self, now=None):
+        """Lease up to batch_size due messages to this worker
+
+        Returns (id, recipient, subject, body, attempts) rows; attempts includes this one.
+        """
+        from sqlalchemy import select, update
+        from app import db
+        from app.models import OutboxMessage
+
+        now = now or datetime.now(timezone.utc)
+        due = (
+            OutboxMessage.status == OutboxMessage.PENDING,
+            OutboxMessage.next_attempt_at <= now
+        )
+        ids = db.session.scalars(
+            select(OutboxMessage.id).where(*due)
+            .order_by(OutboxMessage.next_attempt_at).limit(self.batch_size)
+        ).all()
+        if not ids:
+            db.session.rollback()
+            return []
+        # Re-checking due in the UPDATE makes the claim exclusive between workers
+        rows = db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids), *due)
+            .values(attempts=OutboxMessage.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=self.lease_seconds))
+            .returning(OutboxMessage.id, OutboxMessage.recipient, OutboxMessage.subject,
+                       OutboxMessage.body, OutboxMessage.attempts)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.session.commit()
+        return sorted(rows)
+
+    def build_message(self, recipient, subject, body):
+        """Flask-Mail message for an outbox row"""
+        from flask_mail import Message
+        return Message(
+            subject,
+            sender=current_app.config['MAIL_DEFAULT_SENDER'],
+            recipients=[recipient],
+            body=body
+        )
+
+    def process_batch(self):
+        """Deliver one batch of due messages over the pooled connection; returns how many were attempted"""
+        from app import db
+        rows = self.claim()
+        if not rows:
+            self.dispatcher.close_if_idle()
+            return 0
+        messages = [self.build_message(recipient, subject, body) for _, recipient, subject, body, _ in rows]
+        results = self.dispatcher.send_batch(messages)
+
+        sent_ids = []
+        for (message_id, *_, attempts), error in zip(rows, results):
+            if error is None:
+                sent_ids.append(message_id)
+            else:
+                self._record_failure(message_id, attempts, error)
+        self._record_sent(sent_ids)
+        # One commit records the whole batch's outcomes
+        db.session.commit()
+        logger.info("Outbox batch: %d sent, %d failed (%s msg/s)", len(sent_ids),
+                    len(rows) - len(sent_ids), self.dispatcher.metrics()['messages_per_second'])
+        return len(rows)
+
+    def _finish(self, message_ids, **values):
+        from sqlalchemy import update
+        from app import db
+        from app.models import OutboxMessage
+        db.session.execute(
+            update(OutboxMessage).where(OutboxMessage.id.in_(message_ids)).values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+    def _record_sent(self, message_ids):
+        from app.models import OutboxMessage
+        if message_ids:
+            self._finish(message_ids, status=OutboxMessage.SENT, sent_at=datetime.now(timezone.utc),
+                         last_error=None)
+            self._count('sent', len(message_ids))
+
+    def _record_failure(self, message_id, attempts, error):
+        from app.models import OutboxMessage
+        reason = f"{type(error).__name__}: {error}"[:500]
+        if attempts >= self.max_attempts:
+            logger.error("Outbox message %s dead-lettered after %d attempts: %s",
+                         message_id, attempts, reason)
+            self._finish([message_id], status=OutboxMessage.DEAD, last_error=reason)
+            self._count('dead')
+            return
+        delay = self.backoff(attempts)
+        logger.warning("Outbox message %s attempt %d failed, retrying in %ss: %s",
+                       message_id, attempts, delay, reason)
+        self._finish([message_id], last_error=reason,
+                     next_attempt_at=datetime.now(timezone.utc) + timedelta(seconds=delay))
+        self._count('retried')
+
+    def _count(self, outcome, count=1):
+        with self._lock:
+            self.counters[outcome] += count
+
+    def purge_sent(self, now=None):
+        """Delete delivered messages older than OUTBOX_SENT_RETENTION; returns rows deleted"""
+        from sqlalchemy import delete
+        from app import db
+        from app.models import OutboxMessage
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(seconds=self.sent_retention)
+        result = db.session.execute(
+            delete(OutboxMessage)
+            .where(OutboxMessage.status == OutboxMessage.SENT, OutboxMessage.sent_at < cutoff)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def run(self, stop=None):
+        """Worker loop: drain due messages, then poll every OUTBOX_POLL_INTERVAL seconds"""
+        from app import db
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                if self.process_batch():
+                    continue
+                self.purge_sent()
+            except Exception:
+                logger.exception("Outbox worker iteration failed")
+                db.session.rollback()
+            stop.wait(self.poll_interval)
+
+    def _ensure_thread(self):
+        """Start the in-process worker thread (also restarts it in forked workers)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run_in_app, name='email-outbox', daemon=True)
+                self._thread.start()
+
+    def _run_in_app(self):
+        with self.app.app_context():
+            self.run()
+
+    def metrics(self):
+        """Queue depth by status plus this process's delivery counters"""
+        from sqlalchemy import func, select
+        from app import db
+        from app.models import OutboxMessage
+        depth = dict(db.session.execute(
+            select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)
+        ).all())
+        with self._lock:
+            counters = dict(self.counters)
+        counters['pending'] = depth.get(OutboxMessage.PENDING, 0)
+        counters['dead_letters'] = depth.get(OutboxMessage.DEAD, 0)
+        counters['smtp'] = self.dispatcher.metrics()
+        return counters
+
+
+@click.command('outbox-worker')
+@click.option('--once', is_flag=True, help='Deliver the messages due now and exit (e.g. from cron).')
+@with_appcontext
+def outbox_worker_command(once):
+    """Deliver queued email from the outbox"""
+    outbox = current_app.extensions['email_outbox']
+    if once:
+        total = 0
+        while True:
+            attempted = outbox.process_batch()
+            if not attempted:
+                break
+            total += attempted
+        outbox.dispatcher.close()
+        click.echo(f"Attempted {total} outbox messages")
+        return
+    click.echo(f"Outbox worker polling every {outbox.poll_interval}s")
+    outbox.run()
@@ -0,0 +1,105 @@
+"""
+Profile snapshots in access tokens for MRC authentication system.
+Login and refresh put the /api/me payload in the access token as a compact,
+versioned `prof` claim: [profile_version, username, email, ...]. The user's
+profile_version is bumped whenever one of those fields changes, so /api/me
+can answer from the claims alone as long as the snapshot's version is still
+the user's current one.
+
+Current versions come from a small per-worker map, updated on commit in the
+worker that made a change and otherwise read (one primary-key column) when an
+entry is missing or older than PROFILE_VERSION_TTL seconds, which bounds how
+long another worker can serve an outdated snapshot, like PROFILE_CACHE_TTL
+does for the memory profile cache. A stale snapshot falls back to the profile
+cache and the database.
+"""
+import threading
+
+from flask_jwt_extended import get_jwt
+
+from app.cache import MemoryBackend
+
+CLAIM = 'prof'
+# Order of the values after the version in the claim
+SNAPSHOT_FIELDS = ('username', 'email', 'full_name', 'phone', 'created_at', 'last_login', 'is_active')
+# Changes to these bump profile_version; a snapshot's last_login stays the one
+# current when its token was issued, so logins elsewhere don't invalidate it
+VERSIONED_FIELDS = tuple(name for name in SNAPSHOT_FIELDS if name != 'last_login')
+DELETED = 0  # Version recorded for users that no longer exist; never matches a snapshot
+
+
+def snapshot_claims(user, payload):
+    """Additional access token claims holding payload (user.to_dict()) at user's profile_version"""
+    return {CLAIM: [user.profile_version] + [payload[name] for name in SNAPSHOT_FIELDS]}
+
+
+class ProfileVersionMap:
+    """user_id -> current profile_version, per worker, with a TTL"""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.versions = None
+        self._counter_lock = threading.Lock()
+        self.counters = {'hits': 0, 'stale': 0, 'lookups': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure from PROFILE_SNAPSHOT_ENABLED, PROFILE_VERSION_TTL and PROFILE_VERSION_MAP_SIZE"""
+        self.enabled = app.config.get('PROFILE_SNAPSHOT_ENABLED', True)
+        self.versions = MemoryBackend(app.config.get('PROFILE_VERSION_MAP_SIZE', 10000),
+                                      app.config.get('PROFILE_VERSION_TTL', 30))
+        self.counters = dict.fromkeys(self.counters, 0)
+        app.extensions['profile_versions'] = self
+
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def current(self, user_id):
+        """The user's profile_version, from the map or (on a miss) the database"""
+        entry = self.versions.get(user_id)
+        if entry is not None:
+            return entry['v']
+        from sqlalchemy import select
+        from app import db
+        from app.models import User
+        self._count('lookups')
+        version = db.session.scalar(select(User.profile_version).where(User.id == user_id))
+        version = DELETED if version is None else version
+        self.record(user_id, version)
+        return version
+
+    def record(self, user_id, version):
+        """Remember a version this worker has just committed or read"""
+        if self.versions is not None:
+            self.versions.set(user_id, {'v': version})
+
+    def clear(self):
+        if self.versions is not None:
+            self.versions.clear()
+
+    def profile_from_claims(self):
+        """The /api/me payload from the current token's snapshot, or None if absent or stale"""
+        if not self.enabled:
+            return None
+        claims = get_jwt()
+        snapshot = claims.get(CLAIM)
+        if not snapshot:
+            return None
+        user_id = int(claims['sub'])
+        if self.current(user_id) != snapshot[0]:
+            self._count('stale')
+            return None
+        self._count('hits')
+        payload = {'id': user_id}
+        payload.update(zip(SNAPSHOT_FIELDS, snapshot[1:]))
+        return payload
+
+    def metrics(self):
+        """Snapshot hit/stale counters and version lookups for monitoring"""
+        with self._counter_lock:
+            metrics = dict(self.counters)
+        metrics['size'] = self.versions.size() if self.versions is not None else 0
+        metrics['enabled'] = self.enabled
+        return metrics
@@ -0,0 +1,216 @@
+"""
+Rate limit storage backends for MRC authentication system.
+Importing this module registers two extra Flask-Limiter storage schemes, so every
+worker counts against the same limits instead of one private copy each:
+
+    sqlite:////var/lib/mrc/limits.db  - counters in a SQLite file shared by the workers on a host
+    mrc-shared:///path/cache.sock     - counters held by the local cache server (`flask cache-server`),
+    mrc-shared://127.0.0.1:5011         on its unix socket or TCP address, authenticated with
+                                        CACHE_SERVER_AUTHKEY
+
+memory:// (per worker) and, with the redis package installed, redis:// are
+provided by the limits library itself. Both storages here support the
+fixed-window and moving-window strategies (RATELIMIT_STRATEGY).
+"""
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from limits.errors import ConfigurationError
+from limits.storage import MovingWindowSupport, Storage
+
+from app.cache import CacheServerConnection, CacheServerError
+
+SHARED_SCHEME = 'mrc-shared'
+
+
+def limiter_storage_options(config):
+    """RATELIMIT_STORAGE_OPTIONS for the configured storage URI"""
+    uri = config.get('RATELIMIT_STORAGE_URI') or 'memory://'
+    if urlparse(uri).scheme == SHARED_SCHEME:
+        # The cache server only answers clients that know its authkey
+        return {'authkey': config.get('CACHE_SERVER_AUTHKEY')}
+    return {}
+
+
+class SQLiteStorage(Storage, MovingWindowSupport):
+    """Fixed and moving window counters in a SQLite database file"""
+
+    STORAGE_SCHEME = ['sqlite']
+    PURGE_EVERY = 1000  # writes between sweeps of expired counters
+
+    def __init__(self, uri, wrap_exceptions=False, busy_timeout=5000, **options):
+        path = urlparse(uri).path[1:]
+        if not path or path == ':memory:':
+            raise ConfigurationError('SQLite rate limit storage needs a database file path')
+        self.path = path
+        self.busy_timeout = int(busy_timeout)
+        self._local = threading.local()
+        self._writes = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self._create_schema()
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # Autocommit; multi-statement operations open their own IMMEDIATE transaction
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _create_schema(self):
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS limiter_counter '
+            '(key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires REAL NOT NULL)'
+        )
+        conn.execute('CREATE TABLE IF NOT EXISTS limiter_entry '
+                     '(key TEXT NOT NULL, ts REAL NOT NULL, expires REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_limiter_entry_key_ts ON limiter_entry (key, ts)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_limiter_entry_expires ON limiter_entry (expires)')
+
+    def _maybe_purge(self, conn, now):
+        # Keys that never come back (one-off IPs and identifiers) are only removed here
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute('DELETE FROM limiter_counter WHERE expires <= ?', (now,))
+            conn.execute('DELETE FROM limiter_entry WHERE expires <= ?', (now,))
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        conn = self._connection()
+        # One atomic upsert: restart the window if it expired, else add to it
+        value = conn.execute(
+            'INSERT INTO limiter_counter (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'value = CASE WHEN expires <= ? THEN excluded.value ELSE value + excluded.value END, '
+            'expires = CASE WHEN expires <= ? THEN excluded.expires ELSE expires END '
+            'RETURNING value',
+            (key, amount, now + expiry, now, now)
+        ).fetchone()[0]
+        self._maybe_purge(conn, now)
+        return value
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM limiter_counter WHERE key = ? AND expires > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT expires FROM limiter_counter WHERE key = ? AND expires > ?', (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def check(self):
+        try:
+            self._connection().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        conn = self._connection()
+        count = conn.execute('SELECT COUNT(*) FROM limiter_counter').fetchone()[0]
+        conn.execute('DELETE FROM limiter_counter')
+        conn.execute('DELETE FROM limiter_entry')
+        return count
+
+    def clear(self, key):
+        conn = self._connection()
+        conn.execute('DELETE FROM limiter_counter WHERE key = ?', (key,))
+        conn.execute('DELETE FROM limiter_entry WHERE key = ?', (key,))
+
+    def acquire_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM limiter_entry WHERE key = ? AND ts <= ?', (key, now - expiry))
+            count = conn.execute(
+                'SELECT COUNT(*) FROM limiter_entry WHERE key = ?', (key,)
+            ).fetchone()[0]
+            if count + amount > limit:
+                conn.execute('ROLLBACK')
+                return False
+            conn.executemany('INSERT INTO limiter_entry (key, ts, expires) VALUES (?, ?, ?)',
+                             [(key, now, now + expiry)] * amount)
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        self._maybe_purge(conn, now)
+        return True
+
+    def get_moving_window(self, key, limit, expiry):
+        now = time.time()
+        oldest, count = self._connection().execute(
+            'SELECT MIN(ts), COUNT(*) FROM limiter_entry WHERE key = ? AND ts > ?', (key, now - expiry)
+        ).fetchone()
+        return (oldest if count else now), count
+
+
+class SharedStorage(Storage, MovingWindowSupport):
+    """Counters kept by the local cache server, shared by every worker connected to it"""
+
+    STORAGE_SCHEME = [SHARED_SCHEME]
+
+    def __init__(self, uri, wrap_exceptions=False, authkey=None, **options):
+        parsed = urlparse(uri)
+        address = (parsed.hostname, parsed.port or 5011) if parsed.hostname else parsed.path
+        if not address:
+            raise ConfigurationError('mrc-shared:// storage needs a host:port or socket path')
+        try:
+            self.connection = CacheServerConnection(address, parsed.password or authkey, 'limits')
+        except ValueError as e:
+            raise ConfigurationError(str(e))
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return (OSError, EOFError, CacheServerError)
+
+    def _call(self, method, *args):
+        return self.connection.call(method, *args)
+
+    def incr(self, key, expiry, amount=1):
+        return self._call('incr', key, expiry, amount)
+
+    def get(self, key):
+        return self._call('get', key)
+
+    def get_expiry(self, key):
+        return self._call('get_expiry', key)
+
+    def check(self):
+        try:
+            return self._call('check')
+        except self.base_exceptions:
+            return False
+
+    def reset(self):
+        return self._call('reset')
+
+    def clear(self, key):
+        return self._call('clear', key)
+
+    def acquire_entry(self, key, limit, expiry, amount=1):
+        return self._call('acquire_entry', key, limit, expiry, amount)
+
+    def get_moving_window(self, key, limit, expiry):
+        return tuple(self._call('get_moving_window', key, limit, expiry))
@@ -0,0 +1,238 @@
+"""
+Server-side token revocation for MRC authentication system.
+Logout records the jti of the access and refresh tokens in the revoked_token
+table. Every @jwt_required() request asks the Bloom filter in front of that
+table first: a jti it has never seen is definitely not revoked, so the common
+case costs no database I/O; only filter hits (revoked tokens and rare false
+positives) are confirmed with an indexed lookup.
+
+Each worker builds its filter from the table on first use and a background
+thread pulls rows added by other workers every REVOCATION_SYNC_INTERVAL
+seconds, so a revocation reaches every worker within that interval (at once in
+the worker that handled the logout). Rows for tokens past their exp are purged
+every REVOCATION_PURGE_INTERVAL seconds and the filter is rebuilt without them.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+SYNC_OVERLAP = 100
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter sized for `capacity` keys at `error_rate` false positives"""
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    @property
+    def memory_bytes(self):
+        return len(self._bits)
+
+    def _positions(self, key):
+        """`hashes` bit positions via double hashing of a single digest"""
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class TokenRevocationList:
+    """jti denylist: revoked_token table behind a per-worker Bloom filter"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.capacity = 100000
+        self.error_rate = 0.001
+        self.sync_interval = 2
+        self.purge_interval = 3600
+        self.bloom = None
+        self.last_id = 0
+        self.counters = {'checks': 0, 'filter_hits': 0, 'revoked': 0, 'false_positives': 0, 'errors': 0}
+        self._last_purge = time.monotonic()
+        self._lock = threading.Lock()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure from app config; the filter is loaded and the sync thread started on first use"""
+        self.app = app
+        self.capacity = app.config.get('REVOCATION_BLOOM_CAPACITY', 100000)
+        self.error_rate = app.config.get('REVOCATION_BLOOM_ERROR_RATE', 0.001)
+        self.sync_interval = app.config.get('REVOCATION_SYNC_INTERVAL', 2)
+        self.purge_interval = app.config.get('REVOCATION_PURGE_INTERVAL', 3600)
+        self.bloom = None
+        self.last_id = 0
+        self.counters = dict.fromkeys(self.counters, 0)
+        app.extensions['token_revocations'] = self
+
+    def revoke(self, claims):
+        """Add a decoded token to the denylist; it is stored when the caller commits"""
+        from app import db
+        from app.models import RevokedToken
+
+        if not claims.get('jti') or not claims.get('exp'):
+            return
+        self._ready()
+        db.session.add(RevokedToken(
+            jti=claims['jti'],
+            token_type=claims.get('type', 'access'),
+            user_id=int(claims['sub']) if str(claims.get('sub', '')).isdigit() else None,
+            expires_at=datetime.fromtimestamp(claims['exp'], timezone.utc)
+        ))
+        # This worker stops accepting it at once; the others on their next sync
+        with self._lock:
+            self.bloom.add(claims['jti'])
+
+    def is_token_revoked(self, jwt_header, jwt_payload):
+        """token_in_blocklist_loader callback"""
+        jti = jwt_payload.get('jti')
+        if jti is None:
+            return False
+        self._ready()
+        self._count('checks')
+        if jti not in self.bloom:
+            return False
+        self._count('filter_hits')
+        try:
+            revoked = self._stored(jti)
+        except Exception:
+            # Fail closed: a token the filter flags is refused while its status is unknown
+            logger.exception("Revocation lookup failed for a token the filter flagged")
+            self._count('errors')
+            return True
+        self._count('revoked' if revoked else 'false_positives')
+        return revoked
+
+    def _stored(self, jti):
+        from sqlalchemy import select
+        from app import db
+        from app.models import RevokedToken
+        return db.session.scalar(select(RevokedToken.id).where(RevokedToken.jti == jti)) is not None
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _ready(self):
+        """Load the filter on first use in this process and keep the sync thread running"""
+        if self.bloom is None:
+            self.rebuild()
+        if self.sync_interval:
+            self._ensure_thread()
+
+    def rebuild(self):
+        """Replace the filter with one built from the unexpired rows in the table"""
+        from sqlalchemy import func, select
+        from app import db
+        from app.models import RevokedToken
+
+        now = datetime.now(timezone.utc)
+        last_id = db.session.scalar(select(func.max(RevokedToken.id))) or 0
+        jtis = db.session.scalars(
+            select(RevokedToken.jti).where(RevokedToken.expires_at > now, RevokedToken.id <= last_id)
+        ).all()
+        # Keep the false positive rate at its target however many tokens are revoked
+        bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        with self._lock:
+            self.bloom = bloom
+            self.last_id = last_id
+        return len(jtis)
+
+    def sync(self):
+        """Add rows other workers inserted since the last sync; returns how many were new"""
+        from sqlalchemy import select
+        from app import db
+        from app.models import RevokedToken
+
+        # Ids can commit out of order on a server database, so each sync looks back
+        # SYNC_OVERLAP ids; rows already in the filter are skipped
+        rows = db.session.execute(
+            select(RevokedToken.id, RevokedToken.jti).where(RevokedToken.id > self.last_id - SYNC_OVERLAP)
+            .order_by(RevokedToken.id)
+        ).all()
+        db.session.rollback()
+        added = 0
+        with self._lock:
+            for _, jti in rows:
+                if jti not in self.bloom:
+                    self.bloom.add(jti)
+                    added += 1
+            if rows:
+                self.last_id = max(self.last_id, rows[-1][0])
+            overfull = self.bloom.count > self.bloom.capacity
+        if overfull:
+            self.rebuild()
+        return added
+
+    def purge(self, now=None):
+        """Delete rows for tokens that have expired anyway, then rebuild; returns rows deleted"""
+        from sqlalchemy import delete
+        from app import db
+        from app.models import RevokedToken
+
+        now = now or datetime.now(timezone.utc)
+        result = db.session.execute(
+            delete(RevokedToken).where(RevokedToken.expires_at <= now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        self._last_purge = time.monotonic()
+        self.rebuild()
+        return result.rowcount
+
+    def _ensure_thread(self):
+        """Start the sync thread (also restarts it in forked workers)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='token-revocation-sync', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        from app import db
+        with self.app.app_context():
+            while True:
+                time.sleep(self.sync_interval)
+                try:
+                    if time.monotonic() - self._last_purge >= self.purge_interval:
+                        self.purge()
+                    else:
+                        self.sync()
+                except Exception:
+                    logger.exception("Token revocation sync failed")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def metrics(self):
+        """Filter size and check counters for this process"""
+        with self._lock:
+            metrics = dict(self.counters)
+            metrics['entries'] = self.bloom.count if self.bloom is not None else 0
+            metrics['filter_bytes'] = self.bloom.memory_bytes if self.bloom is not None else 0
+            metrics['last_id'] = self.last_id
+        return metrics
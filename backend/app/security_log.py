@@ -0,0 +1,167 @@
+"""
+Non-blocking security audit log for MRC authentication system.
+Request threads only put the mrc_security LogRecord on a bounded in-memory
+queue; a QueueListener thread formats it and writes it to stdout and/or
+SECURITY_LOG_FILE. When the queue is full (the sink is stalled) records are
+dropped and counted rather than blocking logins. The records don't propagate to
+the root logger, whose handlers would run in the request thread.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+SECURITY_LOGGER = 'mrc_security'
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s %(message)s'
+
+
+class SecurityJSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, message and the record's audit fields"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'security', None) or {})
+        return json.dumps(entry, default=str)
+
+
+class StdoutHandler(logging.StreamHandler):
+    """StreamHandler writing to whatever sys.stdout is at emit time"""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks or formats in the caller's thread"""
+
+    def __init__(self, log_queue, on_fork=None):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.enqueued = 0
+        self._on_fork = on_fork
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._fork_lock = threading.Lock()
+
+    def prepare(self, record):
+        # The listener formats; audit args are immutable (str/int), so the record can go as is
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            # Forked worker: the listener thread stayed in the parent. The first thread
+            # here restarts it; the pid is only updated afterwards, so the others wait
+            with self._fork_lock:
+                if self._pid != os.getpid():
+                    if self._on_fork is not None:
+                        self._on_fork()
+                    self._pid = os.getpid()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+        else:
+            with self._lock:
+                self.enqueued += 1
+
+
+class SecurityLogListener(QueueListener):
+    """QueueListener whose stop() waits for room in a full queue instead of raising"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class SecurityLogPipeline:
+    """Routes the mrc_security logger through a bounded queue to a listener thread"""
+
+    def __init__(self, app=None, logger_name=SECURITY_LOGGER):
+        self.logger_name = logger_name
+        self.handler = None
+        self.listener = None
+        self.capacity = 0
+        self._running = False
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Install the queue handler and start the listener (replacing any earlier pipeline)"""
+        self.stop()
+        logger = logging.getLogger(self.logger_name)
+        if self.handler is not None:
+            logger.removeHandler(self.handler)
+
+        self.capacity = app.config.get('SECURITY_LOG_QUEUE_SIZE', 10000)
+        log_queue = queue.Queue(maxsize=self.capacity)
+        self.handler = DroppingQueueHandler(log_queue, on_fork=self._after_fork)
+        self.listener = SecurityLogListener(log_queue, *self._sinks(app.config), respect_handler_level=True)
+        logger.addHandler(self.handler)
+        # Without this, records would also reach the root logger's handlers synchronously;
+        # the SECURITY_LOG_* sinks are the only destinations (see DEPLOYMENT-GUIDE.md)
+        logger.propagate = False
+        self.start()
+        if not self._atexit_registered:
+            atexit.register(self.stop)
+            self._atexit_registered = True
+        app.extensions['security_log'] = self
+
+    @staticmethod
+    def _sinks(config):
+        """Handlers the listener writes to, from SECURITY_LOG_* config"""
+        if config.get('SECURITY_LOG_FORMAT', 'text') == 'json':
+            formatter = SecurityJSONFormatter()
+        else:
+            formatter = logging.Formatter(TEXT_FORMAT)
+        sinks = []
+        if config.get('SECURITY_LOG_STDOUT', True):
+            sinks.append(StdoutHandler())
+        if config.get('SECURITY_LOG_FILE'):
+            # Reopens the file after logrotate moves it
+            sinks.append(WatchedFileHandler(config['SECURITY_LOG_FILE']))
+        for sink in sinks:
+            sink.setFormatter(formatter)
+        return sinks
+
+    def start(self):
+        if self.listener is not None and not self._running:
+            self.listener.start()
+            self._running = True
+
+    def stop(self):
+        """Write out everything queued so far and stop the listener thread"""
+        if self.listener is not None and self._running:
+            self.listener.stop()
+            self._running = False
+
+    def _after_fork(self):
+        """Neither the listener thread nor the queue's locks survive fork: start afresh"""
+        self.handler.queue = queue.Queue(maxsize=self.capacity)
+        self.listener = SecurityLogListener(self.handler.queue, *self.listener.handlers,
+                                            respect_handler_level=True)
+        self._running = False
+        self.start()
+
+    def metrics(self):
+        """Queue depth and enqueued/dropped record counts for this process"""
+        if self.handler is None:
+            return {'enqueued': 0, 'dropped': 0, 'queued': 0, 'capacity': 0}
+        return {
+            'enqueued': self.handler.enqueued,
+            'dropped': self.handler.dropped,
+            'queued': self.handler.queue.qsize(),
+            'capacity': self.capacity
+        }
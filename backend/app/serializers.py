@@ -0,0 +1,44 @@
+"""
+Precompiled model serializers for MRC API responses.
+A serializer is built once per model with the fields it returns. Serializing
+an instance reads all of them in one itemgetter() call on the instance's
+loaded state instead of one attribute descriptor per field, and formats the
+datetime fields, known up front, without checking each value's type. Naive
+datetimes (as returned by SQLite) can be given a timezone so a value reads the
+same whether it was just set in Python or loaded from the database.
+Instances with expired or unloaded fields fall back to attribute access, which
+lets SQLAlchemy load them as usual.
+"""
+from operator import attrgetter, itemgetter
+
+
+class ModelSerializer:
+    """Fields of a model instance as a dict, datetime fields as ISO 8601 strings"""
+
+    def __init__(self, fields, datetime_fields=(), naive_tz=None):
+        self.fields = tuple(fields)
+        self.naive_tz = naive_tz
+        self._from_state = itemgetter(*self.fields)
+        self._from_attributes = attrgetter(*self.fields)
+        self._datetime_positions = tuple(self.fields.index(name) for name in datetime_fields)
+
+    def values(self, obj):
+        """The fields' raw values, in order"""
+        try:
+            return self._from_state(obj.__dict__)
+        except KeyError:
+            return self._from_attributes(obj)
+
+    def __call__(self, obj):
+        values = list(self.values(obj))
+        for position in self._datetime_positions:
+            value = values[position]
+            if value is not None:
+                if value.tzinfo is None and self.naive_tz is not None:
+                    value = value.replace(tzinfo=self.naive_tz)
+                values[position] = value.isoformat()
+        return dict(zip(self.fields, values))
+
+    def many(self, objs):
+        """Serialize a sequence of instances (listings)"""
+        return [self(obj) for obj in objs]
@@ -0,0 +1,80 @@
+"""
+Decoded JWT cache for MRC authentication system.
+A dashboard polls with the same access token cookie over and over; verifying it
+means parsing the token twice and checking its signature every time. The JWT
+manager here remembers the claims of each token that verified, keyed by a
+SHA-256 of the raw token, until the token's exp, in a bounded per-worker LRU
+(JWT_DECODE_CACHE_SIZE, 0 disables). A cache hit is the exact token bytes that
+already passed signature, exp/nbf and audience checks; expiry is re-checked on
+every hit, and everything Flask-JWT-Extended does after decoding (token type,
+freshness, revocation, custom claim checks) still runs on every request.
+"""
+import hashlib
+import hmac
+import threading
+import time
+
+from flask_jwt_extended import JWTManager
+from flask_jwt_extended.exceptions import CSRFError, JWTDecodeError
+
+from app.cache import MemoryBackend
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that skips re-verifying tokens it has already decoded"""
+
+    def __init__(self, app=None, add_context_processor=False):
+        self.decode_cache = None
+        self._counter_lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0}
+        super().__init__(app, add_context_processor)
+
+    def init_app(self, app, add_context_processor=False):
+        """Register the extension and size the decode cache from JWT_DECODE_CACHE_SIZE"""
+        super().init_app(app, add_context_processor)
+        maxsize = app.config.get('JWT_DECODE_CACHE_SIZE', 1024)
+        self.decode_cache = MemoryBackend(maxsize) if maxsize else None
+        self.counters = {'hits': 0, 'misses': 0}
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if self.decode_cache is None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        raw = encoded_token.encode() if isinstance(encoded_token, str) else encoded_token
+        key = hashlib.sha256(raw).digest()
+        claims = self.decode_cache.get(key)
+        # exp is checked against the wall clock as well as the entry's own expiry
+        if claims is not None and claims['exp'] > time.time():
+            if csrf_value:
+                if 'csrf' not in claims:
+                    raise JWTDecodeError("Missing claim: csrf")
+                if not hmac.compare_digest(claims['csrf'], csrf_value):
+                    raise CSRFError("CSRF double submit tokens do not match")
+            self._count('hits')
+            return claims
+
+        self._count('misses')
+        claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        remaining = claims.get('exp', 0) - time.time()
+        if remaining > 0:  # Tokens without exp are never cached
+            self.decode_cache.set(key, claims, ttl=remaining)
+        return claims
+
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def clear_decode_cache(self):
+        """Forget every cached token (e.g. after changing the signing key)"""
+        if self.decode_cache is not None:
+            self.decode_cache.clear()
+
+    def metrics(self):
+        """Decode cache counters for monitoring"""
+        with self._counter_lock:
+            counters = dict(self.counters)
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_ratio'] = round(counters['hits'] / lookups, 4) if lookups else None
+        counters['size'] = self.decode_cache.size() if self.decode_cache is not None else 0
+        counters['enabled'] = self.decode_cache is not None
+        return counters
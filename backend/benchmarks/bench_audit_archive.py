@@ -0,0 +1,102 @@
+"""
+Audit archive: database size reclaimed, segment compression and scan speed.
+
+Seeds --days of audit events (--per-day each) older than the retention window,
+runs the archiver, and reports the database file size before and after
+(VACUUMed), the compressed segment size, and the latency of archive queries
+that the segment indexes prune to one segment versus a full scan.
+
+    python -m benchmarks.bench_audit_archive [--days 60] [--per-day 20000]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, text
+
+from app import audit_archive, db
+from app.models import AuditEvent
+from benchmarks.common import make_app, print_table, summarize, timed
+
+EVENT_TYPES = ['LOGIN_SUCCESS'] * 6 + ['LOGIN_FAILED'] * 3 + ['LOGOUT'] * 4 + ['PASSWORD_REHASHED']
+
+
+def compact(path):
+    """VACUUM, then checkpoint so the WAL's copy lands in (and shrinks) the main file"""
+    db.session.execute(text('VACUUM'))
+    db.session.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+    return os.path.getsize(path)
+
+
+def mib(size):
+    return f"{size / 1048576:.1f} MiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--per-day', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    archive_dir = tempfile.mkdtemp(prefix='mrc-bench-archive-')
+    app = make_app(AUDIT_ARCHIVE_DIR=archive_dir, AUDIT_HOT_RETENTION_DAYS=1)
+    first_day = (datetime.now(timezone.utc) - timedelta(days=args.days + 2)).replace(
+        hour=0, minute=0, second=0, microsecond=0)
+    with app.app_context():
+        for day in range(args.days):
+            start = first_day + timedelta(days=day)
+            # A rare lockout burst on a few days gives the event type bitmap something to prune
+            types = EVENT_TYPES + (['ACCOUNT_LOCKED'] if day % 20 == 7 else [])
+            db.session.execute(insert(AuditEvent.__table__), [{
+                'user_id': random.randint(1, args.users),
+                'event_type': random.choice(types),
+                'ip_address': f'203.0.113.{n % 250}',
+                'details': f'Attempt {n % 5 + 1}' if n % 3 == 0 else None,
+                'created_at': start + timedelta(seconds=n * 86400 / args.per_day),
+            } for n in range(args.per_day)])
+            db.session.commit()
+        rows = args.days * args.per_day
+        before = compact(app.bench_db_path)
+
+        start = time.perf_counter()
+        archived = audit_archive.archive_closed_partitions()
+        archive_elapsed = time.perf_counter() - start
+        after = compact(app.bench_db_path)
+        segment_bytes = sum(index['bytes'] for index in audit_archive.indexes())
+        db.session.remove()
+
+        print(f"\narchived {sum(archived.values())} of {rows} events ({len(archived)} days) in "
+              f"{archive_elapsed:.1f}s ({sum(archived.values()) / archive_elapsed:.0f} rows/s)")
+        print(f"database: {mib(before)} -> {mib(after)} after VACUUM; segments: {mib(segment_bytes)}")
+
+        middle = first_day + timedelta(days=args.days // 2, hours=9)
+        queries = {
+            'user, 1 hour': dict(since=middle, until=middle + timedelta(hours=1), user_id=7),
+            'failed logins, 24h': dict(since=middle, until=middle + timedelta(days=1),
+                                       event_types=['LOGIN_FAILED']),
+            'lockouts, all': dict(event_types=['ACCOUNT_LOCKED']),
+            'user, all': dict(user_id=7),
+        }
+        results = {}
+        for label, filters in queries.items():
+            samples = []
+            for _ in range(args.repeat):
+                matched, ms = timed(lambda: sum(1 for _ in audit_archive.scan(**filters)))
+                samples.append(ms)
+            segments = len(audit_archive.matching_segments(**filters))
+            results[f'{label} ({segments} seg)'] = summarize(samples)
+            print(f"{label}: {matched} events from {segments} of {len(archived)} segments")
+
+    print_table('Archive query latency (ms)', results)
+    shutil.rmtree(archive_dir)
+    os.unlink(app.bench_db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Audit trail: write cost per security event and page latency at depth.
+
+Compares committing one audit_event INSERT per event in the request thread
+with the write-behind buffer (record() in the request, bulk INSERT by the
+flusher), then seeds --rows events and times fetching one page at increasing
+depths, across all users and for one user, with OFFSET versus the keyset
+cursor GET /api/admin/audit-events uses.
+
+    python -m benchmarks.bench_audit_events [--rows 1000000] [--events 5000] [--page-size 50]
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select
+
+from app import audit_events, db
+from app.audit import decode_cursor, query_events
+from app.models import AuditEvent
+from benchmarks.common import make_app, print_table, summarize, timed
+
+EVENT_TYPES = ['LOGIN_SUCCESS', 'LOGIN_FAILED', 'LOGOUT', 'ACCOUNT_LOCKED', 'PASSWORD_REHASHED']
+
+
+def seed(rows, users):
+    """Insert `rows` events spread over the last 90 days, in chunks"""
+    start = datetime.now(timezone.utc) - timedelta(days=90)
+    step = timedelta(days=90) / rows
+    chunk = []
+    for n in range(rows):
+        chunk.append({
+            'user_id': random.randint(1, users),
+            'event_type': random.choice(EVENT_TYPES),
+            'ip_address': f'203.0.113.{n % 250}',
+            'details': None,
+            'created_at': start + step * n,
+        })
+        if len(chunk) == 50000:
+            db.session.execute(insert(AuditEvent.__table__), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(insert(AuditEvent.__table__), chunk)
+    db.session.commit()
+
+
+def offset_page(user_id, offset, limit):
+    """The page query written with OFFSET instead of a cursor"""
+    conditions = [AuditEvent.user_id == user_id] if user_id is not None else []
+    return db.session.scalars(
+        select(AuditEvent).where(*conditions)
+        .order_by(AuditEvent.created_at.desc(), AuditEvent.id.desc())
+        .offset(offset).limit(limit)
+    ).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per page')
+    args = parser.parse_args()
+
+    app = make_app(AUDIT_EVENTS_ENABLED=True, AUDIT_FLUSH_SIZE=500)
+    with app.app_context():
+        # Write path: synchronous insert+commit per event versus record() into the buffer
+        sync = []
+        for _ in range(args.events):
+            def write_now():
+                db.session.execute(insert(AuditEvent.__table__), [{
+                    'user_id': 1, 'event_type': 'LOGIN_FAILED', 'ip_address': '203.0.113.7',
+                    'details': None, 'created_at': datetime.now(timezone.utc)
+                }])
+                db.session.commit()
+            sync.append(timed(write_now)[1])
+        buffered = [timed(audit_events.record, 1, 'LOGIN_FAILED', '203.0.113.7')[1]
+                    for _ in range(args.events)]
+        start = time.perf_counter()
+        audit_events.flush()
+        flush_elapsed = time.perf_counter() - start
+        written = audit_events.metrics()['written']
+        db.session.execute(AuditEvent.__table__.delete())
+        db.session.commit()
+
+        print_table(f'Cost per security event in the request thread (ms), {args.events} events', {
+            'INSERT + commit per event': summarize(sync),
+            'buffer record()': summarize(buffered),
+        })
+        print(f"final flush: {written} rows in {flush_elapsed * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        seed(args.rows, args.users)
+        print(f"\nseeded {args.rows} events in {time.perf_counter() - start:.1f}s")
+
+        depths = [d for d in (0, 10000, 100000, 500000, args.rows - args.page_size) if d < args.rows]
+        results = {}
+        for label, user_id in (('all users', None), ('user 1', 1)):
+            for depth in depths:
+                offset_ms, keyset_ms = [], []
+                after = offset_page(user_id, depth - 1, 1) if depth else []
+                if depth and not after:
+                    continue  # this user's history is shorter
+                cursor = (after[0].created_at, after[0].id) if after else None
+                for _ in range(args.repeat):
+                    offset_ms.append(timed(offset_page, user_id, depth, args.page_size)[1])
+                    keyset_ms.append(timed(query_events, user_id=user_id, cursor=cursor,
+                                           limit=args.page_size)[1])
+                results[f'{label} @{depth} OFFSET'] = summarize(offset_ms)
+                results[f'{label} @{depth} keyset'] = summarize(keyset_ms)
+        db.session.remove()
+
+    os.unlink(app.bench_db_path)
+    print_table(f'Latency of one {args.page_size}-event page at a given depth (ms)', results)
+
+
+if __name__ == '__main__':
+    main()
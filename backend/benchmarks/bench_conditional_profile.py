@@ -0,0 +1,49 @@
+"""
+Polling the profile endpoints with and without If-None-Match.
+
+Polls GET /api/me and GET /api/auth/profile with one logged-in client, once
+unconditionally (200 with the profile) and once revalidating with the ETag of
+the previous response (304 with no body), and reports latency and body bytes.
+
+    python -m benchmarks.bench_conditional_profile [--requests 3000]
+"""
+import argparse
+import os
+
+from benchmarks.common import make_app, print_table, seed_user, summarize, timed
+
+PASSWORD = 'BenchPass123!'
+ENDPOINTS = ('/api/me', '/api/auth/profile')
+
+
+def poll(client, path, requests, headers=None):
+    samples, body_bytes = [], 0
+    for _ in range(requests):
+        response, ms = timed(client.get, path, headers=headers)
+        samples.append(ms)
+        body_bytes += len(response.data)
+    return summarize(samples), body_bytes / requests, response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=3000)
+    args = parser.parse_args()
+
+    app = make_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=4)
+    seed_user(app, 'bench', PASSWORD)
+    client = app.test_client()
+    assert client.post('/api/auth/login', json={'username': 'bench', 'password': PASSWORD}).status_code == 200
+
+    rows = {}
+    for path in ENDPOINTS:
+        etag = client.get(path).headers['ETag']  # warm up
+        for label, headers in (('full', None), ('revalidated', {'If-None-Match': etag})):
+            rows[f'{path} {label}'], body_bytes, status = poll(client, path, args.requests, headers)
+            print(f"{path} {label}: {status}, {body_bytes:.0f} body bytes per response")
+    os.unlink(app.bench_db_path)
+    print_table(f'GET latency (ms), {args.requests} requests', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Password reset email: request latency and outbox delivery throughput.
+
+Runs a local aiosmtpd server that answers each message after --relay-delay-ms
+and each EHLO after --handshake-delay-ms (standing in for a remote relay such as
+SendGrid, where connecting costs TLS and AUTH round trips), then compares
+sending inline in the request (what POST /api/auth/request-password-reset used
+to do) with the outbox: request latency now that the route only queues, and the
+worker's end-to-end delivery rate over its pooled SMTP connection.
+
+    python -m benchmarks.bench_email_outbox [--requests 200] [--relay-delay-ms 150] [--handshake-delay-ms 100]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import time
+
+from aiosmtpd.controller import Controller
+from flask_mail import Message
+
+from app import db, email_outbox, mail
+from app.models import OutboxMessage
+from benchmarks.common import make_app, print_table, seed_user, summarize, timed
+
+PASSWORD = 'BenchPass123!'
+
+
+class SlowRelay:
+    """Accepts every message after a fixed delay, and is slow to greet new connections"""
+
+    def __init__(self, delay, handshake_delay=0):
+        self.delay = delay
+        self.handshake_delay = handshake_delay
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake_delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.delay)
+        self.received += 1
+        return '250 Message accepted for delivery'
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--relay-delay-ms', type=float, default=150)
+    parser.add_argument('--handshake-delay-ms', type=float, default=100)
+    args = parser.parse_args()
+
+    relay = SlowRelay(args.relay_delay_ms / 1000, args.handshake_delay_ms / 1000)
+    port = free_port()
+    controller = Controller(relay, hostname='127.0.0.1', port=port)
+    controller.start()
+
+    app = make_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=4, MAIL_SUPPRESS_SEND=False,
+                   MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False,
+                   MAIL_USERNAME=None, MAIL_PASSWORD=None)
+    seed_user(app, 'bench', PASSWORD, email='bench@bench.mrc')
+    client = app.test_client()
+
+    # Inline: the SMTP round trip (new connection each time) every reset request used to wait for
+    inline = []
+    with app.app_context():
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            _, ms = timed(mail.send, Message('Password Reset - MRC Authentication',
+                                             sender=app.config['MAIL_DEFAULT_SENDER'],
+                                             recipients=['bench@bench.mrc'], body='Reset link'))
+            inline.append(ms)
+        inline_elapsed = time.perf_counter() - start
+
+    # Outbox: the request only queues
+    queued = []
+    for _ in range(args.requests):
+        response, ms = timed(client.post, '/api/auth/request-password-reset',
+                             json={'email': 'bench@bench.mrc'})
+        assert response.status_code == 200
+        queued.append(ms)
+
+    received_before = relay.received
+    with app.app_context():
+        start = time.perf_counter()
+        while email_outbox.process_batch():
+            pass
+        elapsed = time.perf_counter() - start
+        pending = OutboxMessage.query.filter_by(status=OutboxMessage.PENDING).count()
+        smtp = email_outbox.dispatcher.metrics()
+        email_outbox.dispatcher.close()
+        db.session.remove()
+    delivered = relay.received - received_before
+
+    controller.stop()
+    os.unlink(app.bench_db_path)
+
+    print_table(f'Reset email cost per request (ms), relay delay {args.relay_delay_ms:g} ms, '
+                f'handshake {args.handshake_delay_ms:g} ms', {
+                    'inline mail.send': summarize(inline),
+                    'outbox request': summarize(queued),
+                })
+    print(f"\nmail.send per message: {args.requests / inline_elapsed:.1f} msg/s "
+          f"({args.requests} connections)")
+    print(f"Outbox worker: {delivered} delivered in {elapsed:.2f}s ({delivered / elapsed:.1f} msg/s, "
+          f"{smtp['connections']} connections, {smtp['reconnects']} reconnects), {pending} still pending")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: login identifier lookup, case-sensitive OR query vs normalized index.
+
+    python -m benchmarks.bench_identity_lookup [--users 100000] [--lookups 2000]
+"""
+import argparse
+import random
+
+from sqlalchemy import insert
+
+from app import db
+from app.models import User
+from benchmarks.common import make_app, print_table, summarize, timed
+
+
+def seed_users(count):
+    """Bulk insert count users with mixed-case identifiers"""
+    rows = [
+        {
+            'username': f'User{i}',
+            'username_normalized': f'user{i}',
+            'email': f'User{i}@Bench.MRC',
+            'email_normalized': f'user{i}@bench.mrc',
+            'password_hash': 'x',
+            'full_name': f'User {i}',
+        }
+        for i in range(count)
+    ]
+    db.session.execute(insert(User.__table__), rows)
+    db.session.commit()
+
+
+def legacy_lookup(identifier):
+    """The pre-normalization query: exact match on either column"""
+    return User.query.filter(
+        (User.username == identifier) | (User.email == identifier)
+    ).first()
+
+
+def legacy_ci_lookup(identifier):
+    """Case-insensitive without the normalized columns: lower() defeats the index"""
+    key = identifier.lower()
+    return User.query.filter(
+        (db.func.lower(User.username) == key) | (db.func.lower(User.email) == key)
+    ).first()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = make_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=4)
+    rng = random.Random(7)
+    with app.app_context():
+        seed_users(args.users)
+        identifiers = []
+        for _ in range(args.lookups):
+            i = rng.randrange(args.users)
+            identifiers.append(f'user{i}@bench.mrc' if rng.random() < 0.5 else f'USER{i}')
+
+        rows = {}
+        for label, lookup in (
+            ('OR exact match', legacy_lookup),
+            ('OR lower()', legacy_ci_lookup),
+            ('normalized index', User.find_by_login),
+        ):
+            samples = []
+            # lower() scans the whole table; a sample is enough to show the trend
+            count = len(identifiers) if lookup is not legacy_ci_lookup else min(len(identifiers), 50)
+            for identifier in identifiers[:count]:
+                _, ms = timed(lookup, identifier)
+                samples.append(ms)
+                db.session.expunge_all()
+            rows[label] = summarize(samples)
+
+    print_table(f'Identifier lookup latency (ms), {args.users} users', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Response serialization cost with the stdlib and orjson JSON providers.
+
+Times serializing a listing of users (User.to_dict() per user, then one JSON
+document) with the previous attribute-by-attribute to_dict() and the
+precompiled serializer under each provider, then polls GET /api/me and
+GET /api/auth/profile with JSON_PROVIDER = 'stdlib' and 'orjson'.
+
+    python -m benchmarks.bench_json_serialization [--users 500] [--requests 3000]
+"""
+import argparse
+import os
+import time
+
+from app import db
+from app.json_provider import orjson
+from app.models import User
+from benchmarks.common import make_app, print_table, seed_user, summarize, timed
+
+PASSWORD = 'BenchPass123!'
+PROVIDERS = ('stdlib', 'orjson') if orjson is not None else ('stdlib',)
+ENDPOINTS = ('/api/me', '/api/auth/profile')
+
+
+def attribute_to_dict(user):
+    """User.to_dict() as it was before the precompiled serializer"""
+    last_login = user.current_last_login()
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'full_name': user.full_name,
+        'phone': user.phone,
+        'created_at': user.created_at.isoformat() if user.created_at else None,
+        'last_login': last_login.isoformat() if last_login else None,
+        'is_active': user.is_active
+    }
+
+
+def per_listing_ms(func, rounds=50):
+    func()  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def measure_listing(args):
+    print(f"\nserializing {args.users} users, ms per listing")
+    print(f"{'provider':<10}{'to_dict':>20}{'ms':>10}")
+    for provider in PROVIDERS:
+        app = make_app(JSON_PROVIDER=provider)
+        with app.app_context():
+            db.session.add_all(User(username=f'user{n}', email=f'user{n}@bench.mrc', full_name=f'User {n}',
+                                    password_hash='x') for n in range(args.users))
+            db.session.commit()
+            users = db.session.scalars(db.select(User)).all()
+            for label, to_dict in (('attributes', attribute_to_dict), ('serializer', User.to_dict)):
+                ms = per_listing_ms(lambda: app.json.dumps({'users': [to_dict(user) for user in users]}))
+                print(f"{provider:<10}{label:>20}{ms:>10.3f}")
+        os.unlink(app.bench_db_path)
+
+
+def measure_endpoints(provider, args):
+    app = make_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=4, JSON_PROVIDER=provider)
+    seed_user(app, 'bench', PASSWORD)
+    client = app.test_client()
+    assert client.post('/api/auth/login', json={'username': 'bench', 'password': PASSWORD}).status_code == 200
+    rows = {}
+    for path in ENDPOINTS:
+        assert client.get(path).status_code == 200  # warm up
+        samples = []
+        for _ in range(args.requests):
+            response, ms = timed(client.get, path)
+            assert response.status_code == 200
+            samples.append(ms)
+        rows[f'{path} {provider}'] = summarize(samples)
+    os.unlink(app.bench_db_path)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=3000)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson is not installed; timing the stdlib provider only")
+    measure_listing(args)
+    rows = {}
+    for provider in PROVIDERS:
+        rows.update(measure_endpoints(provider, args))
+    print_table(f'GET latency (ms), {args.requests} requests', rows)
+
+
+if __name__ == '__main__':
+    main()
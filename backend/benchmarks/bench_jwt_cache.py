@@ -0,0 +1,71 @@
+"""
+Authenticated request overhead with and without the decoded JWT cache.
+
+Times verify_jwt_in_request() alone (the per-request token work of
+@jwt_required) and a full GET /api/me served from the profile cache, for a
+client polling with one access token cookie, with JWT_DECODE_CACHE_SIZE on and 0.
+
+    python -m benchmarks.bench_jwt_cache [--requests 5000]
+"""
+import argparse
+import os
+import time
+
+from flask_jwt_extended import create_access_token, verify_jwt_in_request
+
+from benchmarks.common import make_app, print_table, seed_user, summarize, timed
+
+PASSWORD = 'BenchPass123!'
+
+
+def measure(cache_size, args):
+    app = make_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=4, JWT_DECODE_CACHE_SIZE=cache_size)
+    user_id = seed_user(app, 'bench', PASSWORD)
+    with app.app_context():
+        token = create_access_token(identity=str(user_id))
+    cookie = f'access_token_cookie={token}'
+
+    # Token verification alone, inside a ready-made request context
+    with app.test_request_context('/api/me', headers={'Cookie': cookie}):
+        verify_jwt_in_request()  # warm up
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            verify_jwt_in_request()
+        verify_us = (time.perf_counter() - start) / args.requests * 1e6
+
+    client = app.test_client()
+    client.set_cookie('access_token_cookie', token)
+    assert client.get('/api/me').status_code == 200  # fills the profile cache
+    requests = []
+    for _ in range(args.requests):
+        response, ms = timed(client.get, '/api/me')
+        assert response.status_code == 200
+        requests.append(ms)
+    metrics = app.extensions['flask-jwt-extended'].metrics()
+    os.unlink(app.bench_db_path)
+    return verify_us, summarize(requests), metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    verify = {}
+    rows = {}
+    for label, size in (('no cache', 0), ('decode cache', 1024)):
+        verify[label], rows[f'GET /api/me ({label})'], metrics = measure(size, args)
+        if metrics['enabled']:
+            print(f"{label}: {metrics['hits']} hits, {metrics['misses']} misses")
+
+    print(f"\nverify_jwt_in_request() per call, {args.requests} calls")
+    for label, us in verify.items():
+        print(f"{label:<28}{us:>10.2f} us")
+    print_table(f'GET /api/me latency (ms), {args.requests} requests', rows)
+    saved = verify['no cache'] - verify['decode cache']
+    print(f"\ntoken verification saved per request: {saved:.1f} us "
+          f"({saved / verify['no cache'] * 100:.0f}% of its cost)")
+
+
+if __name__ == '__main__':
+    main()
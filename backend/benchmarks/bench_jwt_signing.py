@@ -0,0 +1,51 @@
+"""
+Token signing and verification cost per JWT algorithm.
+
+Times create_access_token() (every login and refresh) and decode_token() with
+the decode cache off (a cache miss here, and every request in a service
+verifying against the JWKS) for HS256, EdDSA and RS256, each with its own key ring.
+
+    python -m benchmarks.bench_jwt_signing [--tokens 2000]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from flask_jwt_extended import create_access_token, decode_token
+
+from benchmarks.common import make_app
+
+ALGORITHMS = ('HS256', 'EdDSA', 'RS256')
+
+
+def per_call_us(func, count):
+    func()  # warm up (creates the first key)
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tokens', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"\nper call, {args.tokens} calls")
+    print(f"{'algorithm':<12}{'sign us':>10}{'verify us':>12}{'token bytes':>14}")
+    for algorithm in ALGORITHMS:
+        key_dir = tempfile.mkdtemp(prefix='mrc-bench-keys-')
+        app = make_app(JWT_ALGORITHM=algorithm, JWT_KEY_DIR=key_dir, JWT_DECODE_CACHE_SIZE=0)
+        with app.app_context():
+            sign = per_call_us(lambda: create_access_token(identity='42'), args.tokens)
+            token = create_access_token(identity='42')
+            verify = per_call_us(lambda: decode_token(token), args.tokens)
+        print(f"{algorithm:<12}{sign:>10.1f}{verify:>12.1f}{len(token):>14}")
+        shutil.rmtree(key_dir)
+        os.unlink(app.bench_db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Mixed login + profile traffic benchmark.
+
+Runs concurrent login threads alongside /api/me and /api/health pollers and
+reports poller latency with bcrypt hashed inline (HASHING_POOL_SIZE=0) versus
+on the hashing process pool.
+
+    python -m benchmarks.bench_login_mixed [--seconds 10] [--logins 4] [--pollers 4]
+"""
+import argparse
+import os
+import threading
+import time
+
+from benchmarks.common import make_app, seed_user, timed, summarize, print_table
+
+PASSWORD = 'BenchPass123!'
+
+
+def run(pool_size, seconds, login_threads, poller_threads):
+    app = make_app(HASHING_POOL_SIZE=pool_size)
+    seed_user(app, 'bench', PASSWORD)
+    credentials = {'username': 'bench', 'password': PASSWORD}
+    samples = {'login': [], '/api/me': [], '/api/health': []}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def record(key, elapsed):
+        with lock:
+            samples[key].append(elapsed)
+
+    def login_loop():
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            _, elapsed = timed(client.post, '/api/auth/login', json=credentials)
+            record('login', elapsed)
+
+    def poll_loop():
+        client = app.test_client()
+        client.post('/api/auth/login', json=credentials)
+        while time.monotonic() < deadline:
+            for path in ('/api/me', '/api/health'):
+                _, elapsed = timed(client.get, path)
+                record(path, elapsed)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(login_threads)]
+    threads += [threading.Thread(target=poll_loop) for _ in range(poller_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    os.unlink(app.bench_db_path)
+    return {key: summarize(values) for key, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--logins', type=int, default=4)
+    parser.add_argument('--pollers', type=int, default=4)
+    args = parser.parse_args()
+
+    for label, pool_size in (('inline', 0), ('process pool', os.cpu_count() or 1)):
+        results = run(pool_size, args.seconds, args.logins, args.pollers)
+        print_table(f"{label} (HASHING_POOL_SIZE={pool_size}), latency ms", results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+GET /api/me served from the token's profile snapshot versus the cache or database.
+
+Polls /api/me with one logged-in client with PROFILE_SNAPSHOT_ENABLED on and
+off, and with the profile cache on ('memory') and off ('none'), counting the
+SQL statements each request issues.
+
+    python -m benchmarks.bench_profile_snapshot [--requests 3000]
+"""
+import argparse
+import os
+
+from sqlalchemy import event
+
+from app import db
+from benchmarks.common import make_app, print_table, seed_user, summarize, timed
+
+PASSWORD = 'BenchPass123!'
+VARIANTS = {
+    'database (no cache)': dict(PROFILE_SNAPSHOT_ENABLED=False, PROFILE_CACHE_BACKEND='none'),
+    'profile cache': dict(PROFILE_SNAPSHOT_ENABLED=False, PROFILE_CACHE_BACKEND='memory'),
+    'token snapshot': dict(PROFILE_SNAPSHOT_ENABLED=True, PROFILE_CACHE_BACKEND='none'),
+}
+
+
+def measure(overrides, args):
+    app = make_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=4, **overrides)
+    seed_user(app, 'bench', PASSWORD)
+    client = app.test_client()
+    assert client.post('/api/auth/login', json={'username': 'bench', 'password': PASSWORD}).status_code == 200
+    assert client.get('/api/me').status_code == 200  # warm up
+
+    statements = []
+    with app.app_context():
+        listener = lambda *_: statements.append(1)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        requests = []
+        for _ in range(args.requests):
+            response, ms = timed(client.get, '/api/me')
+            assert response.status_code == 200
+            requests.append(ms)
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    os.unlink(app.bench_db_path)
+    return summarize(requests), len(statements) / args.requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=3000)
+    args = parser.parse_args()
+
+    rows = {}
+    for label, overrides in VARIANTS.items():
+        rows[label], per_request = measure(overrides, args)
+        print(f"{label}: {per_request:.2f} SQL statements per request")
+    print_table(f'GET /api/me latency (ms), {args.requests} requests', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Rate limiter overhead per request for each storage backend.
+
+Times GET /api/health under an application-wide limit with the limiter disabled,
+then with memory://, sqlite://, mrc-shared:// (cache server in a separate
+process) and, when --redis is given, redis://; for both window strategies.
+
+    python -m benchmarks.bench_ratelimit_storage [--requests 2000] [--redis redis://localhost:6379]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from app import limiter
+from app.cache import make_cache_server
+from benchmarks.common import make_app, print_table, summarize, timed
+
+CACHE_KEY = 'bench-cache-server-key'
+
+
+def serve_cache(address):
+    make_cache_server(address, CACHE_KEY).serve_forever()
+
+
+def measure(requests, **config):
+    app = make_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=4,
+                   RATELIMIT_APPLICATION='1000000/minute', **config)
+    client = app.test_client()
+    client.get('/api/health')  # Warm up connections and the storage schema
+    assert limiter.enabled == config.get('RATELIMIT_ENABLED', True)
+    samples = []
+    for _ in range(requests):
+        response, ms = timed(client.get, '/api/health')
+        assert response.status_code == 200
+        samples.append(ms)
+    os.unlink(app.bench_db_path)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--redis', help='redis:// URI to include (needs the redis package)')
+    args = parser.parse_args()
+
+    address = '127.0.0.1:5711'
+    server = multiprocessing.Process(target=serve_cache, args=(address,), daemon=True)
+    server.start()
+    time.sleep(0.5)
+    limits_db = tempfile.mkdtemp(prefix='mrc-bench-limits-')
+
+    backends = {
+        'memory': 'memory://',
+        'sqlite': f'sqlite:///{limits_db}/limits.db',
+        'mrc-shared': f'mrc-shared://{address}',
+    }
+    if args.redis:
+        backends['redis'] = args.redis
+
+    rows = {'disabled': summarize(measure(args.requests, RATELIMIT_ENABLED=False))}
+    for strategy in ('fixed-window', 'moving-window'):
+        for name, uri in backends.items():
+            limiter._strategy = None  # The global limiter keeps the first strategy it was given
+            rows[f'{name} {strategy}'] = summarize(measure(
+                args.requests, RATELIMIT_ENABLED=True, RATELIMIT_STORAGE_URI=uri,
+                RATELIMIT_STRATEGY=strategy, CACHE_SERVER_AUTHKEY=CACHE_KEY
+            ))
+
+    server.terminate()
+    baseline = rows['disabled']['mean']
+    print_table(f'GET /api/health latency (ms), {args.requests} requests', rows)
+    print(f"\n{'':<28}{'overhead/req (ms)':>20}")
+    for label, stats in rows.items():
+        print(f"{label:<28}{stats['mean'] - baseline:>20.3f}")
+
+
+if __name__ == '__main__':
+    main()
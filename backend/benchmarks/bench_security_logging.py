@@ -0,0 +1,111 @@
+"""
+Security audit logging overhead, synchronous versus queued.
+
+"sync" reproduces the previous behaviour: the f-string is built eagerly and a
+file handler on mrc_security writes it in the request thread. "queued" is the
+current pipeline: the request thread only enqueues the record and the listener
+thread formats and writes it. --sink-delay-ms makes every write slow (a
+congested disk or remote log shipper) to show what the request thread pays.
+
+    python -m benchmarks.bench_security_logging [--events 20000] [--logins 300] [--sink-delay-ms 0]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from app import security_log
+from app.models import User, security_logger
+from benchmarks.common import make_app, print_table, seed_user, summarize, timed
+
+PASSWORD = 'BenchPass123!'
+
+
+class SlowFileHandler(logging.FileHandler):
+    """File handler whose every write takes at least `delay` seconds"""
+
+    def __init__(self, path, delay):
+        super().__init__(path)
+        self.delay = delay
+
+    def emit(self, record):
+        if self.delay:
+            time.sleep(self.delay)
+        super().emit(record)
+
+
+def legacy_log_security_event(self, event_type, ip_address=None, details=None):
+    """log_security_event as it was: eager f-string formatting"""
+    user_info = f"User:{self.id}({self.username})"
+    ip_info = f" IP:{ip_address}" if ip_address else ""
+    detail_info = f" Details:{details}" if details else ""
+    security_logger.warning(f"SECURITY: {event_type} - {user_info}{ip_info}{detail_info}")
+
+
+def measure(mode, args, log_path):
+    app = make_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=4, SECURITY_LOG_STDOUT=False)
+    security_logger.setLevel(logging.WARNING)  # benchmarks.common silences it
+    sink = SlowFileHandler(log_path, args.sink_delay_ms / 1000)
+    sink.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+    original = User.log_security_event
+    if mode == 'sync':
+        security_logger.removeHandler(security_log.handler)
+        security_logger.addHandler(sink)
+        User.log_security_event = legacy_log_security_event
+    else:
+        security_log.listener.handlers = (sink,)
+
+    try:
+        user = User(id=1, username='bench')
+        start = time.perf_counter()
+        for n in range(args.events):
+            user.log_security_event('LOGIN_SUCCESS', '203.0.113.7')
+        per_event_us = (time.perf_counter() - start) / args.events * 1e6
+        if mode == 'queued':
+            security_log.stop()  # Drain, so the login run starts with an empty queue
+            security_log.start()
+
+        seed_user(app, 'bench', PASSWORD)
+        client = app.test_client()
+        credentials = {'username': 'bench', 'password': PASSWORD}
+        logins = []
+        for _ in range(args.logins):
+            response, ms = timed(client.post, '/api/auth/login', json=credentials)
+            assert response.status_code == 200
+            logins.append(ms)
+        dropped = security_log.metrics()['dropped'] if mode == 'queued' else 0
+    finally:
+        User.log_security_event = original
+        security_log.stop()
+        security_logger.removeHandler(sink)
+        sink.close()
+        os.unlink(app.bench_db_path)
+    return per_event_us, summarize(logins), dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--logins', type=int, default=300)
+    parser.add_argument('--sink-delay-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    log_dir = tempfile.mkdtemp(prefix='mrc-bench-seclog-')
+    per_event = {}
+    rows = {}
+    for mode in ('sync', 'queued'):
+        per_event[mode], rows[f'login ({mode})'], dropped = measure(mode, args, os.path.join(log_dir, f'{mode}.log'))
+        if dropped:
+            print(f"{mode}: {dropped} records dropped (queue full)")
+
+    print(f"\nlog_security_event cost per call (sink delay {args.sink_delay_ms:g} ms)")
+    for mode, us in per_event.items():
+        print(f"{mode:<28}{us:>10.2f} us")
+    print_table(f'POST /api/auth/login latency (ms), {args.logins} logins', rows)
+    print(f"\nper-login logging overhead saved: "
+          f"{rows['login (sync)']['mean'] - rows['login (queued)']['mean']:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Multi-worker SQLite read/write concurrency benchmark.
+
+Forks reader processes (primary-key user lookups, as /api/me does) and writer
+processes (last_login commits, as successful logins do) against one database
+file, and compares SQLite's defaults (rollback journal, synchronous=FULL) with
+the tuned profile from config (WAL, synchronous=NORMAL, busy timeout, mmap).
+
+    python -m benchmarks.bench_sqlite_concurrency [--seconds 5] [--readers 4] [--writers 2]
+"""
+import argparse
+import multiprocessing
+import os
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db
+from app.models import User
+from benchmarks.common import BenchConfig, make_app, seed_user, summarize, print_table
+
+DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': None,
+    'SQLITE_SYNCHRONOUS': None,
+    'SQLITE_BUSY_TIMEOUT': None,
+    'SQLITE_MMAP_SIZE': None,
+    'SQLITE_CACHE_SIZE': None,
+}
+USERS = 50
+
+
+def worker(role, uri, profile, seconds, results):
+    """Run reads or writes until the deadline and report latencies and errors"""
+    config_class = type('WorkerConfig', (BenchConfig,), dict(
+        profile, SQLALCHEMY_DATABASE_URI=uri, HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=4
+    ))
+    app = create_app(config_class)
+    samples, errors = [], 0
+    deadline = time.monotonic() + seconds
+    with app.app_context():
+        i = 0
+        while time.monotonic() < deadline:
+            user_id = i % USERS + 1
+            i += 1
+            start = time.perf_counter()
+            try:
+                if role == 'read':
+                    db.session.get(User, user_id).to_dict()
+                    db.session.rollback()
+                else:
+                    db.session.get(User, user_id).update_last_login()
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+                continue
+            finally:
+                db.session.expunge_all()
+            samples.append((time.perf_counter() - start) * 1000)
+    results.put((role, samples, errors))
+
+
+def run(profile, seconds, readers, writers):
+    app = make_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=4, **profile)
+    for n in range(USERS):
+        seed_user(app, f'bench{n}', 'BenchPass123!')
+    with app.app_context():
+        db.engine.dispose()  # Don't share parent connections with forked workers
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=('read', uri, profile, seconds, results))
+             for _ in range(readers)]
+    procs += [ctx.Process(target=worker, args=('write', uri, profile, seconds, results))
+              for _ in range(writers)]
+    for proc in procs:
+        proc.start()
+    collected = {'read': ([], 0), 'write': ([], 0)}
+    for _ in procs:
+        role, samples, errors = results.get()
+        prev_samples, prev_errors = collected[role]
+        collected[role] = (prev_samples + samples, prev_errors + errors)
+    for proc in procs:
+        proc.join()
+    os.unlink(app.bench_db_path)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(app.bench_db_path + suffix):
+            os.unlink(app.bench_db_path + suffix)
+    return collected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    args = parser.parse_args()
+
+    rows = {}
+    throughput = []
+    for label, profile in (('defaults', DEFAULTS), ('tuned', {})):
+        collected = run(profile, args.seconds, args.readers, args.writers)
+        for role, (samples, errors) in collected.items():
+            rows[f'{label} {role}'] = summarize(samples)
+            throughput.append((f'{label} {role}', len(samples) / args.seconds, errors))
+
+    print_table(f'Latency (ms), {args.readers} readers / {args.writers} writers', rows)
+    print(f"\n{'':<28}{'ops/s':>10}{'locked':>10}")
+    for label, ops, errors in throughput:
+        print(f"{label:<28}{ops:>10.0f}{errors:>10}")
+
+
+if __name__ == '__main__':
+    main()
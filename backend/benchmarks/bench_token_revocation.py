@@ -0,0 +1,92 @@
+"""
+Per-request cost of checking tokens against the revocation denylist.
+
+Seeds --revoked revoked tokens, then times verify_jwt_in_request() (with the
+decode cache on, as in production) for a token that is not revoked, with no
+blocklist check, with a naive revoked_token lookup on every request, and with
+the Bloom filter in front of the table. Also reports the filter's size and the
+false positive rate measured over --probes random jtis.
+
+    python -m benchmarks.bench_token_revocation [--requests 5000] [--revoked 50000] [--rounds 3]
+"""
+import argparse
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from flask_jwt_extended import create_access_token, verify_jwt_in_request
+from sqlalchemy import insert
+
+from app import db, jwt, token_revocations
+from app.models import RevokedToken
+from benchmarks.common import make_app, seed_user
+
+
+def naive_lookup(jwt_header, jwt_payload):
+    """What a denylist without the filter costs: one query per request"""
+    return token_revocations._stored(jwt_payload['jti'])
+
+
+def per_call_us(app, cookie, callback, requests):
+    jwt._token_in_blocklist_callback = callback
+    with app.test_request_context('/api/me', headers={'Cookie': cookie}):
+        verify_jwt_in_request()  # warm up
+        start = time.perf_counter()
+        for _ in range(requests):
+            verify_jwt_in_request()
+        return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--revoked', type=int, default=50000)
+    parser.add_argument('--probes', type=int, default=100000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    app = make_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=4, REVOCATION_SYNC_INTERVAL=0)
+    user_id = seed_user(app, 'bench', 'BenchPass123!')
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=8)
+    with app.app_context():
+        db.session.execute(insert(RevokedToken.__table__), [{
+            'jti': str(uuid.uuid4()), 'token_type': 'access', 'user_id': user_id,
+            'expires_at': expires_at, 'revoked_at': datetime.now(timezone.utc),
+        } for _ in range(args.revoked)])
+        db.session.commit()
+        token = create_access_token(identity=str(user_id))
+
+        start = time.perf_counter()
+        token_revocations.rebuild()
+        rebuild_ms = (time.perf_counter() - start) * 1000
+        false_positives = sum(str(uuid.uuid4()) in token_revocations.bloom for _ in range(args.probes))
+
+    cookie = f'access_token_cookie={token}'
+    filtered = jwt._token_in_blocklist_callback
+    callbacks = {
+        'no blocklist': lambda jwt_header, jwt_payload: False,
+        'DB lookup per request': naive_lookup,
+        'Bloom filter': filtered,
+    }
+    # Interleaved rounds, best of each, so drift on a busy machine hits every variant alike
+    results = dict.fromkeys(callbacks, float('inf'))
+    for _ in range(args.rounds):
+        for label, callback in callbacks.items():
+            results[label] = min(results[label], per_call_us(app, cookie, callback, args.requests))
+    jwt._token_in_blocklist_callback = filtered
+
+    bloom = token_revocations.bloom
+    print(f"\n{args.revoked} revoked tokens: filter rebuilt in {rebuild_ms:.0f} ms, "
+          f"{bloom.memory_bytes / 1024:.0f} KiB, {bloom.hashes} hashes")
+    print(f"false positives: {false_positives} of {args.probes} probes "
+          f"({false_positives / args.probes:.4%}, target {bloom.error_rate:.2%})")
+    print(f"\nverify_jwt_in_request() per call, best of {args.rounds} x {args.requests} calls")
+    for label, us in results.items():
+        overhead = us - results['no blocklist']
+        print(f"{label:<28}{us:>10.2f} us  ({overhead:+.2f} us)")
+    os.unlink(app.bench_db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Shared helpers for MRC backend benchmarks.
+Run benchmarks from the backend directory, e.g. `python -m benchmarks.bench_login_mixed`.
+"""
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from app import create_app, db
+from app.models import User
+from config import Config
+
+
+# Security events would otherwise be printed for every benchmarked login
+logging.getLogger('mrc_security').setLevel(logging.ERROR)
+
+
+class BenchConfig(Config):
+    """Benchmark configuration: file-backed SQLite, no rate limiting"""
+    TESTING = True
+    SECRET_KEY = 'bench-secret-key'
+    JWT_SECRET_KEY = 'bench-jwt-secret-key-at-least-32-bytes'
+    RATELIMIT_ENABLED = False
+    MAIL_SUPPRESS_SEND = True
+
+
+def make_app(**overrides):
+    """Create an app on a fresh temporary SQLite database"""
+    db_fd, db_path = tempfile.mkstemp(suffix='.db', prefix='mrc-bench-')
+    os.close(db_fd)
+    overrides.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:///' + db_path)
+    config_class = type('BenchRunConfig', (BenchConfig,), overrides)
+    app = create_app(config_class)
+    with app.app_context():
+        db.create_all()
+    app.bench_db_path = db_path
+    return app
+
+
+def seed_user(app, username, password, **fields):
+    """Create a user and return its id"""
+    with app.app_context():
+        user = User(
+            username=username,
+            email=fields.pop('email', f'{username}@bench.mrc'),
+            full_name=fields.pop('full_name', username.title()),
+            **fields
+        )
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def timed(fn, *args, **kwargs):
+    """Call fn and return (result, elapsed milliseconds)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    if not samples:
+        return {'n': 0}
+    ordered = sorted(samples)
+    return {
+        'n': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'p50': ordered[len(ordered) // 2],
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'p99': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+    }
+
+
+def print_table(title, rows):
+    """Print {label: summary} rows as an aligned table"""
+    print(f"\n{title}")
+    print(f"{'':<28}{'n':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for label, stats in rows.items():
+        if not stats.get('n'):
+            print(f"{label:<28}{0:>8}")
+            continue
+        print(f"{label:<28}{stats['n']:>8}{stats['mean']:>10.2f}{stats['p50']:>10.2f}"
+              f"{stats['p95']:>10.2f}{stats['p99']:>10.2f}")
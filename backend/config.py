@@ -11,8 +11,34 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'mrc_auth.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Connection pool for server databases (PostgreSQL); per worker process, so keep
+    # workers * (DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW) under max_connections
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE') or 5)
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW') or 10)
+    DATABASE_POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT') or 30)  # seconds
+    DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE') or 1800)  # seconds
+    DATABASE_POOL_PRE_PING = True
+    DATABASE_STATEMENT_TIMEOUT = int(os.environ.get('DATABASE_STATEMENT_TIMEOUT') or 5000)  # milliseconds
+    
+    # SQLite connection pragmas, applied on every new connection (None keeps SQLite's default)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'  # safe with WAL
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)  # milliseconds
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # bytes
+    SQLITE_CACHE_SIZE = -64000  # negative = KiB, ~64 MB page cache per connection
+    
     # JWT Configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production-mrc'
+    # HS256 signs with JWT_SECRET_KEY. EdDSA (Ed25519) or RS256 sign with the key ring in
+    # JWT_KEY_DIR and publish the public keys at /api/auth/.well-known/jwks.json; switching
+    # signs everyone out (see DEPLOYMENT-GUIDE.md). A relative JWT_KEY_DIR is taken from
+    # the instance folder, which is also the default (instance/jwt-keys)
+    JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM') or 'HS256'
+    JWT_KEY_DIR = os.environ.get('JWT_KEY_DIR')
+    JWT_KEY_ROTATION_DAYS = int(os.environ.get('JWT_KEY_ROTATION_DAYS') or 30)
+    JWT_KEY_PUBLISH_AHEAD = 86400  # seconds a new key is in the JWKS before it signs
+    JWT_KEY_RELOAD_INTERVAL = 30  # seconds between checks for keys added by other processes
+    JWT_JWKS_MAX_AGE = 3600  # Cache-Control max-age of the JWKS response
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=8)  # 8-hour access tokens
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)  # 30-day refresh tokens
     JWT_COOKIE_SECURE = os.environ.get('JWT_COOKIE_SECURE', 'False').lower() in ['true', 'on', '1']
@@ -21,6 +47,113 @@ class Config:
     JWT_COOKIE_SAMESITE = 'Lax'
     JWT_ACCESS_COOKIE_NAME = 'access_token_cookie'
     JWT_REFRESH_COOKIE_NAME = 'refresh_token_cookie'
+    # Claims of tokens that already verified are reused until their exp (per worker; 0 disables)
+    JWT_DECODE_CACHE_SIZE = int(os.environ.get('JWT_DECODE_CACHE_SIZE') or 1024)
+    # Revoked tokens (logout) are stored by jti behind a per-worker Bloom filter that
+    # pulls other workers' revocations every REVOCATION_SYNC_INTERVAL seconds (0 = never)
+    REVOCATION_BLOOM_CAPACITY = int(os.environ.get('REVOCATION_BLOOM_CAPACITY') or 100000)
+    REVOCATION_BLOOM_ERROR_RATE = 0.001
+    REVOCATION_SYNC_INTERVAL = int(os.environ.get('REVOCATION_SYNC_INTERVAL') or 2)  # seconds
+    REVOCATION_PURGE_INTERVAL = 3600  # seconds between deletions of expired entries
+    
+    # Password hashing executor (process pool size 0 hashes inline in the request thread)
+    HASHING_POOL_SIZE = int(os.environ.get('HASHING_POOL_SIZE') or os.cpu_count() or 1)
+    HASHING_QUEUE_DEPTH = int(os.environ.get('HASHING_QUEUE_DEPTH') or 64)
+    HASHING_TIMEOUT = int(os.environ.get('HASHING_TIMEOUT') or 10)  # seconds
+    
+    # bcrypt cost: fixed via BCRYPT_ROUNDS, or calibrated to BCRYPT_TARGET_MS by the first worker
+    # on the host and kept in BCRYPT_ROUNDS_FILE (default instance/bcrypt-rounds; delete it to
+    # recalibrate). A calibrated cost never lowers existing hashes; an explicit one does
+    BCRYPT_ROUNDS = int(os.environ['BCRYPT_ROUNDS']) if os.environ.get('BCRYPT_ROUNDS') else None
+    BCRYPT_TARGET_MS = int(os.environ.get('BCRYPT_TARGET_MS') or 100)
+    BCRYPT_ROUNDS_FILE = os.environ.get('BCRYPT_ROUNDS_FILE')
+    BCRYPT_MIN_ROUNDS = 10
+    BCRYPT_MAX_ROUNDS = 16
+    
+    # Login admission control: in-flight password checks, with a share reserved for
+    # accounts seen recently or presenting a known device cookie
+    LOGIN_ADMISSION_MAX_INFLIGHT = int(os.environ.get('LOGIN_ADMISSION_MAX_INFLIGHT') or (os.cpu_count() or 1) * 4)
+    LOGIN_ADMISSION_PRIORITY_RESERVE = float(os.environ.get('LOGIN_ADMISSION_PRIORITY_RESERVE') or 0.25)
+    LOGIN_ADMISSION_PRIORITY_WAIT = 0.5  # seconds a priority login may queue for a slot
+    LOGIN_ADMISSION_RETRY_AFTER = 2  # seconds
+    LOGIN_PRIORITY_RECENT_DAYS = 30
+    LOGIN_DEVICE_COOKIE_NAME = 'mrc_device'
+    LOGIN_DEVICE_COOKIE_MAX_AGE = 180 * 24 * 3600  # 180 days
+    
+    # Per-identifier login limit: wrong passwords per existing account's username/email within
+    # the window, counted in a fixed-size decaying count-min sketch (per worker; 0 disables)
+    LOGIN_IDENTIFIER_MAX_FAILURES = int(os.environ.get('LOGIN_IDENTIFIER_MAX_FAILURES') or 10)
+    LOGIN_IDENTIFIER_WINDOW = 900  # seconds
+    LOGIN_IDENTIFIER_BUCKETS = 15  # window granularity: 1 minute buckets
+    # Failures per window the sketch is sized for; past it the limit rises by the collision bound
+    LOGIN_IDENTIFIER_EXPECTED_FAILURES = int(os.environ.get('LOGIN_IDENTIFIER_EXPECTED_FAILURES') or 10000)
+    LOGIN_IDENTIFIER_SKETCH_WIDTH = None  # derived from the two above: 5437 by default
+    LOGIN_IDENTIFIER_SKETCH_DEPTH = 4  # 15 * 4 * 5437 * 4 bytes = 1.3 MB
+    
+    # Write-behind last_login: buffer timestamps in memory and bulk-UPDATE them periodically
+    LAST_LOGIN_WRITE_BEHIND = os.environ.get('LAST_LOGIN_WRITE_BEHIND', 'False').lower() in ['true', 'on', '1']
+    LAST_LOGIN_FLUSH_INTERVAL = int(os.environ.get('LAST_LOGIN_FLUSH_INTERVAL') or 5)  # seconds
+    LAST_LOGIN_FLUSH_SIZE = int(os.environ.get('LAST_LOGIN_FLUSH_SIZE') or 100)
+    
+    # Profile cache for /api/me: 'memory' (per worker), 'shared' (`flask cache-server`) or 'none'
+    PROFILE_CACHE_BACKEND = os.environ.get('PROFILE_CACHE_BACKEND') or 'memory'
+    PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE') or 1024)
+    PROFILE_CACHE_TTL = int(os.environ.get('PROFILE_CACHE_TTL') or 300)  # seconds
+    # Cache server address: unix:/path/to/socket (or host:port); clients and server
+    # authenticate each other with CACHE_SERVER_AUTHKEY, required to use it
+    PROFILE_CACHE_SERVER = os.environ.get('PROFILE_CACHE_SERVER') or 'unix:' + os.path.join(basedir, 'cache-server.sock')
+    CACHE_SERVER_AUTHKEY = os.environ.get('CACHE_SERVER_AUTHKEY')
+    # Access tokens carry a versioned profile snapshot /api/me answers from; a worker
+    # re-reads a user's profile_version after PROFILE_VERSION_TTL seconds
+    PROFILE_SNAPSHOT_ENABLED = os.environ.get('PROFILE_SNAPSHOT_ENABLED', 'True').lower() in ['true', 'on', '1']
+    PROFILE_VERSION_TTL = int(os.environ.get('PROFILE_VERSION_TTL') or 30)  # seconds
+    PROFILE_VERSION_MAP_SIZE = 10000
+
+    # JSON encoder for responses: 'auto' (orjson if installed), 'orjson' or 'stdlib'
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER') or 'auto'
+    
+    # Rate limit storage shared by all workers: memory:// (per worker only),
+    # sqlite:////path/limits.db (one host), mrc-shared:///path/cache-server.sock (`flask cache-server`,
+    # authenticated with CACHE_SERVER_AUTHKEY) or redis://host:6379 (requires the redis package)
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI') or 'memory://'
+    RATELIMIT_STRATEGY = os.environ.get('RATELIMIT_STRATEGY') or 'fixed-window'  # or 'moving-window'
+    
+    # Security audit log: mrc_security records are queued and written by a listener thread
+    # to stdout and/or SECURITY_LOG_FILE; records beyond the queue size are dropped and counted
+    SECURITY_LOG_STDOUT = os.environ.get('SECURITY_LOG_STDOUT', 'True').lower() in ['true', 'on', '1']
+    SECURITY_LOG_FILE = os.environ.get('SECURITY_LOG_FILE')
+    SECURITY_LOG_FORMAT = os.environ.get('SECURITY_LOG_FORMAT') or 'text'  # or 'json'
+    SECURITY_LOG_QUEUE_SIZE = int(os.environ.get('SECURITY_LOG_QUEUE_SIZE') or 10000)
+    
+    # Audit trail: security events are buffered and bulk-inserted into audit_event by a
+    # background thread; events beyond AUDIT_BUFFER_MAX (database down) are dropped and counted
+    AUDIT_EVENTS_ENABLED = os.environ.get('AUDIT_EVENTS_ENABLED', 'True').lower() in ['true', 'on', '1']
+    AUDIT_FLUSH_INTERVAL = int(os.environ.get('AUDIT_FLUSH_INTERVAL') or 2)  # seconds
+    AUDIT_FLUSH_SIZE = int(os.environ.get('AUDIT_FLUSH_SIZE') or 500)
+    AUDIT_BUFFER_MAX = 50000
+    # `flask audit-archive` moves whole days older than this to compressed segment files
+    AUDIT_HOT_RETENTION_DAYS = int(os.environ.get('AUDIT_HOT_RETENTION_DAYS') or 30)
+    AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR') or os.path.join(basedir, 'audit-archive')
+    AUDIT_ARCHIVE_DELETE_BATCH = 1000  # rows deleted per transaction once archived
+    
+    # Ids of the users allowed to query the audit trail (GET /api/admin/audit-events).
+    # Ids, not usernames: users can rename themselves. Empty closes the admin endpoints.
+    ADMIN_USER_IDS = [int(value) for value in (os.environ.get('ADMIN_USER_IDS') or '').split(',') if value.strip()]
+    
+    # Email outbox: requests queue mail, `flask outbox-worker` delivers it with retries.
+    # OUTBOX_IN_PROCESS_WORKER runs the worker as a thread in each web process instead.
+    OUTBOX_IN_PROCESS_WORKER = os.environ.get('OUTBOX_IN_PROCESS_WORKER', 'False').lower() in ['true', 'on', '1']
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS') or 8)  # then dead-lettered
+    OUTBOX_BACKOFF_BASE = 30  # seconds, doubled per failed attempt
+    OUTBOX_BACKOFF_MAX = 3600  # seconds
+    OUTBOX_LEASE_SECONDS = 300  # a claimed message is retried if not finished by then
+    OUTBOX_BATCH_SIZE = 20
+    OUTBOX_POLL_INTERVAL = int(os.environ.get('OUTBOX_POLL_INTERVAL') or 2)  # seconds
+    OUTBOX_SENT_RETENTION = 7 * 24 * 3600  # seconds delivered messages are kept
+    
+    # Number of reverse proxies in front of the app that append to X-Forwarded-For;
+    # 0 ignores the header (direct exposure), 1 for a single nginx/load balancer
+    PROXY_TRUSTED_HOPS = int(os.environ.get('PROXY_TRUSTED_HOPS') or 0)
     
     # CORS Configuration  
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000,http://localhost:3001,http://localhost:3002').split(',')
@@ -32,3 +165,6 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'noreply@mouldrestoration.com.au'
+    # The outbox worker keeps its SMTP connection open between batches for this long (seconds);
+    # MAIL_MAX_EMAILS, if set, makes Flask-Mail reconnect after that many messages
+    MAIL_CONNECTION_IDLE_TIMEOUT = int(os.environ.get('MAIL_CONNECTION_IDLE_TIMEOUT') or 30)
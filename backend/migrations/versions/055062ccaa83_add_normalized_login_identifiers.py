@@ -0,0 +1,118 @@
+"""Add normalized username/email lookup columns
+
+Revision ID: 055062ccaa83
+Revises: a0eb66137248
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '055062ccaa83'
+down_revision = 'a0eb66137248'
+branch_labels = None
+depends_on = None
+
+
+def _unreflected_unique_constraints():
+    """UNIQUE(username)/UNIQUE(email) that batch mode would lose on a table recreate
+
+    SQLite does not reflect the inline column-level UNIQUE from the initial schema,
+    so restate those for the recreate (unused on backends that ALTER in place)
+    """
+    reflected = {
+        tuple(uc['column_names'])
+        for uc in sa.inspect(op.get_bind()).get_unique_constraints('user')
+    }
+    return tuple(
+        sa.UniqueConstraint(column)
+        for column in ('username', 'email')
+        if (column,) not in reflected
+    )
+
+
+def _normalized_collisions(rows):
+    """Descriptions of usernames/emails that only differ by case or surrounding spaces"""
+    collisions = []
+    for column in ('username', 'email'):
+        ids_by_value = {}
+        for row in rows:
+            ids_by_value.setdefault(getattr(row, column).strip().lower(), []).append(row.id)
+        collisions.extend(
+            f"{column} {value!r}: user ids {', '.join(map(str, ids))}"
+            for value, ids in sorted(ids_by_value.items()) if len(ids) > 1
+        )
+    return collisions
+
+
+def _email_shaped_usernames(rows):
+    """Descriptions of usernames containing '@', which login would look up as emails"""
+    return [
+        f"username {row.username!r}: user id {row.id} contains '@'"
+        for row in sorted(rows, key=lambda row: row.id) if '@' in row.username
+    ]
+
+
+def upgrade():
+    # Backfill in Python so the values match User's normalize_identifier exactly
+    # (SQL lower() is ASCII-only on SQLite)
+    user = sa.table(
+        'user',
+        sa.column('id', sa.Integer),
+        sa.column('username', sa.String),
+        sa.column('email', sa.String),
+        sa.column('username_normalized', sa.String),
+        sa.column('email_normalized', sa.String),
+    )
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(user.c.id, user.c.username, user.c.email)).fetchall()
+
+    # The old case-sensitive UNIQUE columns allowed 'Glen' next to 'glen'; the new
+    # unique indexes can't, so stop before touching the table rather than halfway.
+    # Login now reads any identifier with '@' as an email, so such usernames
+    # would be locked out; they have to be renamed first as well
+    problems = _normalized_collisions(rows) + _email_shaped_usernames(rows)
+    if problems:
+        raise RuntimeError(
+            "Cannot add case-insensitive login identifiers: these accounts clash once "
+            "lowercased or have a username login would take for an email. Rename or "
+            "merge them, then rerun the upgrade.\n  " + "\n  ".join(problems)
+        )
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('username_normalized', sa.String(length=80), nullable=True))
+        batch_op.add_column(sa.Column('email_normalized', sa.String(length=120), nullable=True))
+
+    if rows:
+        connection.execute(
+            user.update()
+            .where(user.c.id == sa.bindparam('user_id'))
+            .values(
+                username_normalized=sa.bindparam('username_norm'),
+                email_normalized=sa.bindparam('email_norm'),
+            ),
+            [
+                {
+                    'user_id': row.id,
+                    'username_norm': row.username.strip().lower(),
+                    'email_norm': row.email.strip().lower(),
+                }
+                for row in rows
+            ]
+        )
+
+    with op.batch_alter_table('user', schema=None, table_args=_unreflected_unique_constraints()) as batch_op:
+        batch_op.alter_column('username_normalized', existing_type=sa.String(length=80), nullable=False)
+        batch_op.alter_column('email_normalized', existing_type=sa.String(length=120), nullable=False)
+        batch_op.create_index(batch_op.f('ix_user_username_normalized'), ['username_normalized'], unique=True)
+        batch_op.create_index(batch_op.f('ix_user_email_normalized'), ['email_normalized'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_email_normalized'))
+        batch_op.drop_index(batch_op.f('ix_user_username_normalized'))
+        batch_op.drop_column('email_normalized')
+        batch_op.drop_column('username_normalized')
@@ -0,0 +1,41 @@
+"""Add audit event table
+
+Revision ID: 4cb100ace516
+Revises: 8db6d584a296
+Create Date: 2026-10-17 15:12:40.207815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4cb100ace516'
+down_revision = '8db6d584a296'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('audit_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('event_type', sa.String(length=64), nullable=False),
+    sa.Column('ip_address', sa.String(length=45), nullable=True),
+    sa.Column('details', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('audit_event', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_event_created_at', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_audit_event_event_type_created_at', ['event_type', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_audit_event_user_id_created_at', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('audit_event', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_event_user_id_created_at')
+        batch_op.drop_index('ix_audit_event_event_type_created_at')
+        batch_op.drop_index('ix_audit_event_created_at')
+
+    op.drop_table('audit_event')
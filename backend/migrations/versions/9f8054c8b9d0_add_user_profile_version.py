@@ -0,0 +1,26 @@
+"""Add user profile version
+
+Revision ID: 9f8054c8b9d0
+Revises: 2c6daf1e6a48
+Create Date: 2026-10-17 16:40:51.238898
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f8054c8b9d0'
+down_revision = '2c6daf1e6a48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('profile_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('profile_version')
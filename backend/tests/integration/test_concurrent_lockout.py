@@ -0,0 +1,85 @@
+"""
+Integration tests for concurrent failed-login accounting.
+Fires parallel failures from separate sessions against a file-backed SQLite
+database and checks no increment is lost.
+"""
+import os
+import tempfile
+import threading
+import pytest
+from datetime import datetime, timezone
+
+from app import create_app, db
+from app.models import User, as_utc, lockout_minutes
+from tests.conftest import TestConfig
+
+
+@pytest.fixture
+def file_db_app():
+    """Separate app on a temporary SQLite file so each thread gets its own connection."""
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+
+    class FileDBConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+
+    app = create_app(FileDBConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(username='concurrent', email='concurrent@example.com', full_name='Concurrent User')
+        user.set_password('ConcurrentPass123!')
+        db.session.add(user)
+        db.session.commit()
+        app.test_user_id = user.id
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    os.unlink(db_path)
+
+
+class TestConcurrentFailedLogins:
+    """Parallel failures must be counted exactly."""
+
+    def test_parallel_failures_counted_exactly(self, file_db_app):
+        """Test N concurrent failed logins leave exactly N attempts recorded."""
+        workers = 12  # Below the default pool limit; each thread holds a connection at the barrier
+        barrier = threading.Barrier(workers, timeout=30)
+        errors = []
+
+        def fail_once():
+            try:
+                with file_db_app.app_context():
+                    user = db.session.get(User, file_db_app.test_user_id)
+                    barrier.wait()
+                    user.handle_failed_login('10.0.0.1')
+                    db.session.remove()
+            except Exception as exc:  # Surface thread failures in the main thread
+                errors.append(exc)
+
+        threads = [threading.Thread(target=fail_once) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        with file_db_app.app_context():
+            user = db.session.get(User, file_db_app.test_user_id)
+            assert user.failed_login_attempts == workers
+            assert user.is_account_locked() is True
+            remaining = as_utc(user.locked_until) - datetime.now(timezone.utc)
+            assert remaining.total_seconds() <= lockout_minutes(workers) * 60
+
+    def test_returned_values_reflected_on_instance(self, file_db_app):
+        """Test the instance sees the database result without a reload."""
+        with file_db_app.app_context():
+            user = db.session.get(User, file_db_app.test_user_id)
+            for expected in (1, 2, 3):
+                user.handle_failed_login()
+                assert user.failed_login_attempts == expected
+            assert user.is_account_locked() is True
+            assert lockout_minutes(3) == 5
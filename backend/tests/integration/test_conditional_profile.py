@@ -0,0 +1,91 @@
+"""
+Integration tests for conditional GET on the profile endpoints.
+Tests ETag and Cache-Control headers, 304 responses to If-None-Match and that
+the tag follows the profile whichever source it is served from.
+"""
+import pytest
+
+from app import db, profile_versions
+from app.models import User
+
+PROFILE_PATHS = ('/api/me', '/api/auth/profile')
+
+
+@pytest.fixture
+def etag_client(client, app_context):
+    """Logged-in client for a fresh user"""
+    user = User(username='etaguser', email='etag@example.com', full_name='Etag User')
+    user.set_password('EtagPass123!')
+    db.session.add(user)
+    db.session.commit()
+    response = client.post('/api/auth/login', json={'username': 'etaguser', 'password': 'EtagPass123!'})
+    assert response.status_code == 200
+    client.user_id = user.id
+    yield client
+    user = db.session.get(User, client.user_id)
+    if user is not None:
+        db.session.delete(user)
+        db.session.commit()
+
+
+class TestConditionalProfile:
+    """ETag revalidation of /api/me and GET /api/auth/profile."""
+
+    @pytest.mark.parametrize('path', PROFILE_PATHS)
+    def test_headers(self, etag_client, path):
+        """Test responses carry a strong ETag and are private, revalidated on use."""
+        response = etag_client.get(path)
+        assert response.status_code == 200
+        etag, weak = response.get_etag()
+        assert etag and not weak
+        assert response.cache_control.private
+        assert response.cache_control.no_cache
+
+    @pytest.mark.parametrize('path', PROFILE_PATHS)
+    def test_not_modified(self, etag_client, app, monkeypatch, path):
+        """Test a matching If-None-Match gets an empty 304 without encoding the payload."""
+        etag = etag_client.get(path).headers['ETag']
+
+        def no_encoding(*args, **kwargs):
+            raise AssertionError('payload encoded for a 304')
+
+        monkeypatch.setattr(app.json, 'response', no_encoding)
+        response = etag_client.get(path, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers['ETag'] == etag
+        assert response.cache_control.private
+
+    def test_other_etag_gets_body(self, etag_client):
+        """Test a tag that doesn't match gets the full profile."""
+        response = etag_client.get('/api/me', headers={'If-None-Match': '"1-stale"'})
+        assert response.status_code == 200
+        assert response.get_json()['user']['username'] == 'etaguser'
+
+    def test_same_tag_from_every_source(self, etag_client, monkeypatch):
+        """Test the token snapshot, profile cache and database give one tag for one profile."""
+        from_snapshot = etag_client.get('/api/me').headers['ETag']
+        monkeypatch.setattr(profile_versions, 'enabled', False)
+        from_database = etag_client.get('/api/me').headers['ETag']
+        from_cache = etag_client.get('/api/me').headers['ETag']
+        assert from_snapshot == from_database == from_cache == etag_client.get('/api/auth/profile').headers['ETag']
+
+    def test_profile_update_changes_tag(self, etag_client):
+        """Test a client holding the old tag gets the updated profile."""
+        etag = etag_client.get('/api/me').headers['ETag']
+        assert etag_client.put('/api/auth/profile', json={'full_name': 'Renamed Etag'}).status_code == 200
+
+        for path in PROFILE_PATHS:
+            response = etag_client.get(path, headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.get_json()['user']['full_name'] == 'Renamed Etag'
+            assert response.headers['ETag'] != etag
+
+    def test_new_login_changes_tag(self, etag_client, client):
+        """Test last_login, which doesn't bump profile_version, still changes the tag."""
+        etag = etag_client.get('/api/auth/profile').headers['ETag']
+        user = db.session.get(User, etag_client.user_id)
+        user.update_last_login()
+        response = etag_client.get('/api/auth/profile', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
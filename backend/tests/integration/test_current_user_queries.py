@@ -0,0 +1,79 @@
+"""
+Integration tests for the request-scoped current user.
+Counts user-row SELECTs issued by each authenticated endpoint.
+"""
+import pytest
+
+from app import db, profile_versions
+from app.models import User
+
+
+@pytest.fixture
+def logged_in(client, app_context, monkeypatch):
+    """Client holding access and refresh cookies for a fresh user."""
+    # /api/me would answer from the token's profile snapshot (see test_profile_snapshot.py)
+    monkeypatch.setattr(profile_versions, 'enabled', False)
+    user = User(username='queryuser', email='queryuser@example.com', full_name='Query User')
+    user.set_password('QueryPass123!')
+    db.session.add(user)
+    db.session.commit()
+    response = client.post('/api/auth/login', json={
+        'username': 'queryuser', 'password': 'QueryPass123!', 'remember_me': True
+    })
+    assert response.status_code == 200
+    yield client
+    db.session.delete(db.session.merge(user))
+    db.session.commit()
+
+
+def user_selects(stats):
+    """SELECTs that load a user row by primary key"""
+    return [sql for sql in stats['sql'] if sql.startswith('SELECT') and 'WHERE user.id =' in sql]
+
+
+class TestCurrentUserQueries:
+    """Authenticated endpoints load the current user exactly once."""
+
+    @pytest.mark.parametrize('method, path, body', [
+        ('get', '/api/me', None),
+        ('get', '/api/auth/profile', None),
+        ('put', '/api/auth/profile', {'full_name': 'Query User Renamed'}),
+        ('post', '/api/auth/refresh', None),
+        ('post', '/api/auth/add-technician', {'username': 'x'}),
+        ('post', '/api/auth/logout', None),
+    ])
+    def test_single_user_select(self, logged_in, sql_counter, method, path, body):
+        """Test each endpoint issues exactly one user SELECT."""
+        # Start from an empty identity map, as a new request in production would
+        db.session.expunge_all()
+        with sql_counter() as stats:
+            response = getattr(logged_in, method)(path, json=body)
+
+        assert response.status_code in (200, 400)
+        assert len(user_selects(stats)) == 1
+
+    def test_unused_user_not_loaded(self, logged_in, sql_counter):
+        """Test admin-only endpoints refuse other users by token identity, without a user SELECT."""
+        db.session.expunge_all()
+        with sql_counter() as stats:
+            response = logged_in.get('/api/metrics')
+
+        assert response.status_code == 403
+        assert user_selects(stats) == []
+
+    def test_deleted_user_not_found(self, logged_in):
+        """Test a valid token for a deleted user still gets the route's 404."""
+        user = User.find_by_username('queryuser')
+        db.session.delete(user)
+        db.session.commit()
+
+        response = logged_in.get('/api/auth/profile')
+
+        assert response.status_code == 404
+        assert response.get_json()['error'] == 'User not found'
+        # Recreate for fixture teardown
+        db.session.add(User(
+            id=user.id, username='queryuser', email='queryuser@example.com',
+            full_name='Query User', password_hash=user.password_hash
+        ))
+        db.session.commit()
@@ -0,0 +1,91 @@
+"""
+Integration tests for login transaction boundaries.
+Asserts the SQL round trips and commits issued per login outcome.
+"""
+import pytest
+from datetime import datetime, timezone, timedelta
+
+from app import db
+from app.models import User
+
+
+@pytest.fixture
+def uow_user(app_context):
+    """User with a password hashed at the configured cost."""
+    user = User(username='uowuser', email='uow@example.com', full_name='Unit Of Work')
+    user.set_password('UowPass123!')
+    db.session.add(user)
+    db.session.commit()
+    yield user
+    db.session.delete(user)
+    db.session.commit()
+
+
+class TestLoginRoundTrips:
+    """Each login outcome issues at most one write transaction."""
+
+    def test_successful_login_single_commit(self, client, uow_user, sql_counter):
+        """Test success is one SELECT, one UPDATE and one commit."""
+        with sql_counter() as stats:
+            response = client.post('/api/auth/login', json={
+                'username': 'uowuser', 'password': 'UowPass123!'
+            })
+
+        assert response.status_code == 200
+        assert response.get_json()['user']['username'] == 'uowuser'
+        assert stats['statements'] == ['SELECT', 'UPDATE']
+        assert stats['commits'] == 1
+
+    def test_successful_login_after_failures_single_commit(self, client, uow_user, sql_counter):
+        """Test resetting lockout counters is folded into the same commit."""
+        uow_user.failed_login_attempts = 2
+        uow_user.last_failed_login = datetime.now(timezone.utc)
+        db.session.commit()
+
+        with sql_counter() as stats:
+            response = client.post('/api/auth/login', json={
+                'username': 'uowuser', 'password': 'UowPass123!'
+            })
+
+        assert response.status_code == 200
+        assert stats['statements'] == ['SELECT', 'UPDATE']
+        assert stats['commits'] == 1
+        db.session.refresh(uow_user)
+        assert uow_user.failed_login_attempts == 0
+
+    def test_failed_login_single_commit(self, client, uow_user, sql_counter):
+        """Test a wrong password is one SELECT, one UPDATE and one commit."""
+        with sql_counter() as stats:
+            response = client.post('/api/auth/login', json={
+                'username': 'uowuser', 'password': 'WrongPass123!'
+            })
+
+        assert response.status_code == 401
+        assert stats['statements'] == ['SELECT', 'UPDATE']
+        assert stats['commits'] == 1
+
+    def test_locked_login_no_write(self, client, uow_user, sql_counter):
+        """Test a locked account is rejected with a read only."""
+        uow_user.failed_login_attempts = 3
+        uow_user.locked_until = datetime.now(timezone.utc) + timedelta(minutes=5)
+        db.session.commit()
+
+        with sql_counter() as stats:
+            response = client.post('/api/auth/login', json={
+                'username': 'uowuser', 'password': 'UowPass123!'
+            })
+
+        assert response.status_code == 401
+        assert stats['statements'] == ['SELECT']
+        assert stats['commits'] == 0
+
+    def test_unknown_user_no_write(self, client, sql_counter):
+        """Test an unknown identifier is rejected with a read only."""
+        with sql_counter() as stats:
+            response = client.post('/api/auth/login', json={
+                'username': 'nobody-here', 'password': 'Whatever123!'
+            })
+
+        assert response.status_code == 401
+        assert stats['statements'] == ['SELECT']
+        assert stats['commits'] == 0
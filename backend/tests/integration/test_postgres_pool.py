@@ -0,0 +1,65 @@
+"""
+Integration tests for the PostgreSQL connection pool.
+Run with TEST_DATABASE_URL pointing at a local PostgreSQL database; skipped on SQLite.
+"""
+import threading
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.database import pool_status
+
+
+@pytest.fixture
+def pg_engine(app_context):
+    """The application's engine, when it is PostgreSQL."""
+    if db.engine.dialect.name != 'postgresql':
+        pytest.skip('set TEST_DATABASE_URL to a PostgreSQL database')
+    return db.engine
+
+
+class TestPostgresPool:
+    """Pool sizing and session settings under concurrent checkouts."""
+
+    def test_statement_timeout_applied(self, pg_engine, app):
+        """Test every pooled connection carries the configured statement timeout."""
+        with pg_engine.connect() as connection:
+            timeout = connection.execute(text('SHOW statement_timeout')).scalar()
+
+        assert timeout == f"{app.config['DATABASE_STATEMENT_TIMEOUT'] // 1000}s"
+
+    def test_statement_timeout_cancels_slow_query(self, pg_engine):
+        """Test a runaway statement is cancelled instead of holding the connection."""
+        with pg_engine.connect() as connection:
+            connection.execute(text("SET statement_timeout = '100ms'"))
+            with pytest.raises(Exception, match='statement timeout'):
+                connection.execute(text('SELECT pg_sleep(1)'))
+
+    def test_concurrent_checkouts_use_overflow(self, pg_engine, app):
+        """Test concurrent workers beyond pool_size borrow overflow connections."""
+        workers = app.config['DATABASE_POOL_SIZE'] + 2
+        barrier = threading.Barrier(workers + 1, timeout=30)
+        release = threading.Event()
+        errors = []
+
+        def hold_connection():
+            try:
+                with pg_engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+                    barrier.wait()
+                    release.wait(30)
+            except Exception as exc:  # Surface thread failures in the main thread
+                errors.append(exc)
+
+        threads = [threading.Thread(target=hold_connection) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        status = pool_status(pg_engine)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert status['checked_out'] >= workers
+        assert status['overflow'] >= 2
@@ -0,0 +1,83 @@
+"""
+Integration tests for cached profile reads.
+"""
+import pytest
+
+from app import db, profile_cache, profile_versions
+from app.models import User
+
+
+@pytest.fixture
+def cached_client(client, app_context, monkeypatch):
+    """Logged-in client for a fresh user."""
+    # /api/me would answer from the token's profile snapshot (see test_profile_snapshot.py)
+    monkeypatch.setattr(profile_versions, 'enabled', False)
+    user = User(username='cacheuser', email='cacheuser@example.com', full_name='Cache User')
+    user.set_password('CachePass123!')
+    db.session.add(user)
+    db.session.commit()
+    response = client.post('/api/auth/login', json={
+        'username': 'cacheuser', 'password': 'CachePass123!'
+    })
+    assert response.status_code == 200
+    client.user_id = user.id
+    yield client
+    db.session.delete(db.session.merge(user))
+    db.session.commit()
+
+
+class TestProfileCacheReads:
+    """/api/me is served from the cache until the user changes."""
+
+    def test_repeat_reads_skip_database(self, cached_client, sql_counter):
+        """Test the second /api/me poll issues no SQL at all."""
+        first = cached_client.get('/api/me')
+        db.session.expunge_all()
+        with sql_counter() as stats:
+            second = cached_client.get('/api/me')
+
+        assert second.status_code == 200
+        assert second.get_json() == first.get_json()
+        assert stats['statements'] == []
+
+    def test_profile_update_invalidates(self, cached_client):
+        """Test PUT /profile is visible to the next read."""
+        cached_client.get('/api/me')
+        response = cached_client.put('/api/auth/profile', json={'full_name': 'Renamed User'})
+        assert response.status_code == 200
+
+        assert cached_client.get('/api/me').get_json()['user']['full_name'] == 'Renamed User'
+
+    def test_unlock_account_invalidates(self, cached_client):
+        """Test model methods that commit also drop the cached payload."""
+        cached_client.get('/api/me')
+        assert profile_cache.get(cached_client.user_id) is not None
+
+        db.session.get(User, cached_client.user_id).unlock_account()
+
+        assert profile_cache.get(cached_client.user_id) is None
+
+    def test_rollback_keeps_cache(self, cached_client):
+        """Test rolled-back changes don't invalidate."""
+        cached_client.get('/api/me')
+        user = db.session.get(User, cached_client.user_id)
+        user.full_name = 'Never Committed'
+        db.session.flush()
+        db.session.rollback()
+
+        assert profile_cache.get(cached_client.user_id)['full_name'] == 'Cache User'
+
+    def test_fill_racing_a_commit_not_cached(self, cached_client, monkeypatch):
+        """Test a payload loaded while another request commits a change isn't written back."""
+        read_generation = profile_cache.generation
+
+        def generation_then_commit_elsewhere(user_id):
+            generation = read_generation(user_id)
+            profile_cache.invalidate(user_id)  # another request's after_commit
+            return generation
+
+        monkeypatch.setattr(profile_cache, 'generation', generation_then_commit_elsewhere)
+        assert cached_client.get('/api/me').status_code == 200
+
+        assert profile_cache.get(cached_client.user_id) is None
+        assert profile_cache.metrics()['stale_sets'] == 1
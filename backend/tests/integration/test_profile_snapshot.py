@@ -0,0 +1,110 @@
+"""
+Integration tests for the profile snapshot in access tokens.
+Tests that /api/me answers from the token's claims while its profile_version
+is current and falls back to the database once it is not.
+"""
+import pytest
+import jwt as pyjwt
+from sqlalchemy import update
+
+from app import db, profile_versions
+from app.models import User
+
+
+@pytest.fixture
+def snapshot_client(client, app_context, monkeypatch):
+    """Logged-in client for a fresh user; .login_user is the login response's user."""
+    monkeypatch.setattr(profile_versions, 'counters', dict.fromkeys(profile_versions.counters, 0))
+    user = User(username='snapuser', email='snapuser@example.com', full_name='Snap User')
+    user.set_password('SnapPass123!')
+    db.session.add(user)
+    db.session.commit()
+    response = client.post('/api/auth/login', json={
+        'username': 'snapuser', 'password': 'SnapPass123!', 'remember_me': True
+    })
+    assert response.status_code == 200
+    client.user_id = user.id
+    client.login_user = response.get_json()['user']
+    yield client
+    user = db.session.get(User, client.user_id)
+    if user is not None:
+        db.session.delete(user)
+        db.session.commit()
+
+
+def claims_of(client):
+    return pyjwt.decode(client.get_cookie('access_token_cookie').value, options={'verify_signature': False})
+
+
+class TestProfileSnapshot:
+    """/api/me from claims while the snapshot is current."""
+
+    def test_token_carries_versioned_snapshot(self, snapshot_client):
+        """Test the access token holds the profile at version 1."""
+        snapshot = claims_of(snapshot_client)['prof']
+        assert snapshot[0] == 1
+        assert snapshot[1:4] == ['snapuser', 'snapuser@example.com', 'Snap User']
+
+    def test_me_answers_without_sql(self, snapshot_client, sql_counter):
+        """Test /api/me returns the same payload as before with no query at all."""
+        snapshot_client.get('/api/me')  # loads the revocation filter on first use
+        db.session.expunge_all()
+        with sql_counter() as stats:
+            response = snapshot_client.get('/api/me')
+        assert response.status_code == 200
+        assert response.get_json()['user'] == snapshot_client.login_user
+        assert stats['statements'] == []
+        assert profile_versions.metrics()['hits'] == 2
+
+    def test_profile_update_makes_snapshot_stale(self, snapshot_client):
+        """Test PUT /profile bumps profile_version and /api/me shows the change."""
+        response = snapshot_client.put('/api/auth/profile', json={'full_name': 'Renamed Snap'})
+        assert response.status_code == 200
+        assert db.session.get(User, snapshot_client.user_id).profile_version == 2
+
+        assert snapshot_client.get('/api/me').get_json()['user']['full_name'] == 'Renamed Snap'
+        assert profile_versions.metrics()['stale'] == 1
+
+    def test_refresh_issues_current_snapshot(self, snapshot_client):
+        """Test a refreshed access token answers from its snapshot again."""
+        snapshot_client.put('/api/auth/profile', json={'phone': '+61 400 999 999'})
+        assert snapshot_client.post('/api/auth/refresh').status_code == 200
+        assert claims_of(snapshot_client)['prof'][0] == 2
+
+        assert snapshot_client.get('/api/me').get_json()['user']['phone'] == '+61 400 999 999'
+        assert profile_versions.metrics()['hits'] == 1
+
+    def test_login_bookkeeping_keeps_version(self, snapshot_client):
+        """Test last login and failed attempt updates don't invalidate snapshots."""
+        user = db.session.get(User, snapshot_client.user_id)
+        user.handle_failed_login('203.0.113.5')
+        user.update_last_login()
+        user.unlock_account()
+        assert db.session.get(User, snapshot_client.user_id).profile_version == 1
+
+    def test_other_worker_change_seen_after_ttl(self, snapshot_client):
+        """Test a version bumped elsewhere is noticed once this worker's entry expires."""
+        db.session.execute(update(User).where(User.id == snapshot_client.user_id)
+                           .values(profile_version=5, full_name='Changed Elsewhere'))
+        db.session.commit()
+        assert snapshot_client.get('/api/me').get_json()['user']['full_name'] == 'Snap User'
+
+        profile_versions.versions.delete(snapshot_client.user_id)  # TTL expiry
+        assert snapshot_client.get('/api/me').get_json()['user']['full_name'] == 'Changed Elsewhere'
+        assert profile_versions.metrics()['lookups'] == 1
+
+    def test_deleted_user_not_served_from_snapshot(self, snapshot_client):
+        """Test a deleted user's token gets the route's 404, not the snapshot."""
+        db.session.delete(db.session.get(User, snapshot_client.user_id))
+        db.session.commit()
+        assert snapshot_client.get('/api/me').status_code == 404
+
+    def test_disabled(self, client, app_context, monkeypatch):
+        """Test PROFILE_SNAPSHOT_ENABLED = False issues tokens without the claim."""
+        monkeypatch.setattr(profile_versions, 'enabled', False)
+        response = client.post('/api/auth/login', json={
+            'username': 'michael', 'password': 'AdminMike123!'
+        })
+        assert response.status_code == 200
+        assert 'prof' not in claims_of(client)
+        assert client.get('/api/me').status_code == 200
@@ -0,0 +1,115 @@
+"""
+Unit tests for login admission control.
+Tests in-flight limits, the priority lane, known-device cookies and shedding.
+"""
+import pytest
+import time
+from datetime import datetime, timezone, timedelta
+from types import SimpleNamespace
+
+from itsdangerous import TimestampSigner
+
+from app import login_admission
+from app.admission import LoginAdmissionController, LoginShed
+
+
+def make_user(user_id=1, last_login=None):
+    """Stand-in user exposing what the controller reads"""
+    user = SimpleNamespace(id=user_id, last_login=last_login)
+    user.has_recent_login = lambda window: (
+        last_login is not None and datetime.now(timezone.utc) - last_login <= window
+    )
+    return user
+
+
+class TestLoginAdmissionController:
+    """Test LoginAdmissionController behaviour."""
+
+    def test_admits_within_limit(self, app, bare_app):
+        """Test logins are admitted and slots released afterwards."""
+        controller = LoginAdmissionController(bare_app(LOGIN_ADMISSION_MAX_INFLIGHT=2, LOGIN_ADMISSION_PRIORITY_WAIT=0))
+        with app.test_request_context():
+            with controller.admit(make_user()):
+                assert controller.inflight == 1
+        assert controller.inflight == 0
+        assert controller.metrics()['admitted_normal'] == 1
+
+    def test_normal_lane_shed_when_reserve_reached(self, app, bare_app):
+        """Test unknown accounts cannot use the reserved priority capacity."""
+        controller = LoginAdmissionController(bare_app(LOGIN_ADMISSION_MAX_INFLIGHT=4,
+                                                       LOGIN_ADMISSION_PRIORITY_RESERVE=0.5,
+                                                       LOGIN_ADMISSION_PRIORITY_WAIT=0,
+                                                       LOGIN_ADMISSION_RETRY_AFTER=3))
+        recent = make_user(last_login=datetime.now(timezone.utc) - timedelta(days=1))
+        with app.test_request_context():
+            with controller.admit(make_user()), controller.admit(make_user()):
+                with pytest.raises(LoginShed) as excinfo:
+                    with controller.admit(make_user()):
+                        pass
+                assert excinfo.value.retry_after == 3
+
+                # Recently active accounts still get through
+                with controller.admit(recent) as priority:
+                    assert priority is True
+
+        metrics = controller.metrics()
+        assert metrics['shed_normal'] == 1
+        assert metrics['admitted_priority'] == 1
+        assert metrics['peak_inflight'] == 3
+
+    def test_priority_lane_shed_at_capacity(self, app, bare_app):
+        """Test priority logins are shed once total capacity is used."""
+        controller = LoginAdmissionController(bare_app(LOGIN_ADMISSION_MAX_INFLIGHT=1, LOGIN_ADMISSION_PRIORITY_WAIT=0))
+        recent = make_user(last_login=datetime.now(timezone.utc))
+        with app.test_request_context():
+            with controller.admit(recent):
+                with pytest.raises(LoginShed):
+                    with controller.admit(recent):
+                        pass
+        assert controller.metrics()['shed_priority'] == 1
+
+    def test_known_device_cookie_grants_priority(self, app, bare_app):
+        """Test a device cookie issued to the same user marks the login as priority."""
+        controller = LoginAdmissionController(bare_app(LOGIN_ADMISSION_PRIORITY_WAIT=0))
+        user = make_user(user_id=7)
+        cookie = controller._serializer.dumps(7)
+
+        with app.test_request_context(headers={'Cookie': f'mrc_device={cookie}'}):
+            assert controller.is_priority(user) is True
+            assert controller.is_priority(make_user(user_id=8)) is False
+        with app.test_request_context(headers={'Cookie': 'mrc_device=forged'}):
+            assert controller.is_priority(user) is False
+
+    def test_expired_device_cookie_ignored(self, app, bare_app, monkeypatch):
+        """Test a device cookie older than its max age no longer grants priority."""
+        controller = LoginAdmissionController(bare_app(LOGIN_ADMISSION_PRIORITY_WAIT=0,
+                                                       LOGIN_DEVICE_COOKIE_MAX_AGE=3600))
+        with monkeypatch.context() as patched:  # issued just over an hour ago
+            patched.setattr(TimestampSigner, 'get_timestamp', lambda signer: int(time.time()) - 3601)
+            cookie = controller._serializer.dumps(7)
+
+        with app.test_request_context(headers={'Cookie': f'mrc_device={cookie}'}):
+            assert controller.is_priority(make_user(user_id=7)) is False
+
+
+class TestLoginShedding:
+    """Test the login route sheds when admission is closed."""
+
+    def test_login_shed_returns_503(self, client, valid_login_data, monkeypatch):
+        """Test a shed login responds 503 with Retry-After."""
+        monkeypatch.setattr(login_admission, 'max_inflight', 0)
+        monkeypatch.setattr(login_admission, 'normal_limit', 0)
+        monkeypatch.setattr(login_admission, 'priority_wait', 0)
+
+        response = client.post('/api/auth/login', json=valid_login_data)
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == str(login_admission.retry_after)
+
+    def test_successful_login_sets_device_cookie(self, client, valid_login_data):
+        """Test successful login issues the known-device cookie."""
+        response = client.post('/api/auth/login', json=valid_login_data)
+
+        assert response.status_code == 200
+        cookies = response.headers.getlist('Set-Cookie')
+        assert any(c.startswith(f'{login_admission.cookie_name}=') for c in cookies)
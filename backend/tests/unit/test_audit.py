@@ -0,0 +1,274 @@
+"""
+Unit tests for the security audit event store.
+Tests the write-behind buffer and the admin query endpoint's filters and keyset paging.
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, insert
+
+from app import db, audit_events
+from app.audit import decode_cursor, encode_cursor, query_events
+from app.models import AuditEvent, User
+
+BASE_TIME = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def audit(app_context, monkeypatch):
+    """The app's audit buffer, enabled with a long interval so tests flush explicitly."""
+    monkeypatch.setattr(audit_events, 'enabled', True)
+    monkeypatch.setattr(audit_events, 'flush_interval', 3600)
+    monkeypatch.setattr(audit_events, 'flush_size', 1000)
+    monkeypatch.setattr(audit_events, 'counters', dict.fromkeys(audit_events.counters, 0))
+    yield audit_events
+    audit_events._pending.clear()
+    db.session.rollback()
+    AuditEvent.query.delete()
+    db.session.commit()
+
+
+@pytest.fixture
+def seeded_events(audit):
+    """Events for users 1 and 2, one a minute from BASE_TIME; every third minute has a tie."""
+    rows = []
+    for minute in range(30):
+        created_at = BASE_TIME + timedelta(minutes=minute)
+        rows.append({'user_id': 1 + minute % 2, 'event_type': 'LOGIN_FAILED' if minute % 5 else 'LOGIN_SUCCESS',
+                     'ip_address': '203.0.113.7', 'details': None, 'created_at': created_at})
+        if minute % 3 == 0:
+            rows.append({'user_id': 1, 'event_type': 'LOGOUT', 'ip_address': None,
+                         'details': None, 'created_at': created_at})
+    db.session.execute(insert(AuditEvent.__table__), rows)
+    db.session.commit()
+    return rows
+
+
+@pytest.fixture
+def admin_client(client, app_context):
+    """Test client logged in as the seeded admin user (michael)."""
+    response = client.post('/api/auth/login', json={
+        'username': 'michael', 'password': 'AdminMike123!'
+    })
+    assert response.status_code == 200
+    return client
+
+
+def all_pages(client, **params):
+    """Follow next_cursor until the last page, returning every event id in order"""
+    ids = []
+    while True:
+        response = client.get('/api/admin/audit-events', query_string=params)
+        assert response.status_code == 200
+        data = response.get_json()
+        ids.extend(event['id'] for event in data['events'])
+        if data['next_cursor'] is None:
+            return ids
+        params['cursor'] = data['next_cursor']
+
+
+class TestAuditEventBuffer:
+    """Security events are buffered and written in bulk."""
+
+    def test_disabled_buffer_records_nothing(self, app_context):
+        """Test the test configuration keeps events out of the buffer."""
+        audit_events.record(1, 'LOGIN_SUCCESS')
+        assert audit_events.metrics()['pending'] == 0
+
+    def test_security_event_is_buffered_not_written(self, audit, create_test_user, sql_counter):
+        """Test log_security_event queues the row without touching the database."""
+        user = create_test_user(username='audituser', email='audit@example.com')
+        db.session.refresh(user)
+        try:
+            with sql_counter() as stats:
+                user.log_security_event('LOGIN_FAILED', '203.0.113.9', 'Attempt 1')
+            assert stats['statements'] == []
+            assert audit.metrics()['pending'] == 1
+        finally:
+            db.session.delete(user)
+            db.session.commit()
+
+    def test_flush_inserts_batch_in_one_statement(self, audit, sql_counter):
+        """Test a flush writes every pending event with a single INSERT and commit."""
+        for n in range(25):
+            audit.record(n, 'LOGIN_FAILED', '203.0.113.9', {'attempt': n})
+
+        with sql_counter() as stats:
+            assert audit.flush() == 25
+
+        assert stats['statements'] == ['INSERT']
+        assert stats['commits'] == 1
+        assert AuditEvent.query.count() == 25
+        event = AuditEvent.query.filter_by(user_id=3).one()
+        assert (event.event_type, event.ip_address, event.details) == (
+            'LOGIN_FAILED', '203.0.113.9', "{'attempt': 3}"
+        )
+        assert audit.metrics() == {'recorded': 25, 'written': 25, 'dropped': 0, 'pending': 0}
+
+    def test_login_events_reach_the_table(self, audit, client, create_test_user):
+        """Test failed and successful logins end up as queryable rows."""
+        user = create_test_user(username='auditlogin', email='auditlogin@example.com')
+        try:
+            client.post('/api/auth/login', json={'username': 'auditlogin', 'password': 'WrongPass123!'})
+            client.post('/api/auth/login', json={'username': 'auditlogin', 'password': 'TestPass123!'})
+            audit.flush()
+
+            events, _ = query_events(user_id=user.id)
+            assert [event.event_type for event in events] == ['LOGIN_SUCCESS', 'LOGIN_FAILED']
+            assert events[0].ip_address == '127.0.0.1'
+        finally:
+            db.session.delete(user)
+            db.session.commit()
+
+    def test_full_buffer_drops_new_events(self, audit, monkeypatch):
+        """Test events beyond AUDIT_BUFFER_MAX are counted and dropped."""
+        monkeypatch.setattr(audit, 'max_pending', 3)
+        for n in range(5):
+            audit.record(n, 'LOGIN_FAILED')
+
+        assert audit.metrics()['pending'] == 3
+        assert audit.metrics()['dropped'] == 2
+        audit.flush()
+        assert sorted(event.user_id for event in AuditEvent.query) == [0, 1, 2]
+
+    def test_failed_flush_keeps_events(self, audit, monkeypatch):
+        """Test a batch that fails to insert is retried ahead of newer events."""
+        audit.record(1, 'LOGIN_FAILED')
+        audit.record(2, 'LOGIN_FAILED')
+
+        def broken_insert(table):
+            raise RuntimeError('database unavailable')
+
+        monkeypatch.setattr('sqlalchemy.insert', broken_insert)
+        assert audit.flush() == 0
+        monkeypatch.undo()
+        monkeypatch.setattr(audit_events, 'enabled', True)
+        audit.record(3, 'LOGIN_FAILED')
+
+        assert audit.flush() == 3
+        assert [event.user_id for event in AuditEvent.query.order_by(AuditEvent.id)] == [1, 2, 3]
+
+
+class TestAuditEventQuery:
+    """Filtering and keyset pagination of the audit trail."""
+
+    def test_pages_cover_every_event_once(self, admin_client, seeded_events):
+        """Test following next_cursor returns each event exactly once, newest first."""
+        ids = all_pages(admin_client, limit=7)
+
+        assert len(ids) == len(seeded_events)
+        assert len(set(ids)) == len(ids)
+        events = [db.session.get(AuditEvent, event_id) for event_id in ids]
+        keys = [(event.created_at, event.id) for event in events]
+        assert keys == sorted(keys, reverse=True)
+
+    def test_filters_combine_with_paging(self, admin_client, seeded_events):
+        """Test user, event type and time range filters apply across every page."""
+        since = BASE_TIME + timedelta(minutes=6)
+        until = BASE_TIME + timedelta(minutes=24)
+        ids = all_pages(admin_client, user_id=1, event_type='LOGOUT', limit=2,
+                        since=since.isoformat(), until=until.isoformat())
+
+        expected = [
+            row for row in seeded_events
+            if row['user_id'] == 1 and row['event_type'] == 'LOGOUT' and since <= row['created_at'] < until
+        ]
+        assert len(ids) == len(expected) == 6
+        events = [db.session.get(AuditEvent, event_id) for event_id in ids]
+        assert {event.event_type for event in events} == {'LOGOUT'}
+        assert events[0].to_dict()['created_at'] == (BASE_TIME + timedelta(minutes=21)).isoformat()
+
+    def test_event_payload(self, admin_client, seeded_events):
+        """Test each event is returned with its audit fields."""
+        response = admin_client.get('/api/admin/audit-events', query_string={'limit': 1})
+        data = response.get_json()
+
+        assert data['events'][0] == {
+            'id': data['events'][0]['id'],
+            'user_id': 2,
+            'event_type': 'LOGIN_FAILED',
+            'ip_address': '203.0.113.7',
+            'details': None,
+            'created_at': (BASE_TIME + timedelta(minutes=29)).isoformat()
+        }
+        assert data['next_cursor'] is not None
+
+    @pytest.mark.parametrize('params', [
+        {'cursor': 'not-a-cursor'},
+        {'limit': 0},
+        {'limit': 501},
+        {'since': 'yesterday'},
+        {'user_id': 'glen'},
+    ])
+    def test_invalid_parameters_rejected(self, admin_client, audit, params):
+        """Test malformed filters and cursors get a 400 rather than a query."""
+        response = admin_client.get('/api/admin/audit-events', query_string=params)
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+
+    def test_requires_admin(self, client, create_test_user):
+        """Test users outside ADMIN_USER_IDS are refused."""
+        user = create_test_user(username='notadmin', email='notadmin@example.com')
+        try:
+            assert client.get('/api/admin/audit-events').status_code == 401
+            client.post('/api/auth/login', json={'username': 'notadmin', 'password': 'TestPass123!'})
+            response = client.get('/api/admin/audit-events')
+            assert response.status_code == 403
+        finally:
+            db.session.delete(user)
+            db.session.commit()
+
+    def test_admin_username_grants_nothing(self, client, create_test_user):
+        """Test a user who renames themselves to an admin's username is still refused."""
+        admin = User.find_by_username('michael')
+        user = create_test_user(username='renamer', email='renamer@example.com')
+        try:
+            client.post('/api/auth/login', json={'username': 'renamer', 'password': 'TestPass123!'})
+            admin.username = 'formeradmin'
+            db.session.commit()
+            assert client.put('/api/auth/profile', json={'username': 'michael'}).status_code == 200
+            assert client.get('/api/admin/audit-events').status_code == 403
+            assert client.get('/api/metrics').status_code == 403
+        finally:
+            db.session.delete(user)
+            db.session.commit()
+            admin.username = 'michael'
+            db.session.commit()
+
+    def test_metrics_for_admins(self, admin_client):
+        """Test /api/metrics answers admins."""
+        response = admin_client.get('/api/metrics')
+        assert response.status_code == 200
+        assert 'login_admission' in response.get_json()
+
+    def test_closed_without_admins(self, admin_client, app, monkeypatch):
+        """Test ADMIN_USER_IDS defaults to nobody."""
+        monkeypatch.setitem(app.config, 'ADMIN_USER_IDS', [])
+        assert admin_client.get('/api/admin/audit-events').status_code == 403
+
+    def test_cursor_round_trip(self):
+        """Test cursors decode to the UTC timestamp and id they were made from."""
+        naive = datetime(2026, 3, 2, 9, 30, 15, 123456)
+        assert decode_cursor(encode_cursor(naive, 42)) == (naive.replace(tzinfo=timezone.utc), 42)
+
+    def test_deep_page_is_an_index_range_scan(self, audit):
+        """Test a filtered page after a cursor seeks the index instead of scanning and sorting."""
+        if db.engine.dialect.name != 'sqlite':
+            pytest.skip('EXPLAIN QUERY PLAN is SQLite specific')
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            query_events(user_id=1, cursor=(BASE_TIME, 10), limit=50)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        statement, parameters = statements[-1]
+        plan = ' '.join(row[3] for row in db.session.connection().exec_driver_sql(
+            'EXPLAIN QUERY PLAN ' + statement, parameters
+        ))
+        assert 'ix_audit_event_user_id_created_at' in plan
+        assert 'created_at<?' in plan
+        assert 'TEMP B-TREE' not in plan
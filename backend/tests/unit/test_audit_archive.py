@@ -0,0 +1,195 @@
+"""
+Unit tests for audit event archival.
+Tests rolling closed days into segments, index pruning and archive scans.
+"""
+import gzip
+import json
+import os
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+from sqlalchemy import insert
+
+from app import db, audit_archive
+from app.models import AuditEvent
+
+NOW = datetime(2026, 6, 15, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def archive(app_context, tmp_path, monkeypatch):
+    """The app's audit archive writing to a temporary directory, 30 day retention."""
+    monkeypatch.setattr(audit_archive, 'directory', str(tmp_path))
+    monkeypatch.setattr(audit_archive, 'hot_retention_days', 30)
+    monkeypatch.setattr(audit_archive, 'delete_batch_size', 7)
+    yield audit_archive
+    db.session.rollback()
+    AuditEvent.query.delete()
+    db.session.commit()
+
+
+def add_events(*events):
+    """Insert (user_id, event_type, created_at) rows, returning their dicts"""
+    rows = [{'user_id': user_id, 'event_type': event_type, 'ip_address': '203.0.113.7',
+             'details': None, 'created_at': created_at} for user_id, event_type, created_at in events]
+    db.session.execute(insert(AuditEvent.__table__), rows)
+    db.session.commit()
+    return rows
+
+
+def at(day, hour=0, minute=0):
+    return datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc) + timedelta(hours=hour, minutes=minute)
+
+
+OLD_DAY = date(2026, 4, 1)
+OTHER_DAY = date(2026, 4, 3)
+RECENT_DAY = date(2026, 6, 1)
+
+
+@pytest.fixture
+def history(archive):
+    """Two closed days plus one inside the retention window."""
+    return add_events(
+        *[(1 + n % 3, 'LOGIN_FAILED', at(OLD_DAY, n)) for n in range(20)],
+        (2, 'ACCOUNT_LOCKED', at(OLD_DAY, 20, 30)),
+        *[(5, 'LOGIN_SUCCESS', at(OTHER_DAY, n)) for n in range(4)],
+        (1, 'LOGIN_SUCCESS', at(RECENT_DAY, 9)),
+    )
+
+
+class TestArchiveWrite:
+    """Closed partitions move from the table to compressed segments."""
+
+    def test_only_days_past_retention_are_archived(self, history, archive):
+        """Test each closed day becomes a segment and recent events stay in the table."""
+        archived = archive.archive_closed_partitions(now=NOW)
+
+        assert archived == {OLD_DAY: 21, OTHER_DAY: 4}
+        remaining = AuditEvent.query.all()
+        assert [(event.user_id, event.event_type) for event in remaining] == [(1, 'LOGIN_SUCCESS')]
+        assert sorted(os.listdir(archive.directory)) == [
+            'audit-2026-04-01-001.idx.json', 'audit-2026-04-01-001.ndjson.gz',
+            'audit-2026-04-03-001.idx.json', 'audit-2026-04-03-001.ndjson.gz',
+            'event-types.json',
+        ]
+
+    def test_segment_is_sorted_gzip_ndjson(self, history, archive):
+        """Test segments are plain gzip NDJSON in time order, readable without the app."""
+        archive.archive_closed_partitions(now=NOW)
+
+        with gzip.open(os.path.join(archive.directory, 'audit-2026-04-01-001.ndjson.gz'), 'rt') as fh:
+            events = [json.loads(line) for line in fh]
+        assert len(events) == 21
+        assert [event['created_at'] for event in events] == sorted(event['created_at'] for event in events)
+        assert events[-1] == {
+            'id': events[-1]['id'], 'user_id': 2, 'event_type': 'ACCOUNT_LOCKED',
+            'ip_address': '203.0.113.7', 'details': None,
+            'created_at': '2026-04-01T20:30:00.000000+00:00'
+        }
+
+    def test_index_describes_segment(self, history, archive):
+        """Test the index records time range, count, user range and event type bitmap."""
+        archive.archive_closed_partitions(now=NOW)
+
+        index = {entry['partition']: entry for entry in archive.indexes()}['2026-04-01']
+        assert index['first_ts'] == '2026-04-01T00:00:00.000000+00:00'
+        assert index['last_ts'] == '2026-04-01T20:30:00.000000+00:00'
+        assert index['count'] == 21
+        assert (index['min_user_id'], index['max_user_id']) == (1, 3)
+        assert index['event_types'] == archive.bitmap(['LOGIN_FAILED', 'ACCOUNT_LOCKED'])
+        assert not index['event_types'] & archive.bitmap(['LOGIN_SUCCESS'])
+
+    def test_rerun_after_interrupted_delete_does_not_duplicate(self, history, archive):
+        """Test rows left behind by a run that died mid-delete are removed, not archived twice."""
+        with patch.object(archive, '_delete', side_effect=KeyboardInterrupt):
+            with pytest.raises(KeyboardInterrupt):
+                archive.archive_day(OLD_DAY)
+        assert AuditEvent.query.count() == len(history)
+
+        archive.archive_closed_partitions(now=NOW)
+
+        assert [index['partition'] for index in archive.indexes()] == ['2026-04-01', '2026-04-03']
+        assert len(list(archive.scan())) == 25
+        assert AuditEvent.query.count() == 1
+
+    def test_late_rows_go_to_a_new_part(self, history, archive):
+        """Test rows arriving for an archived day are added as a further segment."""
+        archive.archive_closed_partitions(now=NOW)
+        add_events((9, 'LOGOUT', at(OLD_DAY, 23)))
+
+        assert archive.archive_closed_partitions(now=NOW) == {OLD_DAY: 1}
+        assert [index['segment'] for index in archive.indexes()][:2] == [
+            'audit-2026-04-01-001.ndjson.gz', 'audit-2026-04-01-002.ndjson.gz'
+        ]
+
+
+class TestArchiveScan:
+    """Queries open only segments whose index can match."""
+
+    def test_pruning_by_index(self, history, archive):
+        """Test time range, event type and user id each rule segments out before reading."""
+        archive.archive_closed_partitions(now=NOW)
+
+        def partitions(**filters):
+            return [index['partition'] for index in archive.matching_segments(**filters)]
+
+        assert partitions() == ['2026-04-01', '2026-04-03']
+        assert partitions(since=at(OTHER_DAY)) == ['2026-04-03']
+        assert partitions(until=at(OLD_DAY, 12)) == ['2026-04-01']
+        assert partitions(event_types=['ACCOUNT_LOCKED']) == ['2026-04-01']
+        assert partitions(event_types=['LOGIN_SUCCESS', 'ACCOUNT_LOCKED']) == ['2026-04-01', '2026-04-03']
+        assert partitions(event_types=['NEVER_LOGGED']) == []
+        assert partitions(user_id=5) == ['2026-04-03']
+        assert partitions(user_id=4) == []
+
+    def test_scan_skips_non_matching_segments(self, history, archive, monkeypatch):
+        """Test a scan never opens a segment its index excludes."""
+        archive.archive_closed_partitions(now=NOW)
+        opened = []
+        original = archive._scan_segment
+
+        def tracking(index, keep_line):
+            opened.append(index['partition'])
+            return original(index, keep_line)
+
+        monkeypatch.setattr(archive, '_scan_segment', tracking)
+        events = list(archive.scan(user_id=5))
+
+        assert opened == ['2026-04-03']
+        assert len(events) == 4
+
+    def test_scan_filters_events(self, history, archive):
+        """Test scans return exactly the matching events, oldest first."""
+        archive.archive_closed_partitions(now=NOW)
+
+        events = list(archive.scan(since=at(OLD_DAY, 5), until=at(OLD_DAY, 11),
+                                   event_types=['LOGIN_FAILED'], user_id=1))
+        assert [event['created_at'][11:16] for event in events] == ['06:00', '09:00']
+        assert {(event['user_id'], event['event_type']) for event in events} == {(1, 'LOGIN_FAILED')}
+        assert list(archive.scan(user_id=1, event_types=['ACCOUNT_LOCKED'])) == []
+
+    def test_scan_streams_large_segments(self, archive):
+        """Test segments bigger than one read chunk decompress line by line correctly."""
+        day = date(2026, 3, 1)
+        add_events(*[(n, 'LOGIN_FAILED', at(day) + timedelta(seconds=n)) for n in range(30000)])
+        archive.archive_closed_partitions(now=NOW)
+
+        events = list(archive.scan())
+        assert len(events) == 30000
+        assert [event['user_id'] for event in events] == list(range(30000))
+        assert [event['user_id'] for event in archive.scan(user_id=29999)] == [29999]
+
+    def test_cli_archive_and_query(self, history, archive, runner):
+        """Test the audit-archive and audit-query commands."""
+        older_than = (datetime.now(timezone.utc).date() - date(2026, 5, 1)).days  # Cut off at 1 May
+        result = runner.invoke(args=['audit-archive', '--older-than-days', str(older_than)])
+        assert result.exit_code == 0
+        assert 'Archived 25 audit events from 2 days' in result.output
+
+        result = runner.invoke(args=['audit-query', '--event-type', 'ACCOUNT_LOCKED'])
+        assert result.exit_code == 0
+        lines = [json.loads(line) for line in result.stdout.splitlines()]
+        assert [(line['user_id'], line['event_type']) for line in lines] == [(2, 'ACCOUNT_LOCKED')]
+
+        result = runner.invoke(args=['audit-query', '--since', 'last week'])
+        assert result.exit_code != 0
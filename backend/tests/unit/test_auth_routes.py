@@ -8,7 +8,7 @@ from datetime import datetime, timezone, timedelta
 from unittest.mock import patch, MagicMock
 
 from app import db
-from app.models import User
+from app.models import User, OutboxMessage
 from app.auth.routes import sanitize_input, validate_password_strength, get_client_ip
 
 
@@ -86,27 +86,20 @@ class TestAuthRouteHelpers:
         assert is_valid is False
         assert 'special character' in message
     
-    @patch('app.auth.routes.request')
-    def test_get_client_ip_direct(self, mock_request):
+    def test_get_client_ip_direct(self, app):
         """Test getting client IP from direct connection."""
-        mock_request.environ = {
-            'HTTP_X_FORWARDED_FOR': None,
-            'REMOTE_ADDR': '192.168.1.100'
-        }
-        
-        ip = get_client_ip()
+        with app.test_request_context(environ_base={'REMOTE_ADDR': '192.168.1.100'}):
+            ip = get_client_ip()
         assert ip == '192.168.1.100'
     
-    @patch('app.auth.routes.request')
-    def test_get_client_ip_forwarded(self, mock_request):
-        """Test getting client IP from X-Forwarded-For header."""
-        mock_request.environ = {
-            'HTTP_X_FORWARDED_FOR': '203.0.113.1',
-            'REMOTE_ADDR': '192.168.1.100'
-        }
-        
-        ip = get_client_ip()
-        assert ip == '203.0.113.1'
+    def test_get_client_ip_ignores_untrusted_forwarded(self, app):
+        """Test X-Forwarded-For is ignored when no proxy hops are trusted."""
+        with app.test_request_context(
+            headers={'X-Forwarded-For': '203.0.113.1'},
+            environ_base={'REMOTE_ADDR': '192.168.1.100'}
+        ):
+            ip = get_client_ip()
+        assert ip == '192.168.1.100'
 
 
 class TestLoginEndpoint:
@@ -648,7 +641,7 @@ class TestLogoutEndpoint:
 class TestPasswordResetEndpoints:
     """Test password reset functionality."""
     
-    @patch('app.auth.routes.mail.send')
+    @patch('app.mail.send')
     def test_request_password_reset_success(self, mock_send, client, create_test_user):
         """Test successful password reset request."""
         user = create_test_user(email='reset@example.com')
@@ -661,15 +654,19 @@ class TestPasswordResetEndpoints:
         data = response.get_json()
         assert 'password reset link has been sent' in data['message']
         
-        # Verify email was sent
-        mock_send.assert_called_once()
+        # Verify email was queued, not sent inside the request
+        mock_send.assert_not_called()
+        queued = OutboxMessage.query.filter_by(recipient='reset@example.com').all()
+        assert len(queued) == 1
+        assert queued[0].status == OutboxMessage.PENDING
         
         # Verify token was generated
         db.session.refresh(user)
         assert user.password_reset_token is not None
         assert user.password_reset_expires is not None
+        assert user.password_reset_token in queued[0].body
     
-    @patch('app.auth.routes.mail.send')
+    @patch('app.mail.send')
     def test_request_password_reset_nonexistent_email(self, mock_send, client):
         """Test password reset request for non-existent email."""
         response = client.post('/api/auth/request-password-reset', 
@@ -681,8 +678,9 @@ class TestPasswordResetEndpoints:
         data = response.get_json()
         assert 'password reset link has been sent' in data['message']
         
-        # But no email should be sent
+        # But no email should be sent or queued
         mock_send.assert_not_called()
+        assert OutboxMessage.query.filter_by(recipient='nonexistent@example.com').count() == 0
     
     def test_reset_password_success(self, client, user_with_reset_token):
         """Test successful password reset."""
@@ -0,0 +1,186 @@
+"""
+Unit tests for the profile cache and its backends.
+"""
+import json
+import os
+import pytest
+import socket
+
+from app.cache import CacheServerConnection, CacheServerError, MemoryBackend, ProfileCache, SharedBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMemoryBackend:
+    """LRU and TTL behaviour of the in-process backend."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is evicted past maxsize."""
+        backend = MemoryBackend(maxsize=2, ttl=60)
+        backend.set(1, {'id': 1})
+        backend.set(2, {'id': 2})
+        backend.get(1)
+        backend.set(3, {'id': 3})
+
+        assert backend.get(2) is None
+        assert backend.get(1) == {'id': 1}
+        assert backend.get(3) == {'id': 3}
+
+    def test_entries_expire(self):
+        """Test entries are dropped once their TTL has passed."""
+        clock = FakeClock()
+        backend = MemoryBackend(maxsize=2, ttl=10, clock=clock)
+        backend.set(1, {'id': 1})
+
+        clock.now = 9.9
+        assert backend.get(1) == {'id': 1}
+        clock.now = 10.0
+        assert backend.get(1) is None
+        assert backend.size() == 0
+
+    def test_returns_copies(self):
+        """Test callers can't mutate the cached payload."""
+        backend = MemoryBackend()
+        backend.set(1, {'id': 1})
+        backend.get(1)['id'] = 99
+
+        assert backend.get(1) == {'id': 1}
+
+
+    def test_set_after_invalidation_refused(self):
+        """Test a value read before an invalidation can't be written back after it."""
+        backend = MemoryBackend()
+        generation = backend.generation(1)
+        backend.invalidate(1)
+
+        assert backend.set_unless_invalidated(1, {'id': 1, 'v': 'old'}, generation) is False
+        assert backend.get(1) is None
+        assert backend.set_unless_invalidated(1, {'id': 1, 'v': 'new'}, backend.generation(1)) is True
+        assert backend.get(1) == {'id': 1, 'v': 'new'}
+
+    def test_generations_bounded(self):
+        """Test forgotten invalidations still refuse values read before them."""
+        backend = MemoryBackend(maxsize=2)
+        generation = backend.generation(1)
+        for key in (1, 2, 3, 4):
+            backend.invalidate(key)
+
+        assert len(backend._invalidated) == 2
+        assert backend.set_unless_invalidated(1, {'id': 1}, generation) is False
+
+
+class TestProfileCache:
+    """Counters and backend selection."""
+
+    def test_hit_miss_and_invalidation_counters(self, bare_app):
+        """Test lookups and invalidations are counted."""
+        cache = ProfileCache(bare_app(PROFILE_CACHE_BACKEND='memory'))
+        assert cache.get(1) is None
+        cache.set(1, {'id': 1})
+        assert cache.get(1) == {'id': 1}
+        cache.invalidate(1)
+        assert cache.get(1) is None
+
+        metrics = cache.metrics()
+        assert metrics['hits'] == 1
+        assert metrics['misses'] == 2
+        assert metrics['invalidations'] == 1
+        assert metrics['backend'] == 'memory'
+
+    def test_disabled_backend(self, bare_app):
+        """Test 'none' never caches."""
+        cache = ProfileCache(bare_app(PROFILE_CACHE_BACKEND='none'))
+        cache.set(1, {'id': 1})
+
+        assert cache.get(1) is None
+        assert cache.metrics()['size'] == 0
+
+    def test_unknown_backend_rejected(self, bare_app):
+        """Test a typo in PROFILE_CACHE_BACKEND fails at startup."""
+        with pytest.raises(ValueError):
+            ProfileCache(bare_app(PROFILE_CACHE_BACKEND='memcache'))
+
+    def test_shared_backend_round_trip(self, bare_app, cache_server):
+        """Test two clients (workers) see each other's writes and invalidations."""
+        worker_a = ProfileCache(bare_app(PROFILE_CACHE_BACKEND='shared', PROFILE_CACHE_SERVER=cache_server,
+                                         CACHE_SERVER_AUTHKEY='test-cache-server-key'))
+        worker_b = ProfileCache(bare_app(PROFILE_CACHE_BACKEND='shared', PROFILE_CACHE_SERVER=cache_server,
+                                         CACHE_SERVER_AUTHKEY='test-cache-server-key'))
+
+        worker_a.set(7, {'id': 7, 'full_name': 'Shared'})
+        assert worker_b.get(7) == {'id': 7, 'full_name': 'Shared'}
+        worker_b.invalidate(7)
+        assert worker_a.get(7) is None
+
+    def test_unreachable_server_is_a_miss(self):
+        """Test cache server outages degrade to misses instead of errors."""
+        cache = ProfileCache()
+        cache.backend = SharedBackend('127.0.0.1:1', 'test-cache-server-key')
+        cache.backend_name = 'shared'
+
+        assert cache.get(1) is None
+        cache.set(1, {'id': 1})
+        assert cache.counters['errors'] == 2
+
+    def test_stale_fill_skipped_across_workers(self, bare_app, cache_server):
+        """Test a worker's fill from before another worker's invalidation is dropped."""
+        reader = ProfileCache(bare_app(PROFILE_CACHE_BACKEND='shared', PROFILE_CACHE_SERVER=cache_server,
+                                       CACHE_SERVER_AUTHKEY='test-cache-server-key'))
+        writer = ProfileCache(bare_app(PROFILE_CACHE_BACKEND='shared', PROFILE_CACHE_SERVER=cache_server,
+                                       CACHE_SERVER_AUTHKEY='test-cache-server-key'))
+
+        generation = reader.generation(7)
+        writer.invalidate(7)  # the writer's commit lands while the reader loads the old row
+        reader.set(7, {'id': 7, 'full_name': 'Old'}, generation)
+
+        assert writer.get(7) is None
+        assert reader.metrics()['stale_sets'] == 1
+
+    def test_shared_backend_requires_key(self, bare_app, cache_server):
+        """Test the shared backend refuses to start without CACHE_SERVER_AUTHKEY."""
+        with pytest.raises(ValueError):
+            ProfileCache(bare_app(PROFILE_CACHE_BACKEND='shared', PROFILE_CACHE_SERVER=cache_server))
+
+    def test_wrong_key_rejected(self, bare_app, cache_server):
+        """Test a client without the server's key is refused, and the failure is a miss."""
+        cache = ProfileCache(bare_app(PROFILE_CACHE_BACKEND='shared', PROFILE_CACHE_SERVER=cache_server,
+                                      CACHE_SERVER_AUTHKEY='not-the-cache-server-key'))
+
+        assert cache.get(1) is None
+        assert cache.counters['errors'] == 1
+
+
+class TestCacheServer:
+    """The cache server's wire protocol."""
+
+    def connect(self, address):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(5)
+        sock.connect(address[len('unix:'):])
+        return sock.makefile('rwb')
+
+    def test_unauthenticated_requests_refused(self, cache_server):
+        """Test a client that skips the handshake gets nothing and is disconnected."""
+        stream = self.connect(cache_server)
+        assert 'challenge' in json.loads(stream.readline())
+        stream.write(b'{"obj":"store","method":"clear","args":[]}\n')
+        stream.flush()
+        assert stream.readline() == b''
+
+    def test_only_exposed_methods(self, cache_server):
+        """Test authenticated clients can't reach anything but the listed methods."""
+        connection = CacheServerConnection(cache_server, 'test-cache-server-key', 'store')
+        with pytest.raises(CacheServerError):
+            connection.call('__init__')
+        connection.call('set', 3, {'id': 3})
+        assert connection.call('get', 3) == {'id': 3}
+
+    def test_socket_private(self, cache_server):
+        """Test the unix socket is accessible to its owner only."""
+        assert os.stat(cache_server[len('unix:'):]).st_mode & 0o077 == 0
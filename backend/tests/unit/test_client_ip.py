@@ -0,0 +1,68 @@
+"""
+Unit tests for trusted-proxy client IP resolution.
+"""
+import pytest
+from flask import Flask, jsonify
+
+from app.client_ip import configure_proxy, get_client_ip
+
+
+def make_proxied_app(hops):
+    """Minimal app behind `hops` trusted proxies, echoing the resolved client IP."""
+    app = Flask(__name__)
+    app.config['PROXY_TRUSTED_HOPS'] = hops
+    configure_proxy(app)
+
+    @app.route('/ip')
+    def ip():
+        first = get_client_ip()
+        return jsonify({'ip': first, 'cached': get_client_ip() is first})
+
+    return app
+
+
+def resolve(app, forwarded_for=None, remote_addr='10.0.0.2'):
+    headers = {'X-Forwarded-For': forwarded_for} if forwarded_for else {}
+    response = app.test_client().get('/ip', headers=headers,
+                                     environ_base={'REMOTE_ADDR': remote_addr})
+    return response.get_json()['ip']
+
+
+class TestTrustedProxyHops:
+    """Only the trusted number of X-Forwarded-For hops is believed."""
+
+    def test_no_trusted_hops_ignores_header(self):
+        """Test a directly exposed app ignores spoofed X-Forwarded-For."""
+        assert resolve(make_proxied_app(0), '203.0.113.9') == '10.0.0.2'
+
+    def test_single_hop(self):
+        """Test one proxy: the entry it appended is the client."""
+        assert resolve(make_proxied_app(1), '203.0.113.9') == '203.0.113.9'
+
+    def test_single_hop_ignores_client_supplied_entries(self):
+        """Test entries the client prepended itself are not trusted."""
+        assert resolve(make_proxied_app(1), '1.1.1.1, 203.0.113.9') == '203.0.113.9'
+
+    def test_multi_hop(self):
+        """Test two proxies: the client is the second entry from the right."""
+        app = make_proxied_app(2)
+        assert resolve(app, '6.6.6.6, 198.51.100.7, 10.0.0.1') == '198.51.100.7'
+
+    def test_too_few_hops_falls_back_to_peer(self):
+        """Test a header shorter than the trusted hops is not used."""
+        assert resolve(make_proxied_app(2), '198.51.100.7') == '10.0.0.2'
+
+    def test_ipv6_is_normalized(self):
+        """Test equivalent IPv6 spellings resolve to one rate-limit key."""
+        assert resolve(make_proxied_app(1), '2001:DB8:0:0::1') == '2001:db8::1'
+
+    def test_resolved_once_per_request(self):
+        """Test the IP is cached on g within a request and cleared after it."""
+        app = make_proxied_app(1)
+        response = app.test_client().get('/ip', headers={'X-Forwarded-For': '203.0.113.9'})
+        assert response.get_json()['cached'] is True
+
+        with app.app_context():
+            client = app.test_client()
+            assert client.get('/ip', environ_base={'REMOTE_ADDR': '10.0.0.3'}).get_json()['ip'] == '10.0.0.3'
+            assert client.get('/ip', environ_base={'REMOTE_ADDR': '10.0.0.4'}).get_json()['ip'] == '10.0.0.4'
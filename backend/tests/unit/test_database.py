@@ -0,0 +1,103 @@
+"""
+Unit tests for database engine configuration.
+"""
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import db
+from app.database import configure_sqlite_engine, engine_options, pool_status, sqlite_pragmas
+
+
+TUNED = {
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_BUSY_TIMEOUT': 5000,
+    'SQLITE_MMAP_SIZE': 1024 * 1024,
+    'SQLITE_CACHE_SIZE': -2000,
+}
+
+
+def read_pragma(connection, name):
+    return connection.execute(text(f'PRAGMA {name}')).scalar()
+
+
+class TestSqlitePragmas:
+    """Pragmas from config are applied on connect."""
+
+    def test_file_database_is_tuned(self, tmp_path):
+        """Test every new connection gets WAL and the configured pragmas."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+        configure_sqlite_engine(engine, TUNED)
+
+        with engine.connect() as connection:
+            assert read_pragma(connection, 'journal_mode') == 'wal'
+            assert read_pragma(connection, 'synchronous') == 1  # NORMAL
+            assert read_pragma(connection, 'busy_timeout') == 5000
+            assert read_pragma(connection, 'mmap_size') == 1024 * 1024
+            assert read_pragma(connection, 'cache_size') == -2000
+        engine.dispose()
+
+    def test_none_keeps_sqlite_default(self, tmp_path):
+        """Test unset pragmas are left alone."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'default.db'}")
+        configure_sqlite_engine(engine, dict(TUNED, SQLITE_JOURNAL_MODE=None))
+
+        with engine.connect() as connection:
+            assert read_pragma(connection, 'journal_mode') == 'delete'
+            assert read_pragma(connection, 'busy_timeout') == 5000
+        engine.dispose()
+
+    def test_rejects_non_identifier_values(self):
+        """Test string pragmas must be plain keywords."""
+        with pytest.raises(ValueError):
+            sqlite_pragmas({'SQLITE_JOURNAL_MODE': 'WAL; DROP TABLE user'})
+
+    def test_app_engine_is_configured(self, app_context):
+        """Test create_app wires the pragmas into the application's engine."""
+        if db.engine.dialect.name != 'sqlite':
+            pytest.skip('SQLite only')
+        with db.engine.connect() as connection:
+            assert read_pragma(connection, 'busy_timeout') == 5000
+            assert read_pragma(connection, 'cache_size') == -64000
+
+
+class TestEngineOptions:
+    """Server databases get a sized, pre-pinged pool."""
+
+    def test_sqlite_leaves_pool_to_flask_sqlalchemy(self):
+        """Test SQLite URIs get no pool options."""
+        assert engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'}) == {}
+
+    def test_postgresql_pool_and_statement_timeout(self):
+        """Test PostgreSQL gets pool sizing, pre-ping and a statement timeout."""
+        options = engine_options({
+            'SQLALCHEMY_DATABASE_URI': 'postgresql://mrc@localhost/mrc',
+            'DATABASE_POOL_SIZE': 8,
+            'DATABASE_MAX_OVERFLOW': 4,
+            'DATABASE_POOL_RECYCLE': 600,
+            'DATABASE_STATEMENT_TIMEOUT': 2500,
+        })
+
+        assert options['pool_size'] == 8
+        assert options['max_overflow'] == 4
+        assert options['pool_recycle'] == 600
+        assert options['pool_pre_ping'] is True
+        assert options['connect_args'] == {'options': '-c statement_timeout=2500'}
+
+    def test_pool_status_reports_queue_pool_counters(self, tmp_path):
+        """Test checked-out connections show up in the pool counters."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", pool_size=3, max_overflow=2)
+
+        with engine.connect():
+            status = pool_status(engine)
+        engine.dispose()
+
+        assert status == {
+            'pool': 'QueuePool', 'size': 3, 'checked_in': 0, 'checked_out': 1, 'overflow': -2
+        }
+
+    def test_pool_status_static_pool(self, app_context):
+        """Test pools without counters report just their class."""
+        if db.engine.dialect.name != 'sqlite':
+            pytest.skip('in-memory SQLite only')
+        assert pool_status(db.engine) == {'pool': 'StaticPool'}
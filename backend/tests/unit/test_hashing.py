@@ -0,0 +1,164 @@
+"""
+Unit tests for the password hashing executor.
+Tests process pool hashing, inline fallback, queue-full rejection and bcrypt cost handling.
+"""
+import bcrypt
+import pytest
+import time
+from unittest.mock import patch
+
+from app import db
+from app.hashing import HashingExecutor, HashingQueueFull, HashingTimeout, calibrate_rounds, hash_rounds
+from app.models import User
+
+
+class TestHashingExecutor:
+    """Test HashingExecutor behaviour."""
+
+    def test_inline_hash_and_check(self, bare_app):
+        """Test pool size 0 hashes in the calling thread."""
+        executor = HashingExecutor(bare_app(BCRYPT_ROUNDS=4, HASHING_POOL_SIZE=0))
+        password_hash = executor.hash_password('TestPass123!')
+
+        assert password_hash.startswith('$2b$')
+        assert executor.check_password('TestPass123!', password_hash) is True
+        assert executor.check_password('WrongPass123!', password_hash) is False
+
+    def test_process_pool_hash_and_check(self, bare_app):
+        """Test hashing round-trips through the process pool."""
+        executor = HashingExecutor(bare_app(BCRYPT_ROUNDS=4, HASHING_POOL_SIZE=1, HASHING_QUEUE_DEPTH=4))
+        try:
+            password_hash = executor.hash_password('TestPass123!')
+            assert executor.check_password('TestPass123!', password_hash) is True
+            assert executor.check_password('WrongPass123!', password_hash) is False
+        finally:
+            executor.shutdown()
+
+    def test_queue_full_rejects_submission(self, bare_app):
+        """Test submissions beyond the queue depth are rejected."""
+        executor = HashingExecutor(bare_app(BCRYPT_ROUNDS=4, HASHING_POOL_SIZE=1, HASHING_QUEUE_DEPTH=1))
+        try:
+            executor._slots.acquire()  # Occupy the only slot
+            with pytest.raises(HashingQueueFull):
+                executor.hash_password('TestPass123!')
+        finally:
+            executor._slots.release()
+            executor.shutdown()
+
+    def test_slots_released_after_completion(self, bare_app):
+        """Test completed work frees its queue slot."""
+        executor = HashingExecutor(bare_app(BCRYPT_ROUNDS=4, HASHING_POOL_SIZE=1, HASHING_QUEUE_DEPTH=1))
+        try:
+            password_hash = executor.hash_password('TestPass123!')
+            # A second call only succeeds if the first released its slot
+            assert executor.check_password('TestPass123!', password_hash) is True
+        finally:
+            executor.shutdown()
+
+
+    def test_timeout_is_backpressure(self, bare_app):
+        """Test work outlasting HASHING_TIMEOUT raises HashingQueueFull and keeps its slot until done."""
+        executor = HashingExecutor(bare_app(BCRYPT_ROUNDS=4, HASHING_POOL_SIZE=1, HASHING_QUEUE_DEPTH=1,
+                                            HASHING_TIMEOUT=0.2))
+        try:
+            with pytest.raises(HashingTimeout):
+                executor._run(time.sleep, 1)
+            assert not executor._slots.acquire(blocking=False)  # still running in the pool
+            assert executor._slots.acquire(timeout=5)
+            executor._slots.release()
+        finally:
+            executor.shutdown()
+
+
+class TestBcryptCost:
+    """Test bcrypt cost calibration and rehash detection."""
+
+    def test_hash_rounds_parses_cost(self):
+        """Test the cost factor is read from the hash prefix."""
+        assert hash_rounds(bcrypt.hashpw(b'pw', bcrypt.gensalt(5)).decode()) == 5
+        assert hash_rounds('not-a-bcrypt-hash') is None
+        assert hash_rounds(None) is None
+
+    def test_calibration_respects_bounds(self):
+        """Test calibration clamps to the configured round range."""
+        assert calibrate_rounds(target_ms=0.001, min_rounds=4, max_rounds=8) == 4
+        assert calibrate_rounds(target_ms=10 ** 9, min_rounds=4, max_rounds=8) == 8
+
+    def test_calibration_stored_in_config(self, bare_app, tmp_path):
+        """Test an unset BCRYPT_ROUNDS is calibrated and written back to config."""
+        app = bare_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=None, BCRYPT_TARGET_MS=1,
+                       BCRYPT_MIN_ROUNDS=4, BCRYPT_MAX_ROUNDS=6,
+                       BCRYPT_ROUNDS_FILE=str(tmp_path / 'bcrypt-rounds'))
+        executor = HashingExecutor(app)
+
+        assert 4 <= executor.rounds <= 6
+        assert app.config['BCRYPT_ROUNDS'] == executor.rounds
+        assert (tmp_path / 'bcrypt-rounds').read_text() == str(executor.rounds)
+        assert hash_rounds(executor.hash_password('TestPass123!')) == executor.rounds
+
+    def test_workers_share_first_calibration(self, bare_app, tmp_path):
+        """Test workers whose calibration would differ all use the first worker's cost."""
+        config = dict(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=None, BCRYPT_ROUNDS_FILE=str(tmp_path / 'bcrypt-rounds'))
+        with patch('app.hashing.calibrate_rounds', side_effect=[11, 12, 13]) as calibrate:
+            workers = [HashingExecutor(bare_app(**config)) for _ in range(3)]
+
+        assert [worker.rounds for worker in workers] == [11, 11, 11]
+        assert calibrate.call_count == 1
+        stored = bcrypt.hashpw(b'pw', bcrypt.gensalt(11)).decode()
+        assert not any(worker.needs_rehash(stored) for worker in workers)
+
+    def test_calibrated_cost_never_downgrades(self, bare_app, tmp_path):
+        """Test a calibrated cost upgrades weaker hashes but leaves stronger ones alone."""
+        (tmp_path / 'bcrypt-rounds').write_text('5')
+        executor = HashingExecutor(bare_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=None,
+                                            BCRYPT_ROUNDS_FILE=str(tmp_path / 'bcrypt-rounds')))
+
+        assert executor.rounds == 5
+        assert executor.needs_rehash(bcrypt.hashpw(b'pw', bcrypt.gensalt(4)).decode()) is True
+        assert executor.needs_rehash(bcrypt.hashpw(b'pw', bcrypt.gensalt(6)).decode()) is False
+
+    def test_needs_rehash_on_cost_mismatch(self, bare_app):
+        """Test an explicit BCRYPT_ROUNDS flags hashes of any other cost for upgrade or downgrade."""
+        executor = HashingExecutor(bare_app(HASHING_POOL_SIZE=0, BCRYPT_ROUNDS=5))
+
+        assert executor.needs_rehash(executor.hash_password('TestPass123!')) is False
+        assert executor.needs_rehash(bcrypt.hashpw(b'pw', bcrypt.gensalt(4)).decode()) is True
+        assert executor.needs_rehash(bcrypt.hashpw(b'pw', bcrypt.gensalt(6)).decode()) is True
+
+    def test_login_rehashes_stale_cost(self, client, app_context):
+        """Test a successful login upgrades a hash made with a different cost."""
+        user = User(username='rehashuser', email='rehash@example.com', full_name='Rehash User')
+        user.password_hash = bcrypt.hashpw(b'RehashPass123!', bcrypt.gensalt(4)).decode()
+        db.session.add(user)
+        db.session.commit()
+
+        response = client.post('/api/auth/login', json={
+            'username': 'rehashuser',
+            'password': 'RehashPass123!'
+        })
+
+        assert response.status_code == 200
+        db.session.refresh(user)
+        assert hash_rounds(user.password_hash) == app_context.config['BCRYPT_ROUNDS']
+        assert user.check_password('RehashPass123!') is True
+
+
+class TestHashingBackpressure:
+    """Test routes surface a full hashing queue as 503."""
+
+    def test_login_returns_503_when_queue_full(self, client, valid_login_data):
+        """Test login responds 503 with Retry-After when hashing is saturated."""
+        with patch('app.models.hasher.check_password', side_effect=HashingQueueFull):
+            response = client.post('/api/auth/login', json=valid_login_data)
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert 'busy' in response.get_json()['error']
+
+    def test_login_returns_503_on_timeout(self, client, valid_login_data):
+        """Test hashing that times out in the pool is answered like a full queue."""
+        with patch('app.models.hasher.check_password', side_effect=HashingTimeout):
+            response = client.post('/api/auth/login', json=valid_login_data)
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
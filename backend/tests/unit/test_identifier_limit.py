@@ -0,0 +1,170 @@
+"""
+Unit tests for per-identifier login limiting.
+"""
+import pytest
+
+from app import db, identifier_limiter
+from app.identifier_limit import DecayingCountMinSketch, LoginIdentifierLimiter, sketch_width
+from app.models import User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDecayingCountMinSketch:
+    """Estimates never undercount and decay with the window."""
+
+    def test_estimate_is_upper_bound(self):
+        """Test estimates are at least the true count, even with collisions."""
+        sketch = DecayingCountMinSketch(width=64, depth=4, window=60, buckets=6)
+        truth = {}
+        for i in range(500):
+            key = f'user{i % 97}'
+            sketch.add(key)
+            truth[key] = truth.get(key, 0) + 1
+
+        assert all(sketch.estimate(key) >= count for key, count in truth.items())
+        assert sketch.estimate('never-seen') <= max(truth.values()) * 4
+
+    def test_counts_decay_out_of_window(self):
+        """Test counts leave the estimate one bucket at a time."""
+        clock = FakeClock()
+        sketch = DecayingCountMinSketch(width=256, depth=3, window=60, buckets=6, clock=clock)
+        sketch.add('alice', 3)
+        clock.now += 30
+        sketch.add('alice', 2)
+
+        assert sketch.estimate('alice') == 5
+        clock.now += 35  # First bucket has left the 60s window
+        assert sketch.estimate('alice') == 2
+        clock.now += 60
+        assert sketch.estimate('alice') == 0
+
+    def test_conservative_update_spares_colliding_keys(self):
+        """Test hammering one key doesn't raise the estimate of keys sharing only some of its cells."""
+        sketch = DecayingCountMinSketch(width=8, depth=4, window=60, buckets=6)
+        for _ in range(100):
+            sketch.add('hammered')
+        assert sketch.estimate('hammered') == 100
+        assert sum(sketch.estimate(f'other{i}') >= 100 for i in range(50)) < 50
+
+    def test_retry_after_counts_every_bucket_over_the_limit(self):
+        """Test the wait lasts until the estimate is under the limit, not just until the oldest bucket goes."""
+        clock = FakeClock()
+        sketch = DecayingCountMinSketch(width=256, depth=3, window=60, buckets=6, clock=clock)
+        sketch.add('alice', 5)
+        clock.now += 30
+        sketch.add('alice', 5)
+
+        assert sketch.seconds_until_below('alice', 5) == 60
+        assert sketch.seconds_until_below('alice', 6) == 30
+        assert sketch.seconds_until_below('alice', 11) == 0
+
+    def test_memory_is_fixed(self):
+        """Test distinct keys don't grow the sketch."""
+        sketch = DecayingCountMinSketch(width=128, depth=4, window=60, buckets=6)
+        before = sketch.memory_bytes
+        for i in range(10000):
+            sketch.add(f'stuffed-{i}')
+
+        assert sketch.memory_bytes == before == 6 * 4 * 128 * 4
+
+
+class TestLoginIdentifierLimit:
+    """The login route rejects hammered identifiers before touching the database."""
+
+    @pytest.fixture
+    def target_user(self, app_context):
+        user = User(username='stuffed-target', email='stuffed@example.com', full_name='Stuffed Target')
+        user.set_password('StuffedPass123!')
+        db.session.add(user)
+        db.session.commit()
+        yield user
+        db.session.delete(user)
+        db.session.commit()
+
+    def test_rejects_after_max_failures(self, client, target_user, sql_counter):
+        """Test failures from many IPs trip the limit and the 429 costs no SQL."""
+        for _ in range(identifier_limiter.max_failures):
+            identifier_limiter.record_failure('stuffed-target')
+
+        with sql_counter() as stats:
+            response = client.post('/api/auth/login', json={
+                'username': 'STUFFED-TARGET', 'password': 'Wrong123!'
+            })
+
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        assert stats['statements'] == []
+        assert identifier_limiter.metrics()['rejected'] == 1
+
+    def test_unknown_identifiers_not_counted(self, client, app_context):
+        """Test usernames that match no account can't fill the sketch."""
+        for i in range(identifier_limiter.max_failures + 1):
+            response = client.post('/api/auth/login', json={
+                'username': 'no-such-user', 'password': 'Wrong123!'
+            }, environ_base={'REMOTE_ADDR': f'198.51.100.{i}'})
+            assert response.status_code == 401
+
+        assert identifier_limiter.sketch.estimate('no-such-user') == 0
+        assert identifier_limiter.metrics()['window_failures'] == 0
+
+    def test_wrong_password_counts(self, client, app_context):
+        """Test wrong passwords for a real account count toward the limit."""
+        user = User(username='limited', email='limited@example.com', full_name='Limited User')
+        user.set_password('LimitedPass123!')
+        db.session.add(user)
+        db.session.commit()
+
+        client.post('/api/auth/login', json={'username': 'limited', 'password': 'Wrong123!'})
+
+        assert identifier_limiter.sketch.estimate('limited') == 1
+        db.session.delete(user)
+        db.session.commit()
+
+    def test_successful_login_not_counted(self, client, app_context):
+        """Test successful logins don't use up the failure budget."""
+        user = User(username='unlimited', email='unlimited@example.com', full_name='Unlimited User')
+        user.set_password('UnlimitedPass123!')
+        db.session.add(user)
+        db.session.commit()
+
+        response = client.post('/api/auth/login', json={
+            'username': 'unlimited', 'password': 'UnlimitedPass123!'
+        })
+
+        assert response.status_code == 200
+        assert identifier_limiter.sketch.estimate('unlimited') == 0
+        db.session.delete(user)
+        db.session.commit()
+
+
+class TestSaturation:
+    """A sprayed sketch keeps clean identifiers usable."""
+
+    def test_spray_leaves_clean_identifiers_alone(self):
+        """Test 40k failures over distinct identifiers don't block identifiers never tried."""
+        limiter = LoginIdentifierLimiter()
+        limiter.max_failures = 10
+        limiter.expected_failures = 2000
+        limiter.sketch = DecayingCountMinSketch(width=sketch_width(10, 2000), depth=4, window=900, buckets=15)
+        for i in range(40000):
+            limiter.record_failure(f'sprayed{i}@example.com')
+
+        blocked = [i for i in range(500) if limiter.retry_after(f'clean{i}@example.com')]
+        assert blocked == []
+        assert limiter.metrics()['saturated_checks'] == 500
+
+        for _ in range(500):
+            limiter.record_failure('hammered@example.com')
+        assert limiter.retry_after('hammered@example.com') >= 1
+
+    def test_width_follows_limit_and_volume(self):
+        """Test a lower limit or more expected failures get a wider sketch."""
+        assert sketch_width(10, 10000) == 5437
+        assert sketch_width(5, 10000) > sketch_width(10, 10000) < sketch_width(10, 20000)
@@ -0,0 +1,84 @@
+"""
+Unit tests for normalized username/email lookup.
+"""
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.models import User, normalize_identifier
+
+
+@pytest.fixture
+def mixed_case_user(app_context):
+    """User whose identifiers are stored with mixed case."""
+    user = User(username='MixedCase', email='Mixed.Case@Example.com', full_name='Mixed Case')
+    user.set_password('MixedPass123!')
+    db.session.add(user)
+    db.session.commit()
+    yield user
+    db.session.delete(user)
+    db.session.commit()
+
+
+class TestNormalizedColumns:
+    """Normalized copies track username and email."""
+
+    def test_normalize_identifier(self):
+        """Test identifiers are stripped and lowercased."""
+        assert normalize_identifier('  Foo@Bar.COM ') == 'foo@bar.com'
+        assert normalize_identifier(None) is None
+
+    def test_validators_sync_normalized_columns(self, mixed_case_user):
+        """Test assigning username/email keeps the normalized columns in sync."""
+        assert mixed_case_user.username_normalized == 'mixedcase'
+        assert mixed_case_user.email_normalized == 'mixed.case@example.com'
+
+        mixed_case_user.email = 'Renamed@Example.com'
+        db.session.commit()
+
+        assert mixed_case_user.email_normalized == 'renamed@example.com'
+        assert mixed_case_user.email == 'Renamed@Example.com'
+
+
+class TestFindByLogin:
+    """Login identifiers resolve case-insensitively."""
+
+    def test_find_by_username_any_case(self, mixed_case_user):
+        """Test username lookup ignores case and surrounding whitespace."""
+        assert User.find_by_login('mixedcase') is mixed_case_user
+        assert User.find_by_login(' MIXEDCASE ') is mixed_case_user
+
+    def test_find_by_email_any_case(self, mixed_case_user):
+        """Test an identifier containing '@' is matched against email."""
+        assert User.find_by_login('MIXED.CASE@example.COM') is mixed_case_user
+        assert User.find_by_email('mixed.case@example.com') is mixed_case_user
+
+    def test_unknown_identifier(self, mixed_case_user):
+        """Test unknown identifiers return None."""
+        assert User.find_by_login('nobody') is None
+        assert User.find_by_login('nobody@example.com') is None
+
+    def test_login_with_differently_cased_email(self, client, mixed_case_user):
+        """Test the login route accepts any casing of the email."""
+        response = client.post('/api/auth/login', json={
+            'email': 'MIXED.CASE@EXAMPLE.COM',
+            'password': 'MixedPass123!'
+        })
+
+        assert response.status_code == 200
+        assert response.get_json()['user']['username'] == 'MixedCase'
+
+    @pytest.mark.parametrize('column, identifier', [
+        ('username_normalized', 'mixedcase'),
+        ('email_normalized', 'mixed.case@example.com'),
+    ])
+    def test_lookup_uses_index(self, app_context, column, identifier):
+        """Test the lookup is an index search, not a table scan."""
+        plan = db.session.execute(
+            text(f'EXPLAIN QUERY PLAN SELECT * FROM user WHERE {column} = :key'),
+            {'key': identifier}
+        ).fetchall()
+        detail = ' '.join(row[-1] for row in plan)
+
+        assert detail.startswith('SEARCH user USING INDEX')
+        assert f'ix_user_{column}' in detail
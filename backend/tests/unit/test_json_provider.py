@@ -0,0 +1,147 @@
+"""
+Unit tests for the JSON provider and precompiled model serializers.
+Tests encoder selection, output parity with Flask's stdlib provider and
+User.to_dict() through the serializer.
+"""
+import json
+import pytest
+import uuid
+from datetime import datetime, timezone
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app import db
+from app.json_provider import OrjsonProvider, init_json, json_provider_class, orjson
+from app.models import User, as_utc, user_serializer
+
+needs_orjson = pytest.mark.skipif(orjson is None, reason='orjson not installed')
+
+PAYLOAD = {
+    'user': {'id': 7, 'username': 'jsonuser', 'full_name': 'Zoë Json', 'phone': None, 'is_active': True},
+    'when': datetime(2026, 6, 1, 12, 30, tzinfo=timezone.utc),
+    'request_id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'counts': {3: 1, 1: 2},
+    'ratio': 0.25,
+}
+
+
+def providers():
+    app = Flask(__name__)
+    return DefaultJSONProvider(app), OrjsonProvider(app)
+
+
+class TestProviderSelection:
+    """JSON_PROVIDER chooses the encoder."""
+
+    def test_auto_prefers_orjson(self):
+        """Test 'auto' uses orjson when installed and the stdlib otherwise."""
+        expected = DefaultJSONProvider if orjson is None else OrjsonProvider
+        assert json_provider_class('auto') is expected
+
+    def test_stdlib(self):
+        """Test 'stdlib' keeps Flask's default provider."""
+        app = Flask(__name__)
+        app.config['JSON_PROVIDER'] = 'stdlib'
+        init_json(app)
+        assert type(app.json) is DefaultJSONProvider
+
+    def test_unknown_rejected(self):
+        """Test a misspelt setting fails at startup."""
+        with pytest.raises(ValueError):
+            json_provider_class('ujson')
+
+    def test_app_uses_setting(self, app):
+        """Test create_app installs the configured provider."""
+        assert isinstance(app.json, json_provider_class(app.config['JSON_PROVIDER']))
+
+
+@needs_orjson
+class TestOrjsonProvider:
+    """orjson output matches the stdlib provider."""
+
+    def test_same_document(self):
+        """Test dates, UUIDs and non-string keys encode like the stdlib provider."""
+        stdlib, fast = providers()
+        payload = dict(PAYLOAD, counts={'1': 2, '3': 1})  # the json module can't sort mixed keys
+        assert json.loads(fast.dumps(payload)) == json.loads(stdlib.dumps(payload))
+        assert json.loads(fast.dumps(PAYLOAD))['when'] == 'Mon, 01 Jun 2026 12:30:00 GMT'
+
+    def test_keys_sorted(self):
+        """Test keys are sorted like the stdlib provider so bodies are stable."""
+        _, fast = providers()
+        assert fast.dumps({'b': 1, 'a': {'d': 2, 'c': 3}}) == '{"a":{"c":3,"d":2},"b":1}'
+
+    def test_falls_back_for_json_module_options(self):
+        """Test keyword arguments and values orjson can't encode go to the json module."""
+        stdlib, fast = providers()
+        assert fast.dumps({'a': 1}, indent=2) == stdlib.dumps({'a': 1}, indent=2)
+        assert fast.dumps({'big': 2 ** 70}) == '{"big": 1180591620717411303424}'
+
+    def test_response_body(self, app):
+        """Test responses are compact UTF-8 JSON with a trailing newline."""
+        with app.test_request_context():
+            response = OrjsonProvider(app).response(PAYLOAD['user'])
+        assert response.mimetype == 'application/json'
+        assert response.data.endswith(b'}\n')
+        assert json.loads(response.data) == PAYLOAD['user']
+
+    def test_loads(self):
+        """Test request bodies decode from str and bytes."""
+        _, fast = providers()
+        assert fast.loads('{"a": [1, 2]}') == fast.loads(b'{"a": [1, 2]}') == {'a': [1, 2]}
+
+
+class TestUserSerializer:
+    """User.to_dict() through the precompiled serializer."""
+
+    @pytest.fixture
+    def json_user(self, app_context):
+        user = User(username='jsonuser', email='json@example.com', full_name='Json User', phone='+61 400 000 000')
+        user.set_password('JsonPass123!')
+        user.last_login = datetime(2026, 6, 1, 12, 30)
+        db.session.add(user)
+        db.session.commit()
+        yield user
+        db.session.delete(user)
+        db.session.commit()
+
+    def test_matches_fields(self, json_user):
+        """Test the payload has every field, in order, with ISO 8601 datetimes."""
+        assert json_user.to_dict() == {
+            'id': json_user.id,
+            'username': 'jsonuser',
+            'email': 'json@example.com',
+            'full_name': 'Json User',
+            'phone': '+61 400 000 000',
+            'created_at': as_utc(json_user.created_at).isoformat(),
+            'last_login': '2026-06-01T12:30:00+00:00',
+            'is_active': True,
+        }
+        assert list(json_user.to_dict()) == list(user_serializer.fields)
+
+    def test_datetimes_read_alike_before_and_after_reload(self, json_user):
+        """Test a datetime set in Python and the same value loaded from SQLite serialize identically."""
+        json_user.last_login = datetime(2026, 6, 2, 8, 0, tzinfo=timezone.utc)
+        db.session.commit()
+        assigned = json_user.to_dict()['last_login']
+        db.session.expire(json_user)
+        assert json_user.to_dict()['last_login'] == assigned == '2026-06-02T08:00:00+00:00'
+
+    def test_expired_instance_reloads(self, json_user, sql_counter):
+        """Test an expired instance is loaded through SQLAlchemy instead of failing."""
+        db.session.expire(json_user)
+        with sql_counter() as stats:
+            payload = json_user.to_dict()
+        assert payload['username'] == 'jsonuser'
+        assert len(stats['statements']) == 1
+
+    def test_unsaved_user(self):
+        """Test missing values serialize as None."""
+        payload = User(username='draft').to_dict()
+        assert payload['username'] == 'draft'
+        assert payload['id'] is None and payload['created_at'] is None
+
+    def test_many(self, json_user):
+        """Test listings serialize each instance."""
+        assert user_serializer.many([json_user, json_user])[1]['id'] == json_user.id
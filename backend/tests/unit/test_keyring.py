@@ -0,0 +1,190 @@
+"""
+Unit tests for the asymmetric JWT key ring.
+Tests kid-tagged signing, the JWKS endpoint, scheduled rotation with overlap and
+key changes made by other processes.
+"""
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+
+import jwt as pyjwt
+from flask import Flask
+from flask_jwt_extended import create_access_token, decode_token
+
+from app import jwt_keys
+from app.keyring import SigningKeyRing, jwt_keys_command
+from app.models import User
+from app.token_cache import CachingJWTManager
+
+NOW = datetime(2026, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def make_ring(tmp_path, algorithm='EdDSA', **config):
+    """Standalone app with its own key ring in tmp_path, wired like create_app"""
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET_KEY='k' * 32, JWT_ALGORITHM=algorithm, JWT_KEY_DIR=str(tmp_path),
+                      JWT_ACCESS_TOKEN_EXPIRES=timedelta(hours=8),
+                      JWT_REFRESH_TOKEN_EXPIRES=timedelta(days=30), **config)
+    manager = CachingJWTManager(app)
+    ring = SigningKeyRing(app)
+    manager.additional_headers_loader(ring.headers_callback)
+    manager.encode_key_loader(ring.encode_key_callback)
+    manager.decode_key_loader(ring.decode_key_callback)
+    return app, ring
+
+
+def kid_of(token):
+    return pyjwt.get_unverified_header(token)['kid']
+
+
+class TestSigning:
+    """Tokens are signed with the ring's current key and name it."""
+
+    def test_token_verifies_with_published_key(self, client, app_context):
+        """Test an outside service can verify a token from the JWKS alone."""
+        user = User.find_by_username('michael')
+        token = create_access_token(identity=str(user.id))
+        header = pyjwt.get_unverified_header(token)
+        assert header['alg'] == 'EdDSA'
+
+        jwks = client.get('/api/auth/.well-known/jwks.json').get_json()
+        key = pyjwt.PyJWKSet.from_dict(jwks)[header['kid']]
+        claims = pyjwt.decode(token, key.key, algorithms=['EdDSA'])
+        assert claims['sub'] == str(user.id)
+
+    def test_jwks_is_cacheable(self, client):
+        """Test the JWKS response is public, has a max-age and revalidates with its ETag."""
+        response = client.get('/api/auth/.well-known/jwks.json')
+        assert response.status_code == 200
+        assert response.cache_control.public
+        assert response.cache_control.max_age == 3600
+
+        etag = response.headers['ETag']
+        again = client.get('/api/auth/.well-known/jwks.json', headers={'If-None-Match': etag})
+        assert again.status_code == 304
+        assert again.data == b''
+
+    def test_jwks_omits_private_material(self, client):
+        """Test only public members are published."""
+        for key in client.get('/api/auth/.well-known/jwks.json').get_json()['keys']:
+            assert set(key) == {'kty', 'crv', 'x', 'kid', 'alg', 'use'}
+
+    def test_unknown_kid_rejected(self, client, app_context, tmp_path):
+        """Test a well-formed token from a key outside the ring is invalid."""
+        other_app, _ = make_ring(tmp_path)
+        user = User.find_by_username('michael')
+        with other_app.app_context():
+            token = create_access_token(identity=str(user.id))
+        client.set_cookie('access_token_cookie', token)
+        response = client.get('/api/me')
+        assert response.status_code == 401
+        assert response.get_json()['error'] == 'token_invalid'
+        assert kid_of(token) not in jwt_keys.keys
+
+    def test_rs256_ring(self, tmp_path):
+        """Test RS256 keys sign and verify through the same ring."""
+        app, ring = make_ring(tmp_path, 'RS256')
+        with app.app_context():
+            token = create_access_token(identity='7')
+            assert decode_token(token)['sub'] == '7'
+        assert json.loads(ring.jwks())['keys'][0]['kty'] == 'RSA'
+
+    def test_hmac_publishes_nothing(self, tmp_path):
+        """Test HS256 keeps signing with JWT_SECRET_KEY and an empty JWKS."""
+        app, ring = make_ring(tmp_path, 'HS256')
+        with app.app_context():
+            token = create_access_token(identity='7')
+        assert pyjwt.decode(token, 'k' * 32, algorithms=['HS256'])['sub'] == '7'
+        assert 'kid' not in pyjwt.get_unverified_header(token)
+        assert json.loads(ring.jwks()) == {'keys': []}
+        assert list(tmp_path.iterdir()) == []
+
+    def test_key_dir_independent_of_working_directory(self, tmp_path, monkeypatch):
+        """Test the default and relative JWT_KEY_DIR resolve under the instance folder, not the cwd."""
+        monkeypatch.chdir(tmp_path)
+        app = Flask(__name__, instance_path=str(tmp_path / 'instance'))
+        assert SigningKeyRing(app).directory == str(tmp_path / 'instance' / 'jwt-keys')
+        app.config['JWT_KEY_DIR'] = 'keys'
+        assert SigningKeyRing(app).directory == str(tmp_path / 'instance' / 'keys')
+        app.config['JWT_KEY_DIR'] = '/srv/mrc/jwt-keys'
+        assert SigningKeyRing(app).directory == '/srv/mrc/jwt-keys'
+
+
+class TestRotation:
+    """Scheduled rotation publishes ahead and retires after the overlap."""
+
+    def test_rotation_schedule(self, tmp_path):
+        """Test a new key is published ahead, then signs, and the old one is kept until its tokens expire."""
+        app, ring = make_ring(tmp_path)
+        first, _ = ring.rotate(now=NOW)
+        assert ring.rotate(now=NOW + timedelta(days=10)) == (None, [])
+
+        second, removed = ring.rotate(now=NOW + timedelta(days=29))
+        assert second.activates_at == NOW + timedelta(days=30)
+        assert removed == []
+        # Published now, signing only once it activates
+        assert {key['kid'] for key in json.loads(ring.jwks())['keys']} == {first.kid, second.kid}
+        assert ring.signing_key(NOW + timedelta(days=29, hours=1)).kid == first.kid
+        assert ring.signing_key(NOW + timedelta(days=30)).kid == second.kid
+        assert ring.rotate(now=NOW + timedelta(days=29, hours=2)) == (None, [])
+
+        # The first key's last tokens (30-day refresh) are valid until day 60
+        assert ring.rotate(now=NOW + timedelta(days=59))[1] == []
+        _, removed = ring.rotate(now=NOW + timedelta(days=60))
+        assert removed == [first.kid]
+        assert first.kid not in ring.keys and second.kid in ring.keys
+
+    def test_tokens_from_retired_key_still_verify(self, tmp_path):
+        """Test tokens signed before a rotation keep working until the old key is removed."""
+        app, ring = make_ring(tmp_path, JWT_KEY_PUBLISH_AHEAD=0)
+        with app.app_context():
+            old_token = create_access_token(identity='7')
+            ring.rotate(force=True)
+            new_token = create_access_token(identity='7')
+            assert kid_of(old_token) != kid_of(new_token)
+            assert decode_token(old_token)['sub'] == decode_token(new_token)['sub'] == '7'
+
+    def test_removed_key_clears_decode_cache(self, tmp_path):
+        """Test cached claims of a token stop verifying once its key is gone."""
+        app, ring = make_ring(tmp_path, JWT_KEY_PUBLISH_AHEAD=0)
+        manager = app.extensions['flask-jwt-extended']
+        with app.app_context():
+            token = create_access_token(identity='7')
+            assert decode_token(token)['sub'] == '7'
+            assert manager.metrics()['size'] == 1
+            (tmp_path / f'{kid_of(token)}.json').unlink()
+            ring.rotate(force=True)
+            assert manager.metrics()['size'] == 0
+            with pytest.raises(pyjwt.DecodeError):
+                decode_token(token)
+
+    def test_other_process_keys_picked_up(self, tmp_path):
+        """Test a token signed with a key another process just added verifies without waiting."""
+        app, ring = make_ring(tmp_path, JWT_KEY_PUBLISH_AHEAD=0)
+        other_app, other_ring = make_ring(tmp_path, JWT_KEY_PUBLISH_AHEAD=0)
+        with app.app_context():
+            create_access_token(identity='7')  # creates and loads the first key
+        with other_app.app_context():
+            other_ring.rotate(force=True)
+            token = create_access_token(identity='7')
+        assert kid_of(token) not in ring.keys
+        ring._checked_at -= 2  # past the one-second limit on forced reloads
+        with app.app_context():
+            assert decode_token(token)['sub'] == '7'
+
+    def test_rotate_command(self, tmp_path):
+        """Test `flask jwt-keys rotate` only adds a key when due unless forced."""
+        app, ring = make_ring(tmp_path)
+        runner = app.test_cli_runner()
+        with app.app_context():
+            assert 'Added key' in runner.invoke(jwt_keys_command, ['rotate']).output
+            assert 'No rotation due' in runner.invoke(jwt_keys_command, ['rotate']).output
+            assert 'Added key' in runner.invoke(jwt_keys_command, ['rotate', '--force']).output
+            listing = runner.invoke(jwt_keys_command, ['list']).output
+        assert 'signing' in listing and 'pending' in listing
+
+    def test_key_files_are_private(self, tmp_path):
+        """Test key files are readable by the owner only."""
+        app, ring = make_ring(tmp_path)
+        added, _ = ring.rotate()
+        assert (tmp_path / f'{added.kid}.json').stat().st_mode & 0o077 == 0
@@ -0,0 +1,127 @@
+"""
+Unit tests for the write-behind last_login buffer.
+Tests buffering, freshness in to_dict and bulk flushing.
+"""
+import pytest
+import threading
+from datetime import datetime, timezone
+
+from app import db, last_login_buffer
+from app.models import User, as_utc
+
+
+@pytest.fixture
+def write_behind(app_context, monkeypatch):
+    """Enable write-behind with a long interval so tests flush explicitly."""
+    monkeypatch.setattr(last_login_buffer, 'enabled', True)
+    monkeypatch.setattr(last_login_buffer, 'flush_interval', 3600)
+    monkeypatch.setattr(last_login_buffer, 'flush_size', 1000)
+    yield last_login_buffer
+    last_login_buffer._pending.clear()
+
+
+@pytest.fixture
+def wb_user(app_context):
+    """User for write-behind tests."""
+    user = User(username='wbuser', email='wb@example.com', full_name='Write Behind')
+    user.set_password('WbPass123!')
+    db.session.add(user)
+    db.session.commit()
+    yield user
+    db.session.delete(user)
+    db.session.commit()
+
+
+class TestLastLoginWriteBehind:
+    """Test LastLoginBuffer behaviour."""
+
+    def test_login_skips_row_write(self, client, write_behind, wb_user, sql_counter):
+        """Test a clean successful login issues no UPDATE when buffering."""
+        with sql_counter() as stats:
+            response = client.post('/api/auth/login', json={
+                'username': 'wbuser', 'password': 'WbPass123!'
+            })
+
+        assert response.status_code == 200
+        assert 'UPDATE' not in stats['statements']
+        assert response.get_json()['user']['last_login'] is not None
+        assert write_behind.get(wb_user.id) is not None
+
+    def test_to_dict_reports_pending_value(self, write_behind, wb_user):
+        """Test to_dict shows the buffered timestamp before it is flushed."""
+        wb_user.update_last_login()
+
+        pending = write_behind.get(wb_user.id)
+        assert wb_user.last_login is None
+        assert wb_user.to_dict()['last_login'] == pending.isoformat()
+
+    def test_flush_writes_bulk_update(self, write_behind, wb_user, create_test_user, sql_counter):
+        """Test flush persists every pending timestamp in one UPDATE statement."""
+        other = create_test_user(username='wbother', email='wbother@example.com')
+        wb_user.update_last_login()
+        other.update_last_login()
+        expected = write_behind.get(wb_user.id)
+
+        with sql_counter() as stats:
+            assert write_behind.flush() == 2
+
+        assert stats['statements'].count('UPDATE') == 1
+        assert write_behind.get(wb_user.id) is None
+        db.session.refresh(wb_user)
+        assert as_utc(wb_user.last_login) == expected
+        db.session.delete(other)
+        db.session.commit()
+
+    def test_flush_skips_deleted_users(self, write_behind, wb_user):
+        """Test a pending row for a deleted user does not fail the batch."""
+        wb_user.update_last_login()
+        write_behind.record(-1, datetime.now(timezone.utc))
+
+        assert write_behind.flush() == 2
+        assert write_behind.get(wb_user.id) is None
+        db.session.refresh(wb_user)
+        assert wb_user.last_login is not None
+
+    def test_flushes_run_one_at_a_time(self, write_behind, wb_user):
+        """Test a flush waits for one already running instead of taking its batch."""
+        wb_user.update_last_login()
+        expected = write_behind.get(wb_user.id)
+        running, done = threading.Event(), threading.Event()
+
+        def other_flush():  # holds the flush lock like a flush in progress on the flusher thread
+            with write_behind._flush_lock:
+                running.set()
+                done.wait(5)
+
+        flusher = threading.Thread(target=other_flush)
+        flusher.start()
+        running.wait(5)
+
+        def finish_other_flush():
+            # Only if the waiting flush hasn't taken the batch in the meantime
+            if write_behind._pending == {wb_user.id: expected}:
+                done.set()
+
+        threading.Timer(0.2, finish_other_flush).start()
+        assert write_behind.flush() == 1  # only returns once the other flush is over
+        flusher.join(5)
+
+        assert done.is_set()
+        db.session.refresh(wb_user)
+        assert as_utc(wb_user.last_login) == expected
+
+    def test_size_threshold_wakes_flusher(self, write_behind, monkeypatch):
+        """Test reaching the flush size signals the background flusher."""
+        monkeypatch.setattr(write_behind, 'flush_size', 2)
+        monkeypatch.setattr(write_behind, '_pending', {})
+        monkeypatch.setattr(write_behind, 'flush', lambda: 0)
+        monkeypatch.setattr(write_behind, '_ensure_thread', lambda: None)
+        write_behind._wake.clear()
+        now = datetime.now(timezone.utc)
+
+        write_behind.record(-1, now)
+        assert not write_behind._wake.is_set()
+        write_behind.record(-2, now)
+        assert write_behind._wake.is_set()
+
+        write_behind._wake.clear()
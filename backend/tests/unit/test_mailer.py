@@ -0,0 +1,113 @@
+"""
+Unit tests for pooled SMTP delivery.
+"""
+import smtplib
+import socket
+
+from flask_mail import Message
+
+from app.mailer import SMTPDispatcher
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_messages(*recipients):
+    return [
+        Message(f'Subject {n}', sender='test@mrc.com', recipients=[recipient], body=f'Body {n}')
+        for n, recipient in enumerate(recipients)
+    ]
+
+
+class TestSMTPDispatcher:
+    """Batches share one SMTP connection and survive it being dropped."""
+
+    def test_batches_share_one_connection(self, app_context, smtp_mail):
+        """Test consecutive batches are sent over a single SMTP connection."""
+        dispatcher = SMTPDispatcher()
+        try:
+            assert dispatcher.send_batch(make_messages(*['pooled@example.com'] * 10)) == [None] * 10
+            assert dispatcher.send_batch(make_messages(*['pooled@example.com'] * 5)) == [None] * 5
+        finally:
+            dispatcher.close()
+        assert len(smtp_mail.handler.messages) == 15
+        assert len(set(smtp_mail.handler.peers)) == 1
+        metrics = dispatcher.metrics()
+        assert (metrics['sent'], metrics['connections'], metrics['reconnects']) == (15, 1, 0)
+        assert metrics['messages_per_second'] > 0
+
+    def test_reconnects_when_relay_drops_connection(self, app_context, smtp_mail):
+        """Test a connection closed under the dispatcher is reopened and the message resent."""
+        dispatcher = SMTPDispatcher()
+        try:
+            dispatcher.send_batch(make_messages('first@example.com'))
+            dispatcher._connection.host.sock.shutdown(socket.SHUT_RDWR)  # e.g. the relay's idle timeout fired
+            assert dispatcher.send_batch(make_messages('second@example.com', 'third@example.com')) == [None, None]
+        finally:
+            dispatcher.close()
+        assert [m.rcpt_tos for m in smtp_mail.handler.messages] == [
+            ['first@example.com'], ['second@example.com'], ['third@example.com']
+        ]
+        assert len(set(smtp_mail.handler.peers)) == 2
+        assert dispatcher.metrics()['reconnects'] == 1
+
+    def test_idle_connection_is_closed(self, app_context, smtp_mail):
+        """Test a connection idle past the timeout is closed rather than reused."""
+        clock = FakeClock()
+        dispatcher = SMTPDispatcher(idle_timeout=30, clock=clock)
+        try:
+            dispatcher.send_batch(make_messages('idle@example.com'))
+            clock.now += 10
+            dispatcher.close_if_idle()
+            assert dispatcher._connection is not None
+
+            clock.now += 31
+            dispatcher.close_if_idle()
+            assert dispatcher._connection is None
+            dispatcher.send_batch(make_messages('idle@example.com'))
+        finally:
+            dispatcher.close()
+        assert dispatcher.metrics()['connections'] == 2
+        assert dispatcher.metrics()['reconnects'] == 0
+
+    def test_rejected_recipient_keeps_connection(self, app_context, smtp_mail):
+        """Test a message the relay refuses fails alone without dropping the connection."""
+        dispatcher = SMTPDispatcher()
+        try:
+            results = dispatcher.send_batch(make_messages(
+                'ok1@example.com', 'rejected@example.com', 'ok2@example.com'
+            ))
+        finally:
+            dispatcher.close()
+        assert results[0] is None and results[2] is None
+        assert isinstance(results[1], smtplib.SMTPRecipientsRefused)
+        assert len(smtp_mail.handler.messages) == 2
+        assert dispatcher.metrics()['connections'] == 1
+
+    def test_unreachable_relay_fails_batch_without_retrying_each(self, app, app_context, smtp_mail, monkeypatch):
+        """Test a refused connection fails the whole batch after a single connect attempt."""
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            closed_port = probe.getsockname()[1]
+        monkeypatch.setattr(app.extensions['mail'], 'port', closed_port)
+        dispatcher = SMTPDispatcher()
+        attempts = []
+        original_connect = smtplib.SMTP.connect
+
+        def counting_connect(self, *args, **kwargs):
+            attempts.append(args)
+            return original_connect(self, *args, **kwargs)
+
+        monkeypatch.setattr(smtplib.SMTP, 'connect', counting_connect)
+        results = dispatcher.send_batch(make_messages(*['down@example.com'] * 4))
+        assert len(results) == 4
+        assert all(isinstance(error, ConnectionRefusedError) for error in results)
+        assert len(attempts) == 1
+        assert dispatcher.metrics()['failed'] == 4
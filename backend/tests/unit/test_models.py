@@ -10,6 +10,12 @@ from app import db
 from app.models import User
 
 
+def logged_message(mock_logger):
+    """Last security_logger.warning message, %-formatted as the log listener would."""
+    message, *args = mock_logger.warning.call_args.args
+    return message % tuple(args)
+
+
 class TestUserModel:
     """Test User model functionality."""
     
@@ -320,7 +326,7 @@ class TestSecurityLogging:
         user.log_security_event('TEST_EVENT', '127.0.0.1', 'test details')
         
         mock_logger.warning.assert_called_once()
-        call_args = mock_logger.warning.call_args[0][0]
+        call_args = logged_message(mock_logger)
         assert 'SECURITY: TEST_EVENT' in call_args
         assert f'User:{user.id}({user.username})' in call_args
         assert 'IP:127.0.0.1' in call_args
@@ -334,7 +340,7 @@ class TestSecurityLogging:
         user.log_security_event('MINIMAL_EVENT')
         
         mock_logger.warning.assert_called_once()
-        call_args = mock_logger.warning.call_args[0][0]
+        call_args = logged_message(mock_logger)
         assert 'SECURITY: MINIMAL_EVENT' in call_args
         assert f'User:{user.id}({user.username})' in call_args
         assert 'IP:' not in call_args
@@ -347,16 +353,12 @@ class TestSecurityLogging:
         
         # Test token generation logging
         user.generate_password_reset_token()
-        mock_logger.warning.assert_called_with(
-            f'SECURITY: PASSWORD_RESET_REQUESTED - User:{user.id}({user.username})'
-        )
+        assert logged_message(mock_logger) == f'SECURITY: PASSWORD_RESET_REQUESTED - User:{user.id}({user.username})'
         
         # Test password reset completion logging
         mock_logger.reset_mock()
         user.reset_password('NewPass123!')
-        mock_logger.warning.assert_called_with(
-            f'SECURITY: PASSWORD_RESET_COMPLETED - User:{user.id}({user.username})'
-        )
+        assert logged_message(mock_logger) == f'SECURITY: PASSWORD_RESET_COMPLETED - User:{user.id}({user.username})'
     
     @patch('app.models.security_logger')
     def test_account_lockout_logging(self, mock_logger, create_test_user):
@@ -368,7 +370,7 @@ class TestSecurityLogging:
         user.handle_failed_login('192.168.1.100')
         
         mock_logger.warning.assert_called()
-        call_args = mock_logger.warning.call_args[0][0]
+        call_args = logged_message(mock_logger)
         assert 'SECURITY: ACCOUNT_LOCKED' in call_args
         assert 'IP:192.168.1.100' in call_args
         assert 'Attempts:3' in call_args
@@ -380,9 +382,7 @@ class TestSecurityLogging:
         
         user.handle_successful_login('10.0.0.1')
         
-        mock_logger.warning.assert_called_with(
-            f'SECURITY: LOGIN_SUCCESS - User:{user.id}({user.username}) IP:10.0.0.1'
-        )
+        assert logged_message(mock_logger) == f'SECURITY: LOGIN_SUCCESS - User:{user.id}({user.username}) IP:10.0.0.1'
     
     @patch('app.models.security_logger')
     def test_account_unlock_logging(self, mock_logger, create_test_user):
@@ -391,9 +391,7 @@ class TestSecurityLogging:
         
         user.unlock_account()
         
-        mock_logger.warning.assert_called_with(
-            f'SECURITY: ACCOUNT_UNLOCKED - User:{user.id}({user.username})'
-        )
+        assert logged_message(mock_logger) == f'SECURITY: ACCOUNT_UNLOCKED - User:{user.id}({user.username})'
 
 
 class TestUserTimestamps:
@@ -0,0 +1,232 @@
+"""
+Unit tests for the transactional email outbox.
+"""
+import pytest
+import socket
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from app import db, email_outbox, mail
+from app.models import User, OutboxMessage, as_utc
+
+
+@pytest.fixture
+def outbox(app_context):
+    """The app's email outbox, emptied and with fresh counters after each test."""
+    yield email_outbox
+    db.session.rollback()
+    OutboxMessage.query.delete()
+    db.session.commit()
+    email_outbox.counters = dict.fromkeys(email_outbox.counters, 0)
+
+
+@pytest.fixture
+def reset_user(app_context):
+    """An active user to request password resets for, removed afterwards"""
+    user = User(username='outboxatomic', email='outboxatomic@example.com', full_name='Outbox Atomic')
+    user.set_password('OutboxPass123!')
+    db.session.add(user)
+    db.session.commit()
+    yield user
+    db.session.rollback()
+    db.session.delete(user)
+    db.session.commit()
+
+
+def queue(outbox, count=1, recipient='queued@example.com'):
+    """Enqueue and commit `count` messages, returning their ids"""
+    messages = [outbox.enqueue(recipient, f'Subject {n}', f'Body {n}') for n in range(count)]
+    db.session.commit()
+    return [message.id for message in messages]
+
+
+def make_due(message_id):
+    """Pull a message's next attempt into the past"""
+    message = db.session.get(OutboxMessage, message_id)
+    message.next_attempt_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.session.commit()
+
+
+class TestEnqueue:
+    """Messages are queued in the caller's transaction."""
+
+    def test_enqueue_commits_with_caller(self, outbox):
+        """Test an enqueued message is pending and due immediately once committed."""
+        [message_id] = queue(outbox)
+        message = db.session.get(OutboxMessage, message_id)
+        assert message.status == OutboxMessage.PENDING
+        assert message.attempts == 0
+        assert as_utc(message.next_attempt_at) <= datetime.now(timezone.utc)
+
+    def test_enqueue_rolls_back_with_caller(self, outbox):
+        """Test a rolled back request leaves nothing queued."""
+        outbox.enqueue('rollback@example.com', 'Subject', 'Body')
+        db.session.rollback()
+        assert OutboxMessage.query.filter_by(recipient='rollback@example.com').count() == 0
+
+    @patch('app.mail.send')
+    def test_password_reset_request_only_enqueues(self, mock_send, outbox, client):
+        """Test the reset endpoint returns without touching SMTP."""
+        user = User(username='outboxreset', email='outboxreset@example.com', full_name='Outbox Reset')
+        user.set_password('OutboxPass123!')
+        db.session.add(user)
+        db.session.commit()
+        try:
+            response = client.post('/api/auth/request-password-reset',
+                                   json={'email': 'outboxreset@example.com'})
+            assert response.status_code == 200
+            mock_send.assert_not_called()
+            message = OutboxMessage.query.filter_by(recipient='outboxreset@example.com').one()
+            assert message.subject == 'Password Reset - MRC Authentication'
+            assert user.password_reset_token in message.body
+        finally:
+            db.session.delete(user)
+            db.session.commit()
+
+    def test_password_reset_token_and_email_commit_together(self, outbox, client, reset_user, sql_counter):
+        """Test the reset token and its queued email are written in one commit."""
+        with sql_counter() as stats:
+            response = client.post('/api/auth/request-password-reset', json={'email': reset_user.email})
+        assert response.status_code == 200
+        assert stats['commits'] == 1
+        db.session.refresh(reset_user)
+        message = OutboxMessage.query.filter_by(recipient=reset_user.email).one()
+        assert reset_user.password_reset_token in message.body
+
+    def test_password_reset_enqueue_failure_keeps_no_token(self, outbox, client, reset_user, sql_counter):
+        """Test a failed enqueue leaves neither a token nor a message, without any write."""
+        with patch.object(outbox, 'enqueue', side_effect=RuntimeError('outbox unavailable')), \
+                sql_counter() as stats:
+            response = client.post('/api/auth/request-password-reset', json={'email': reset_user.email})
+        assert response.status_code == 500
+        assert stats['commits'] == 0
+        db.session.refresh(reset_user)
+        assert reset_user.password_reset_token is None
+        assert OutboxMessage.query.filter_by(recipient=reset_user.email).count() == 0
+
+
+class TestDelivery:
+    """The worker delivers, retries with backoff and dead-letters."""
+
+    def test_process_batch_delivers_and_marks_sent(self, outbox):
+        """Test due messages are sent and recorded as sent."""
+        ids = queue(outbox, 3)
+        with mail.record_messages() as sent:
+            assert outbox.process_batch() == 3
+        assert [m.subject for m in sent] == ['Subject 0', 'Subject 1', 'Subject 2']
+        for message_id in ids:
+            message = db.session.get(OutboxMessage, message_id)
+            db.session.refresh(message)
+            assert message.status == OutboxMessage.SENT
+            assert message.attempts == 1
+            assert message.sent_at is not None
+        assert outbox.process_batch() == 0
+        assert outbox.metrics()['sent'] == 3
+
+    def test_failure_is_retried_after_backoff(self, outbox):
+        """Test a failed delivery is rescheduled by the backoff and not retried early."""
+        [message_id] = queue(outbox)
+        with patch('flask_mail.Connection.send', side_effect=OSError('Connection refused')):
+            before = datetime.now(timezone.utc)
+            assert outbox.process_batch() == 1
+            message = db.session.get(OutboxMessage, message_id)
+            db.session.refresh(message)
+            assert message.status == OutboxMessage.PENDING
+            assert message.attempts == 1
+            assert message.last_error == 'OSError: Connection refused'
+            assert as_utc(message.next_attempt_at) >= before + timedelta(seconds=outbox.backoff(1))
+            assert outbox.process_batch() == 0
+
+        make_due(message_id)
+        with mail.record_messages() as sent:
+            assert outbox.process_batch() == 1
+        assert len(sent) == 1
+        db.session.refresh(message)
+        assert message.status == OutboxMessage.SENT
+        assert message.attempts == 2
+
+    def test_dead_letter_after_max_attempts(self, outbox, monkeypatch):
+        """Test a message that keeps failing stops being retried."""
+        monkeypatch.setattr(outbox, 'max_attempts', 2)
+        [message_id] = queue(outbox)
+        with patch('flask_mail.Connection.send', side_effect=OSError('Connection refused')):
+            outbox.process_batch()
+            make_due(message_id)
+            outbox.process_batch()
+        message = db.session.get(OutboxMessage, message_id)
+        db.session.refresh(message)
+        assert message.status == OutboxMessage.DEAD
+        assert message.attempts == 2
+
+        make_due(message_id)
+        assert outbox.process_batch() == 0
+        metrics = outbox.metrics()
+        assert metrics['dead'] == 1
+        assert metrics['retried'] == 1
+        assert metrics['dead_letters'] == 1
+
+    def test_backoff_doubles_up_to_max(self, outbox):
+        """Test the retry delay doubles per attempt and is capped."""
+        assert [outbox.backoff(n) for n in (1, 2, 3)] == [30, 60, 120]
+        assert outbox.backoff(20) == outbox.backoff_max
+
+    def test_claim_is_leased(self, outbox):
+        """Test a claimed message is not handed out again until its lease expires."""
+        [message_id] = queue(outbox)
+        [(claimed_id, *_, attempts)] = outbox.claim()
+        assert (claimed_id, attempts) == (message_id, 1)
+        assert outbox.claim() == []
+
+        after_lease = datetime.now(timezone.utc) + timedelta(seconds=outbox.lease_seconds + 1)
+        [(claimed_id, *_, attempts)] = outbox.claim(now=after_lease)
+        assert (claimed_id, attempts) == (message_id, 2)
+
+    def test_purge_sent_keeps_recent_and_undelivered(self, outbox):
+        """Test only delivered messages past the retention period are deleted."""
+        [sent_id] = queue(outbox)
+        with mail.record_messages():
+            outbox.process_batch()
+        [pending_id] = queue(outbox)
+
+        assert outbox.purge_sent() == 0
+        later = datetime.now(timezone.utc) + timedelta(seconds=outbox.sent_retention + 1)
+        assert outbox.purge_sent(now=later) == 1
+        assert db.session.get(OutboxMessage, sent_id) is None
+        assert db.session.get(OutboxMessage, pending_id) is not None
+
+    def test_worker_command_once(self, outbox, runner):
+        """Test `flask outbox-worker --once` drains due messages and exits."""
+        queue(outbox, 2)
+        with mail.record_messages() as sent:
+            result = runner.invoke(args=['outbox-worker', '--once'])
+        assert result.exit_code == 0
+        assert 'Attempted 2 outbox messages' in result.output
+        assert len(sent) == 2
+
+
+class TestSMTPDelivery:
+    """End to end delivery to a local SMTP server."""
+
+    def test_delivers_to_smtp_server(self, outbox, smtp_mail):
+        """Test every queued message reaches the SMTP server exactly once."""
+        queue(outbox, 25, recipient='smtp@example.com')
+        while outbox.process_batch():
+            pass
+        received = smtp_mail.handler.messages
+        assert len(received) == 25
+        assert all(envelope.rcpt_tos == ['smtp@example.com'] for envelope in received)
+        assert OutboxMessage.query.filter_by(status=OutboxMessage.SENT).count() == 25
+
+    def test_unreachable_server_is_retried(self, app, outbox, smtp_mail, monkeypatch):
+        """Test a refused connection is recorded for retry rather than lost."""
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            closed_port = probe.getsockname()[1]
+        monkeypatch.setattr(app.extensions['mail'], 'port', closed_port)
+        [message_id] = queue(outbox)
+        outbox.process_batch()
+        message = db.session.get(OutboxMessage, message_id)
+        db.session.refresh(message)
+        assert message.status == OutboxMessage.PENDING
+        assert message.last_error.startswith('ConnectionRefusedError')
+        assert smtp_mail.handler.messages == []
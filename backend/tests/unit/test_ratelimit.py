@@ -0,0 +1,121 @@
+"""
+Unit tests for the shared rate limit storages.
+"""
+import pytest
+from limits import parse
+from limits.errors import ConfigurationError
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter, MovingWindowRateLimiter
+
+from app.ratelimit import SharedStorage, SQLiteStorage, limiter_storage_options
+
+
+@pytest.fixture
+def sqlite_uri(tmp_path):
+    return f"sqlite:///{tmp_path / 'limits.db'}"
+
+
+class TestStorageSelection:
+    """URIs map to the right storage and options."""
+
+    def test_sqlite_scheme_registered(self, sqlite_uri):
+        """Test sqlite:// resolves to the SQLite storage."""
+        assert isinstance(storage_from_string(sqlite_uri), SQLiteStorage)
+
+    def test_sqlite_requires_file(self):
+        """Test an in-memory SQLite URI is rejected (it could not be shared)."""
+        with pytest.raises(ConfigurationError):
+            storage_from_string('sqlite://')
+
+    def test_shared_storage_gets_cache_server_key(self):
+        """Test mrc-shared:// is given CACHE_SERVER_AUTHKEY, never the app secret."""
+        config = {'RATELIMIT_STORAGE_URI': 'mrc-shared://127.0.0.1:5011', 'SECRET_KEY': 's3cret',
+                  'CACHE_SERVER_AUTHKEY': 'cache-server-s3cret'}
+
+        assert limiter_storage_options(config) == {'authkey': 'cache-server-s3cret'}
+        assert limiter_storage_options({'RATELIMIT_STORAGE_URI': 'memory://'}) == {}
+
+    def test_shared_storage_requires_key(self):
+        """Test mrc-shared:// refuses to start without a real authkey."""
+        with pytest.raises(ConfigurationError):
+            SharedStorage('mrc-shared://127.0.0.1:5011', authkey=None)
+        with pytest.raises(ConfigurationError):
+            SharedStorage('mrc-shared://127.0.0.1:5011', authkey='short')
+
+
+class TestSQLiteStorage:
+    """Counters survive across storage instances (workers) on one file."""
+
+    def test_fixed_window_shared_between_workers(self, sqlite_uri):
+        """Test two workers draw from one fixed-window budget."""
+        limit = parse('3/minute')
+        worker_a = FixedWindowRateLimiter(storage_from_string(sqlite_uri))
+        worker_b = FixedWindowRateLimiter(storage_from_string(sqlite_uri))
+
+        assert worker_a.hit(limit, '1.2.3.4', 'login')
+        assert worker_b.hit(limit, '1.2.3.4', 'login')
+        assert worker_a.hit(limit, '1.2.3.4', 'login')
+        assert not worker_b.hit(limit, '1.2.3.4', 'login')
+        assert worker_a.hit(limit, '5.6.7.8', 'login')
+
+    def test_expired_window_restarts(self, sqlite_uri):
+        """Test an expired counter starts again from the new amount."""
+        storage = storage_from_string(sqlite_uri)
+        assert storage.incr('k', 0) == 1
+        assert storage.incr('k', 60) == 1
+        assert storage.incr('k', 60) == 2
+        assert storage.get('k') == 2
+
+    def test_moving_window(self, sqlite_uri):
+        """Test the moving window admits at most the limit within the window."""
+        limit = parse('2/minute')
+        worker_a = MovingWindowRateLimiter(storage_from_string(sqlite_uri))
+        worker_b = MovingWindowRateLimiter(storage_from_string(sqlite_uri))
+
+        assert worker_a.hit(limit, 'reset')
+        assert worker_b.hit(limit, 'reset')
+        assert not worker_a.hit(limit, 'reset')
+        assert worker_b.get_window_stats(limit, 'reset').remaining == 0
+
+    def test_one_off_moving_window_keys_purged(self, sqlite_uri, monkeypatch):
+        """Test entries of keys that never return are swept once their window has passed."""
+        storage = storage_from_string(sqlite_uri)
+        monkeypatch.setattr(storage, 'PURGE_EVERY', 3)
+        storage.acquire_entry('ip-1', 5, 0)
+        storage.acquire_entry('ip-2', 5, 60)
+        storage.acquire_entry('ip-3', 5, 60)
+
+        keys = [row[0] for row in storage._connection().execute('SELECT key FROM limiter_entry')]
+        assert sorted(keys) == ['ip-2', 'ip-3']
+
+    def test_clear_and_reset(self, sqlite_uri):
+        """Test clearing a key and resetting all counters."""
+        storage = storage_from_string(sqlite_uri)
+        storage.incr('a', 60)
+        storage.incr('b', 60)
+        storage.clear('a')
+
+        assert storage.get('a') == 0
+        assert storage.reset() == 1
+        assert storage.get('b') == 0
+
+
+class TestSharedStorage:
+    """Counters held by the cache server."""
+
+    def test_workers_share_counters(self, cache_server):
+        """Test two clients of the cache server share one budget."""
+        limit = parse('2/minute')
+        uri = 'mrc-shared://' + cache_server[len('unix:'):]
+        worker_a = MovingWindowRateLimiter(storage_from_string(uri, authkey='test-cache-server-key'))
+        worker_b = MovingWindowRateLimiter(storage_from_string(uri, authkey='test-cache-server-key'))
+
+        assert worker_a.hit(limit, 'login')
+        assert worker_b.hit(limit, 'login')
+        assert not worker_a.hit(limit, 'login')
+
+    def test_unreachable_server_fails_health_check(self):
+        """Test check() reports an unreachable server instead of raising."""
+        storage = SharedStorage('mrc-shared://127.0.0.1:1', authkey='test-cache-server-key')
+
+        assert storage.check() is False
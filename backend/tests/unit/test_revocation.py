@@ -0,0 +1,184 @@
+"""
+Unit tests for server-side token revocation.
+Tests that logout revokes both tokens, that unrevoked tokens are checked without
+database I/O, and that the Bloom filter stays in step with the revoked_token table.
+"""
+import uuid
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from sqlalchemy.exc import OperationalError
+
+from app import db, token_revocations
+from app.models import RevokedToken
+from app.revocation import BloomFilter, TokenRevocationList
+
+
+@pytest.fixture
+def revocations(app_context, monkeypatch):
+    """The app's revocation list over an empty table, counting from zero."""
+    RevokedToken.query.delete()
+    db.session.commit()
+    token_revocations.rebuild()
+    monkeypatch.setattr(token_revocations, 'counters', dict.fromkeys(token_revocations.counters, 0))
+    yield token_revocations
+    db.session.rollback()
+    RevokedToken.query.delete()
+    db.session.commit()
+    token_revocations.rebuild()
+
+
+@pytest.fixture
+def logged_in(client, revocations):
+    """Client logged in as the seeded user with access and refresh cookies."""
+    response = client.post('/api/auth/login', json={
+        'username': 'michael', 'password': 'AdminMike123!', 'remember_me': True
+    })
+    assert response.status_code == 200
+    return client
+
+
+def cookie(client, name):
+    return client.get_cookie(name).value
+
+
+def revoked_row(jti=None, expires_in=timedelta(hours=1)):
+    return RevokedToken(jti=jti or str(uuid.uuid4()), token_type='access', user_id=1,
+                        expires_at=datetime.now(timezone.utc) + expires_in)
+
+
+class TestBloomFilter:
+    """Filter sizing and membership."""
+
+    def test_no_false_negatives(self):
+        """Test every added key is reported present."""
+        bloom = BloomFilter(1000, 0.001)
+        keys = [str(uuid.uuid4()) for _ in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        assert all(key in bloom for key in keys)
+        assert bloom.count == 1000
+
+    def test_false_positive_rate_near_target(self):
+        """Test a full filter stays close to its configured error rate."""
+        bloom = BloomFilter(5000, 0.01)
+        for _ in range(5000):
+            bloom.add(str(uuid.uuid4()))
+        false_positives = sum(str(uuid.uuid4()) in bloom for _ in range(20000))
+        assert false_positives / 20000 < 0.02
+        assert bloom.memory_bytes < 6500  # ~9.6 bits per key
+
+
+class TestLogoutRevocation:
+    """Logout makes copies of the tokens useless."""
+
+    def test_access_token_rejected_after_logout(self, logged_in, client, app):
+        """Test a copied access cookie is refused once its owner logs out."""
+        access = cookie(client, 'access_token_cookie')
+        assert client.post('/api/auth/logout').status_code == 200
+
+        copy = app.test_client()
+        copy.set_cookie('access_token_cookie', access)
+        response = copy.get('/api/me')
+        assert response.status_code == 401
+        assert response.get_json()['error'] == 'token_revoked'
+
+    def test_refresh_token_revoked_too(self, logged_in, client, app):
+        """Test the refresh cookie sent with the logout can no longer mint access tokens."""
+        refresh = cookie(client, 'refresh_token_cookie')
+        assert client.post('/api/auth/logout').status_code == 200
+
+        assert {row.token_type for row in RevokedToken.query.all()} == {'access', 'refresh'}
+        copy = app.test_client()
+        copy.set_cookie('refresh_token_cookie', refresh)
+        response = copy.post('/api/auth/refresh')
+        assert response.status_code == 401
+        assert response.get_json()['error'] == 'token_revoked'
+
+    def test_other_sessions_unaffected(self, logged_in, client, app):
+        """Test logging out one session leaves another login of the same user working."""
+        other = app.test_client()
+        assert other.post('/api/auth/login', json={
+            'username': 'michael', 'password': 'AdminMike123!'
+        }).status_code == 200
+        assert client.post('/api/auth/logout').status_code == 200
+        assert other.get('/api/me').status_code == 200
+
+
+class TestRevocationCheck:
+    """Per-request checks only reach the database on a filter hit."""
+
+    def test_unrevoked_token_checked_without_sql(self, logged_in, client, sql_counter):
+        """Test a token the filter has never seen is accepted with no query."""
+        assert client.get('/api/me').status_code == 200  # profile and decode caches now warm
+        with sql_counter() as stats:
+            assert client.get('/api/me').status_code == 200
+        assert stats['statements'] == []
+        assert token_revocations.metrics()['checks'] == 2
+        assert token_revocations.metrics()['filter_hits'] == 0
+
+    def test_false_positive_confirmed_in_database(self, logged_in, client):
+        """Test a filter hit for a jti that is not stored lets the token through."""
+        with patch.object(BloomFilter, '__contains__', return_value=True):
+            assert client.get('/api/me').status_code == 200
+        metrics = token_revocations.metrics()
+        assert (metrics['filter_hits'], metrics['false_positives'], metrics['revoked']) == (1, 1, 0)
+
+    def test_fails_closed_when_database_unavailable(self, revocations):
+        """Test a flagged token is refused if its status cannot be confirmed."""
+        jti = str(uuid.uuid4())
+        revocations.bloom.add(jti)
+        with patch.object(TokenRevocationList, '_stored', side_effect=OperationalError('SELECT', {}, None)):
+            assert revocations.is_token_revoked({}, {'jti': jti}) is True
+        assert revocations.metrics()['errors'] == 1
+
+
+class TestFilterMaintenance:
+    """Rebuild, cross-worker sync and purge."""
+
+    def test_sync_picks_up_other_workers_revocations(self, revocations, app, monkeypatch):
+        """Test rows committed by another worker reach this filter on the next sync."""
+        monkeypatch.setitem(app.extensions, 'token_revocations', token_revocations)
+        other_worker = TokenRevocationList(app)
+        other_worker.rebuild()
+        row = revoked_row()
+        db.session.add(row)
+        db.session.commit()
+
+        assert row.jti not in other_worker.bloom
+        assert other_worker.sync() == 1
+        assert row.jti in other_worker.bloom
+        assert other_worker.is_token_revoked({}, {'jti': row.jti}) is True
+        assert other_worker.sync() == 0
+
+    def test_rebuild_skips_expired_rows(self, revocations):
+        """Test a fresh filter only holds tokens that could still be presented."""
+        live, expired = revoked_row(), revoked_row(expires_in=timedelta(hours=-1))
+        db.session.add_all([live, expired])
+        db.session.commit()
+
+        assert revocations.rebuild() == 1
+        assert live.jti in revocations.bloom
+        assert revocations.last_id == max(live.id, expired.id)
+
+    def test_purge_deletes_expired_entries(self, revocations):
+        """Test purge removes rows past their exp and leaves the rest."""
+        live, expired = revoked_row(), revoked_row(expires_in=timedelta(hours=-1))
+        db.session.add_all([live, expired])
+        db.session.commit()
+
+        assert revocations.purge() == 1
+        assert [row.jti for row in RevokedToken.query.all()] == [live.jti]
+        assert revocations.metrics()['entries'] == 1
+
+    def test_overfull_filter_is_resized(self, revocations, monkeypatch):
+        """Test a sync past the filter's capacity rebuilds it larger."""
+        monkeypatch.setattr(revocations, 'capacity', 4)
+        revocations.rebuild()
+        db.session.add_all([revoked_row() for _ in range(6)])
+        db.session.commit()
+
+        revocations.sync()
+        assert revocations.bloom.capacity >= 12
+        assert revocations.metrics()['entries'] == 6
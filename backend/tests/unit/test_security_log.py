@@ -0,0 +1,121 @@
+"""
+Unit tests for the queued security audit log.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from app.security_log import DroppingQueueHandler, SecurityLogPipeline
+
+
+@pytest.fixture
+def make_pipeline(request):
+    """Pipeline on a logger private to the test, stopped and detached afterwards."""
+    logger = logging.getLogger(f'mrc_security_test.{request.node.name}')
+    logger.setLevel(logging.WARNING)
+    pipelines = []
+
+    def _make(**config):
+        app = Flask(__name__)
+        app.config.update(SECURITY_LOG_STDOUT=False, **config)
+        pipeline = SecurityLogPipeline(app, logger_name=logger.name)
+        pipelines.append(pipeline)
+        return pipeline, logger
+
+    yield _make
+    for pipeline in pipelines:
+        pipeline.stop()
+        logger.removeHandler(pipeline.handler)
+
+
+class ThreadRecordingArg:
+    """Log argument that remembers which thread formatted it"""
+
+    def __init__(self):
+        self.formatted_in = None
+
+    def __str__(self):
+        self.formatted_in = threading.current_thread()
+        return 'arg'
+
+
+class TestSecurityLogPipeline:
+    """Records are queued by the caller and written by the listener."""
+
+    def test_writes_text_records_to_file(self, make_pipeline, tmp_path):
+        """Test queued records reach the log file once the listener drains them."""
+        log_file = tmp_path / 'security.log'
+        pipeline, logger = make_pipeline(SECURITY_LOG_FILE=str(log_file))
+        logger.warning("SECURITY: %s - User:%s(%s)", 'LOGIN_SUCCESS', 7, 'alice')
+        pipeline.stop()
+        assert 'WARNING' in log_file.read_text()
+        assert 'SECURITY: LOGIN_SUCCESS - User:7(alice)' in log_file.read_text()
+
+    def test_json_format_includes_audit_fields(self, make_pipeline, tmp_path):
+        """Test JSON lines carry the structured fields passed via extra."""
+        log_file = tmp_path / 'security.jsonl'
+        pipeline, logger = make_pipeline(SECURITY_LOG_FILE=str(log_file), SECURITY_LOG_FORMAT='json')
+        logger.warning("SECURITY: %s", 'LOGOUT', extra={'security': {'event': 'LOGOUT', 'user_id': 7}})
+        pipeline.stop()
+        entry = json.loads(log_file.read_text())
+        assert entry['message'] == 'SECURITY: LOGOUT'
+        assert (entry['event'], entry['user_id'], entry['level']) == ('LOGOUT', 7, 'WARNING')
+
+    def test_formatting_happens_on_listener_thread(self, make_pipeline, tmp_path):
+        """Test the calling thread only enqueues; arguments are formatted by the listener."""
+        pipeline, logger = make_pipeline(SECURITY_LOG_FILE=str(tmp_path / 'security.log'))
+        arg = ThreadRecordingArg()
+        logger.warning("SECURITY: %s", arg)
+        assert arg.formatted_in is None or arg.formatted_in is not threading.current_thread()
+        pipeline.stop()
+        assert arg.formatted_in is not None
+        assert arg.formatted_in is not threading.current_thread()
+
+    def test_full_queue_drops_and_counts(self, make_pipeline):
+        """Test a full queue drops records instead of blocking or raising."""
+        pipeline, logger = make_pipeline(SECURITY_LOG_QUEUE_SIZE=2)
+        pipeline.stop()  # A stalled listener: nothing drains the queue
+        for n in range(5):
+            logger.warning("SECURITY: %s", n)
+        metrics = pipeline.metrics()
+        assert (metrics['enqueued'], metrics['dropped'], metrics['queued']) == (2, 3, 2)
+
+    def test_listener_restarted_once_after_fork(self):
+        """Test threads logging at once in a forked child restart the listener once, then use its queue."""
+        restarts = []
+        fresh_queue = queue.Queue()
+
+        def on_fork():  # like SecurityLogPipeline._after_fork
+            restarts.append(threading.current_thread())
+            time.sleep(0.05)  # give the other threads time to arrive mid-restart
+            handler.queue = fresh_queue
+
+        handler = DroppingQueueHandler(queue.Queue(), on_fork=on_fork)
+        handler._pid = -1  # as if inherited from the parent process
+        record = logging.makeLogRecord({'msg': 'SECURITY: forked'})
+        threads = [threading.Thread(target=handler.enqueue, args=(record,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(restarts) == 1
+        assert fresh_queue.qsize() == 8
+
+    def test_reinit_replaces_handler(self, make_pipeline):
+        """Test initialising again leaves exactly one queue handler on the logger."""
+        pipeline, logger = make_pipeline()
+        pipeline.init_app(Flask(__name__))
+        assert logger.handlers == [pipeline.handler]
+        assert logger.propagate is False
+
+    def test_app_security_logger_is_queued(self, app):
+        """Test the application's mrc_security logger goes through the queue only."""
+        logger = logging.getLogger('mrc_security')
+        assert logger.handlers == [app.extensions['security_log'].handler]
+        assert logger.propagate is False
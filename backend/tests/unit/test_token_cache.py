@@ -0,0 +1,116 @@
+"""
+Unit tests for the decoded JWT cache.
+Tests that repeat requests skip signature verification without skipping
+expiry, revocation or tampering checks.
+"""
+import time
+import pytest
+from datetime import timedelta
+from unittest.mock import patch
+
+import jwt as pyjwt
+from flask import Flask
+from flask_jwt_extended import create_access_token
+
+from app import jwt
+from app.models import User
+from app.token_cache import CachingJWTManager
+
+
+@pytest.fixture
+def token_client(client, app_context):
+    """Client carrying an access token cookie for the seeded user; returns (client, token)."""
+    user = User.find_by_username('michael')
+
+    def with_token(**kwargs):
+        token = create_access_token(identity=str(user.id), **kwargs)
+        client.set_cookie('access_token_cookie', token)
+        return client, token
+    return with_token
+
+
+@pytest.fixture(autouse=True)
+def fresh_counters(monkeypatch):
+    """Count hits and misses from zero in each test."""
+    monkeypatch.setattr(jwt, 'counters', {'hits': 0, 'misses': 0})
+
+
+@pytest.fixture
+def counted_verify():
+    """Spy on PyJWT's decode as called by Flask-JWT-Extended."""
+    with patch('flask_jwt_extended.jwt_manager.jwt.decode', wraps=pyjwt.decode) as spy:
+        yield spy
+
+
+class TestDecodeCache:
+    """Verified tokens are reused until they expire."""
+
+    def test_repeat_requests_verify_once(self, token_client, counted_verify):
+        """Test the second request with the same token skips decoding and verification."""
+        client, _ = token_client()
+        assert client.get('/api/me').status_code == 200
+        decodes = counted_verify.call_count
+        assert decodes > 0
+
+        for _ in range(5):
+            assert client.get('/api/me').status_code == 200
+
+        assert counted_verify.call_count == decodes
+        metrics = jwt.metrics()
+        assert (metrics['hits'], metrics['misses'], metrics['size']) == (5, 1, 1)
+
+    def test_expired_token_rejected_despite_cache(self, token_client):
+        """Test a cached token stops working at its exp."""
+        client, _ = token_client(expires_delta=timedelta(seconds=1))
+        assert client.get('/api/me').status_code == 200
+
+        time.sleep(1.1)
+        response = client.get('/api/me')
+        assert response.status_code == 401
+        assert response.get_json()['error'] == 'token_expired'
+
+    def test_tampered_token_is_verified(self, token_client):
+        """Test a token differing from a cached one in any byte goes through full verification."""
+        client, token = token_client()
+        assert client.get('/api/me').status_code == 200
+
+        header, payload, signature = token.split('.')
+        forged = '.'.join([header, payload, signature[:-2] + ('AA' if signature[-2:] != 'AA' else 'BB')])
+        client.set_cookie('access_token_cookie', forged)
+        response = client.get('/api/me')
+        assert response.status_code == 401
+        assert response.get_json()['error'] == 'token_invalid'
+
+    def test_revocation_checked_on_cache_hit(self, token_client):
+        """Test the blocklist callback still runs for cached tokens."""
+        client, token = token_client()
+        assert client.get('/api/me').status_code == 200
+        revoked = set()
+        original = jwt._token_in_blocklist_callback
+        jwt.token_in_blocklist_loader(lambda header, payload: payload['jti'] in revoked)
+        try:
+            assert client.get('/api/me').status_code == 200
+            revoked.add(pyjwt.decode(token, options={'verify_signature': False})['jti'])
+            assert client.get('/api/me').status_code == 401
+        finally:
+            jwt._token_in_blocklist_callback = original
+        assert jwt.metrics()['hits'] == 2
+
+    def test_cache_is_bounded(self, token_client, monkeypatch):
+        """Test at most JWT_DECODE_CACHE_SIZE tokens are kept."""
+        monkeypatch.setattr(jwt.decode_cache, 'maxsize', 3)
+        for _ in range(5):
+            client, _ = token_client()
+            assert client.get('/api/me').status_code == 200
+        assert jwt.metrics()['size'] == 3
+
+    def test_disabled_with_size_zero(self):
+        """Test JWT_DECODE_CACHE_SIZE = 0 leaves decoding to Flask-JWT-Extended."""
+        app = Flask(__name__)
+        app.config.update(JWT_SECRET_KEY='k' * 32, JWT_DECODE_CACHE_SIZE=0)
+        manager = CachingJWTManager(app)
+        with app.app_context():
+            token = create_access_token(identity='1')
+            assert manager._decode_jwt_from_config(token)['sub'] == '1'
+            assert manager._decode_jwt_from_config(token)['sub'] == '1'
+        assert manager.metrics() == {'hits': 0, 'misses': 0, 'hit_ratio': None, 'size': 0, 'enabled': False}